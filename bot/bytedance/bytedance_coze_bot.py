@@ -2,13 +2,13 @@
 import io
 import os
 from os.path import isfile
-import requests
 from urllib.parse import urlparse, unquote
 from bot.bot import Bot
 from bot.bytedance.coze_client import CozeClient
 from bot.bytedance.coze_session import CozeSession, CozeSessionManager
 from bridge.context import ContextType, Context
 from bridge.reply import Reply, ReplyType
+from common.fetcher import get_fetcher
 from common.log import logger
 from config import conf
 from common import memory
@@ -189,14 +189,9 @@ class ByteDanceCozeBot(Bot):
 
     def _download_image(self, url):
         try:
-            pic_res = requests.get(url, stream=True)
-            pic_res.raise_for_status()
-            image_storage = io.BytesIO()
-            size = 0
-            for block in pic_res.iter_content(1024):
-                size += len(block)
-                image_storage.write(block)
-            logger.debug(f"[WX] download image success, size={size}, img_url={url}")
+            result = get_fetcher().fetch(url)
+            image_storage = io.BytesIO(result.read())
+            logger.debug(f"[WX] download image success, size={result.size}, img_url={url}")
             image_storage.seek(0)
             return image_storage
         except Exception as e:
@@ -205,8 +200,6 @@ class ByteDanceCozeBot(Bot):
 
     def _download_file(self, url):
         try:
-            response = requests.get(url)
-            response.raise_for_status()
             parsed_url = urlparse(url)
             logger.debug(f"Downloading file from {url}")
             url_path = unquote(parsed_url.path)
@@ -214,8 +207,7 @@ class ByteDanceCozeBot(Bot):
             file_name = url_path.split('/')[-1]
             logger.debug(f"Saving file as {file_name}")
             file_path = os.path.join(TmpDir().path(), file_name)
-            with open(file_path, 'wb') as file:
-                file.write(response.content)
+            get_fetcher().fetch_to(url, file_path)
             return file_path
         except Exception as e:
             logger.error(f"Error downloading {url}: {e}")
@@ -0,0 +1,174 @@
+# encoding:utf-8
+"""
+OpenAI兼容对话接口的流式回复
+
+边读取模型输出的增量文本边按段落/句子切分，完整的片段立即通过channel发送，缩短长回复的等待时间。
+最后一个片段不在这里发送，作为bot的回复返回，由channel按正常流程装饰、发送；会话中保存完整回复。
+"""
+import json
+import re
+
+from bridge.context import RequestCancelled
+from bridge.reply import ReplyType
+from common import metrics
+from common.log import logger
+from config import conf
+
+PARAGRAPH_RE = re.compile(r"\n\s*\n")
+SENTENCE_RE = re.compile(r"[。！？!?；;…]+[”\"』」）)]*|\.(?=\s)|\n+")
+CODE_FENCE = "```"
+
+
+def _outside_code(text) -> bool:
+    """text结尾是否在代码块之外，代码块内部不切分"""
+    return text.count(CODE_FENCE) % 2 == 0
+
+
+class TextChunker:
+    """把增量文本切分为段落(paragraph)或句子(sentence)大小的片段
+
+    - 片段不短于min_chars，过短的段落与后面的内容合并发送
+    - 段落超过max_chars仍未结束时，在最后一个句子结尾处切分
+    """
+
+    def __init__(self, mode="paragraph", min_chars=50, max_chars=500):
+        self.boundary_re = SENTENCE_RE if mode == "sentence" else PARAGRAPH_RE
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def feed(self, text) -> list:
+        """追加增量文本，返回已完整的片段"""
+        self._buffer += text
+        chunks = []
+        while True:
+            cut = self._find_cut()
+            if cut is None:
+                return chunks
+            chunk, self._buffer = self._buffer[:cut].strip(), self._buffer[cut:]
+            if chunk:
+                chunks.append(chunk)
+
+    def flush(self) -> str:
+        rest, self._buffer = self._buffer.strip(), ""
+        return rest
+
+    def _find_cut(self):
+        buf = self._buffer
+        for m in self.boundary_re.finditer(buf):
+            if m.end() >= self.min_chars and _outside_code(buf[:m.end()]):
+                return m.end()
+        if len(buf) > self.max_chars:
+            ends = [m.end() for m in SENTENCE_RE.finditer(buf, 0, self.max_chars)
+                    if m.end() >= self.min_chars and _outside_code(buf[:m.end()])]
+            if ends:
+                return ends[-1]
+        return None
+
+
+def get_stream_channel(context):
+    """开启流式回复且当前消息适合流式发送时返回channel，否则返回None"""
+    if context is None or not conf().get("stream_reply", False) or context.get("no_stream", False):
+        return None
+    if context.get("desire_rtype") == ReplyType.VOICE:  # 需要转语音的回复整体合成
+        return None
+    channel = context.get("channel")
+    return channel if hasattr(channel, "send_stream_chunk") else None
+
+
+def iter_sse_deltas(response):
+    """读取requests流式响应中OpenAI格式的SSE事件，返回增量文本"""
+    for line in response.iter_lines():
+        if not line:
+            continue
+        line = line.decode("utf-8")
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        try:
+            event = json.loads(data)
+        except json.JSONDecodeError:
+            logger.debug("[chat_stream] skip invalid sse data: {}".format(data[:200]))
+            continue
+        choices = event.get("choices") or [{}]
+        content = (choices[0].get("delta") or {}).get("content")
+        if content:
+            yield content
+
+
+def iter_sdk_deltas(chunks):
+    """读取SDK(openai/zhipuai)流式返回的增量文本，兼容dict和对象两种chunk"""
+    for chunk in chunks:
+        choices = chunk["choices"] if isinstance(chunk, dict) else chunk.choices
+        if not choices:
+            continue
+        delta = choices[0]["delta"] if isinstance(choices[0], dict) else choices[0].delta
+        content = delta.get("content") if isinstance(delta, dict) else getattr(delta, "content", None)
+        if content:
+            yield content
+
+
+def stream_reply(open_stream, context, log_prefix="[chat_stream]"):
+    """消费流式输出并逐段发送
+
+    :param open_stream: 发起流式请求的函数，返回(增量文本迭代器, 关闭连接的函数或None)
+    :return: {"total_tokens", "completion_tokens", "content": 完整回复, "final": 留给调用方返回的最后一个片段}；
+             尚未发送任何片段就失败或没有输出时返回None，调用方应改用非流式请求
+    """
+    channel = context["channel"]
+    cancel_token = context.get("cancel_token")
+    chunker = TextChunker(
+        conf().get("stream_reply_mode", "paragraph"),
+        conf().get("stream_reply_min_chars", 50),
+        conf().get("stream_reply_max_chars", 500),
+    )
+    parts, pending, sent = [], None, 0
+    close = None
+    try:
+        deltas, close = open_stream()
+        if cancel_token is not None and close is not None:
+            # 取消时直接关闭连接，中断阻塞中的读取
+            cancel_token.add_callback(close)
+        for delta in deltas:
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            parts.append(delta)
+            for chunk in chunker.feed(delta):
+                # 始终保留最新的一个片段，保证最终回复不为空
+                if pending is not None:
+                    channel.send_stream_chunk(context, pending)
+                    sent += 1
+                pending = chunk
+    except Exception as e:
+        if cancel_token is not None and cancel_token.cancelled or isinstance(e, RequestCancelled):
+            raise RequestCancelled()
+        if sent == 0:
+            logger.warning("{} stream failed, fallback to normal request: {}".format(log_prefix, e))
+            return None
+        logger.warning("{} stream interrupted after {} chunks: {}".format(log_prefix, sent, e))
+    finally:
+        if cancel_token is not None and close is not None:
+            cancel_token.remove_callback(close)
+
+    content = "".join(parts)
+    if not content.strip() and sent == 0:
+        return None
+    context["stream_content"] = content  # 完整回复，供合并请求的等待方使用
+    rest = chunker.flush()
+    if pending is not None and rest:
+        channel.send_stream_chunk(context, pending)
+        sent += 1
+        final = rest
+    else:
+        final = pending if pending is not None else rest
+    metrics.get_counter("chat_stream").inc("replies")
+    metrics.get_counter("chat_stream").inc("chunks", sent + 1)
+    return {
+        "total_tokens": None,  # 流式响应不返回token用量，由会话自行计算
+        "completion_tokens": None,
+        "streamed": True,  # 回复已流式发送成功，调用方据此判断而非completion_tokens
+        "content": content,
+        "final": final,
+    }
@@ -7,12 +7,13 @@ import openai
 import openai.error
 import requests
 from common import const
+from bot import chat_stream
 from bot.bot import Bot
 from bot.chatgpt.chat_gpt_session import ChatGPTSession
 from bot.openai.open_ai_image import OpenAIImage
 from bot.openai.open_ai_vision import OpenAIVision
 from bot.session_manager import SessionManager
-from bridge.context import ContextType
+from bridge.context import ContextType, RequestCancelled
 from bridge.reply import Reply, ReplyType
 from common.log import logger
 from common.token_bucket import TokenBucket
@@ -82,11 +83,22 @@ class ChatGPTBot(Bot, OpenAIImage, OpenAIVision):
             if model:
                 new_args = self.args.copy()
                 new_args["model"] = model
-            # if context.get('stream'):
-            #     # reply in stream
-            #     return self.reply_text_stream(query, new_query, session_id)
-
-            reply_content = self.reply_text(session_id, session, api_key, args=new_args)
+            reply_content = None
+            token_taken = False
+            try:
+                if chat_stream.get_stream_channel(context) and self._take_rate_limit_token():
+                    # reply in stream, falls back to a normal request if nothing was sent;
+                    # the rate limit token is taken once for both paths
+                    token_taken = True
+                    reply_content = self.reply_text_stream(session_id, session, context, api_key, args=new_args)
+                if reply_content is None:
+                    reply_content = self.reply_text(
+                        session_id, session, api_key, args=new_args, cancel_token=context.get("cancel_token"), token_taken=token_taken
+                    )
+            except RequestCancelled:
+                # the cancelled query gets no answer, drop it so the next turn does not see a dangling question
+                self.sessions.session_discard_query(session_id)
+                raise
             logger.debug(
                 "[CHATGPT] new_query={}, session_id={}, reply_cont={}, completion_tokens={}".format(
                     session.messages,
@@ -97,9 +109,9 @@ class ChatGPTBot(Bot, OpenAIImage, OpenAIVision):
             )
             if reply_content["completion_tokens"] == 0 and len(reply_content["content"]) > 0:
                 reply = Reply(ReplyType.ERROR, reply_content["content"])
-            elif reply_content["completion_tokens"] > 0:
+            elif reply_content.get("streamed") or reply_content["completion_tokens"] > 0:
                 self.sessions.session_reply(reply_content["content"], session_id, reply_content["total_tokens"])
-                reply = Reply(ReplyType.TEXT, reply_content["content"])
+                reply = Reply(ReplyType.TEXT, reply_content.get("final", reply_content["content"]))
             else:
                 reply = Reply(ReplyType.ERROR, reply_content["content"])
                 logger.debug("[CHATGPT] reply {} used 0 tokens.".format(reply_content))
@@ -117,16 +129,39 @@ class ChatGPTBot(Bot, OpenAIImage, OpenAIVision):
             reply = Reply(ReplyType.ERROR, "Bot不支持处理{}类型的消息".format(context.type))
             return reply
 
-    def reply_text(self, session_id: str, session: ChatGPTSession, api_key=None, args=None, retry_count=0) -> dict:
+    def reply_text_stream(self, session_id: str, session: ChatGPTSession, context, api_key=None, args=None):
+        """
+        call openai's ChatCompletion with stream=True, sending finished paragraphs through the channel
+        :return: same dict as reply_text plus "final" and "streamed", or None to fall back to reply_text
+        """
+        if args is None:
+            args = self.args
+        if session_id in memory.USER_IMAGE_CACHE:  # vision request is not streamed
+            return None
+
+        def open_stream():
+            response = openai.ChatCompletion.create(api_key=api_key, messages=session.messages, stream=True, **args)
+            return chat_stream.iter_sdk_deltas(response), None
+
+        return chat_stream.stream_reply(open_stream, context, "[CHATGPT]")
+
+    def _take_rate_limit_token(self):
+        return not conf().get("rate_limit_chatgpt") or self.tb4chatgpt.get_token()
+
+    def reply_text(self, session_id: str, session: ChatGPTSession, api_key=None, args=None, retry_count=0, cancel_token=None, token_taken=False) -> dict:
         """
         call openai's ChatCompletion to get the answer
         :param session: a conversation session
         :param session_id: session id
         :param retry_count: retry count
+        :param cancel_token: cancel token of the context, checked before and after the request
+        :param token_taken: the rate limit token was already taken by the caller for this attempt
         :return: {}
         """
         try:
-            if conf().get("rate_limit_chatgpt") and not self.tb4chatgpt.get_token():
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            if not token_taken and not self._take_rate_limit_token():
                 raise openai.error.RateLimitError("RateLimitError: rate limit exceeded")
             # if api_key == None, the default openai.api_key will be used
             if args is None:
@@ -135,6 +170,8 @@ class ChatGPTBot(Bot, OpenAIImage, OpenAIVision):
             if res:
                 return res
             response = openai.ChatCompletion.create(api_key=api_key, messages=session.messages, **args)
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
             # logger.debug("[CHATGPT] response={}".format(response))
             # logger.info("[ChatGPT] reply={}, total_tokens={}".format(response.choices[0]['message']['content'], response["usage"]["total_tokens"]))
             content = response.choices[0]["message"]["content"]
@@ -184,6 +221,9 @@ class ChatGPTBot(Bot, OpenAIImage, OpenAIVision):
                 "completion_tokens": response["usage"]["completion_tokens"],
                 "content": content,
             }
+        except RequestCancelled:
+            logger.info("[CHATGPT] request cancelled, session_id={}".format(session_id))
+            raise
         except Exception as e:
             need_retry = retry_count < 2
             result = {"completion_tokens": 0, "content": "我现在有点累了，等会再来吧"}
@@ -191,22 +231,22 @@ class ChatGPTBot(Bot, OpenAIImage, OpenAIVision):
                 logger.warn("[CHATGPT] RateLimitError: {}".format(e))
                 result["content"] = "提问太快啦，请休息一下再问我吧"
                 if need_retry:
-                    time.sleep(20)
+                    self._retry_wait(20, cancel_token)
             elif isinstance(e, openai.error.Timeout):
                 logger.warn("[CHATGPT] Timeout: {}".format(e))
                 result["content"] = "我没有收到你的消息"
                 if need_retry:
-                    time.sleep(5)
+                    self._retry_wait(5, cancel_token)
             elif isinstance(e, openai.error.APIError):
                 logger.warn("[CHATGPT] Bad Gateway: {}".format(e))
                 result["content"] = "请再问我一次"
                 if need_retry:
-                    time.sleep(10)
+                    self._retry_wait(10, cancel_token)
             elif isinstance(e, openai.error.APIConnectionError):
                 logger.warn("[CHATGPT] APIConnectionError: {}".format(e))
                 result["content"] = "我连接不到你的网络"
                 if need_retry:
-                    time.sleep(5)
+                    self._retry_wait(5, cancel_token)
             else:
                 logger.exception("[CHATGPT] Exception: {}".format(e))
                 need_retry = False
@@ -214,10 +254,17 @@ class ChatGPTBot(Bot, OpenAIImage, OpenAIVision):
 
             if need_retry:
                 logger.warn("[CHATGPT] 第{}次重试".format(retry_count + 1))
-                return self.reply_text(session_id, session, api_key, args, retry_count + 1)
+                return self.reply_text(session_id, session, api_key, args, retry_count + 1, cancel_token)
             else:
                 return result
 
+    def _retry_wait(self, seconds, cancel_token=None):
+        # 重试前等待，期间请求被取消则立即结束
+        if cancel_token is None:
+            time.sleep(seconds)
+        elif cancel_token.wait(seconds):
+            raise RequestCancelled()
+
 
 class AzureChatGPTBot(ChatGPTBot):
     def __init__(self):
@@ -3,6 +3,7 @@
 import time
 import openai
 
+from bot import chat_stream
 from bot.bot import Bot
 from bot.deepseek.deepseek_session import DeepseekSession
 from bot.session_manager import SessionManager
@@ -54,14 +55,21 @@ class DeepseekBot(Bot):
                     
                 session = self.sessions.session_query(query, session_id)
                 
-                reply_content = self.reply_text(session)
+                reply_content, final = None, None
+                if chat_stream.get_stream_channel(context):
+                    # 流式回复，未发送任何片段就失败时改用普通请求
+                    result = self.reply_text_stream(session, context)
+                    if result:
+                        reply_content, final = result["content"], result["final"]
+                if reply_content is None:
+                    reply_content = self.reply_text(session)
                 
                 if reply_content:
                     # 将回复添加到会话中
                     session.add_reply(reply_content)
                     
                     logger.info("[DEEPSEEK] new reply={}".format(reply_content))
-                    reply = Reply(ReplyType.TEXT, reply_content)
+                    reply = Reply(ReplyType.TEXT, final or reply_content)
                 else:
                     logger.error("[DEEPSEEK] reply content is empty")
                     reply = Reply(ReplyType.ERROR, "对不起，我没有得到有效的回复。")
@@ -73,6 +81,14 @@ class DeepseekBot(Bot):
                 return reply
         return Reply(ReplyType.ERROR, "处理消息失败")
 
+    def reply_text_stream(self, session: DeepseekSession, context):
+        """使用Deepseek API流式生成回复，完整的段落直接发送"""
+        def open_stream():
+            response = openai.ChatCompletion.create(messages=session.get_messages(), stream=True, **self.args)
+            return chat_stream.iter_sdk_deltas(response), None
+
+        return chat_stream.stream_reply(open_stream, context, "[DEEPSEEK]")
+
     def reply_text(self, session: DeepseekSession, retry_count=0):
         """使用Deepseek API生成回复"""
         try:
@@ -12,8 +12,9 @@ from urllib.parse import urlparse, unquote
 from bot.bot import Bot
 from lib.dify.dify_client import DifyClient, ChatClient
 from bot.dify.dify_session import DifySession, DifySessionManager
-from bridge.context import ContextType, Context
+from bridge.context import ContextType, Context, RequestCancelled
 from bridge.reply import Reply, ReplyType
+from common.fetcher import get_fetcher
 from common.log import logger
 from common import const, memory
 from common.utils import parse_markdown_text, print_red
@@ -108,6 +109,8 @@ class DifyBot(Bot):
                 friendly_error_msg = "[DIFY] 请检查 config.json 中的 dify_app_type 设置，目前仅支持 agent, chatbot, chatflow, workflow"
                 return None, friendly_error_msg
 
+        except RequestCancelled:
+            raise
         except Exception as e:
             error_info = f"[DIFY] Exception: {e}"
             logger.exception(error_info)
@@ -120,6 +123,7 @@ class DifyBot(Bot):
         response_mode = 'blocking'
         payload = self._get_payload(query, session, response_mode)
         files = self._get_upload_files(session, context)
+        self._raise_if_cancelled(context)
         response = chat_client.create_chat_message(
             inputs=payload['inputs'],
             query=payload['query'],
@@ -128,6 +132,7 @@ class DifyBot(Bot):
             conversation_id=payload['conversation_id'],
             files=files
         )
+        self._raise_if_cancelled(context)
 
         if response.status_code != 200:
             error_info = f"[DIFY] payload={payload} response text={response.text} status_code={response.status_code}"
@@ -217,8 +222,6 @@ class DifyBot(Bot):
 
     def _download_file(self, url):
         try:
-            response = requests.get(url)
-            response.raise_for_status()
             parsed_url = urlparse(url)
             logger.debug(f"Downloading file from {url}")
             url_path = unquote(parsed_url.path)
@@ -226,8 +229,7 @@ class DifyBot(Bot):
             file_name = url_path.split('/')[-1]
             logger.debug(f"Saving file as {file_name}")
             file_path = os.path.join(TmpDir().path(), file_name)
-            with open(file_path, 'wb') as file:
-                file.write(response.content)
+            get_fetcher().fetch_to(url, file_path)
             return file_path
         except Exception as e:
             logger.error(f"Error downloading {url}: {e}")
@@ -235,14 +237,9 @@ class DifyBot(Bot):
 
     def _download_image(self, url):
         try:
-            pic_res = requests.get(url, stream=True)
-            pic_res.raise_for_status()
-            image_storage = io.BytesIO()
-            size = 0
-            for block in pic_res.iter_content(1024):
-                size += len(block)
-                image_storage.write(block)
-            logger.debug(f"[WX] download image success, size={size}, img_url={url}")
+            result = get_fetcher().fetch(url)
+            image_storage = io.BytesIO(result.read())
+            logger.debug(f"[WX] download image success, size={result.size}, img_url={url}")
             image_storage.seek(0)
             return image_storage
         except Exception as e:
@@ -256,6 +253,7 @@ class DifyBot(Bot):
         response_mode = 'streaming'
         payload = self._get_payload(query, session, response_mode)
         files = self._get_upload_files(session, context)
+        self._raise_if_cancelled(context)
         response = chat_client.create_chat_message(
             inputs=payload['inputs'],
             query=payload['query'],
@@ -264,6 +262,7 @@ class DifyBot(Bot):
             conversation_id=payload['conversation_id'],
             files=files
         )
+        self._raise_if_cancelled(context)
 
         if response.status_code != 200:
             error_info = f"[DIFY] payload={payload} response text={response.text} status_code={response.status_code}"
@@ -275,7 +274,7 @@ class DifyBot(Bot):
         # data: {"event": "agent_thought", "id": "8dcf3648-fbad-407a-85dd-73a6f43aeb9f", "task_id": "9cf1ddd7-f94b-459b-b942-b77b26c59e9b", "message_id": "1fb10045-55fd-4040-99e6-d048d07cbad3", "position": 1, "thought": "", "observation": "", "tool": "dalle3", "tool_input": "{\"dalle3\": {\"prompt\": \"cute Japanese anime girl with white hair, blue eyes, bunny girl suit\"}}", "created_at": 1705639511, "message_files": [], "conversation_id": "c216c595-2d89-438c-b33c-aae5ddddd142"}
         # data: {"event": "agent_message", "id": "1fb10045-55fd-4040-99e6-d048d07cbad3", "task_id": "9cf1ddd7-f94b-459b-b942-b77b26c59e9b", "message_id": "1fb10045-55fd-4040-99e6-d048d07cbad3", "answer": "I have created an image of a cute Japanese", "created_at": 1705639511, "conversation_id": "c216c595-2d89-438c-b33c-aae5ddddd142"}
         # data: {"event": "message_end", "task_id": "9cf1ddd7-f94b-459b-b942-b77b26c59e9b", "id": "1fb10045-55fd-4040-99e6-d048d07cbad3", "message_id": "1fb10045-55fd-4040-99e6-d048d07cbad3", "conversation_id": "c216c595-2d89-438c-b33c-aae5ddddd142", "metadata": {"usage": {"prompt_tokens": 305, "prompt_unit_price": "0.001", "prompt_price_unit": "0.001", "prompt_price": "0.0003050", "completion_tokens": 97, "completion_unit_price": "0.002", "completion_price_unit": "0.001", "completion_price": "0.0001940", "total_tokens": 184, "total_price": "0.0002290", "currency": "USD", "latency": 1.771092874929309}}}
-        msgs, conversation_id = self._handle_sse_response(response)
+        msgs, conversation_id = self._handle_sse_response(response, context.get("cancel_token"))
         channel = context.get("channel")
         # TODO: 适配除微信以外的其他channel
         is_group = context.get("isgroup", False)
@@ -430,15 +429,36 @@ class DifyBot(Bot):
             logger.warning("Received an empty SSE event.")
             return None
 
+    def _raise_if_cancelled(self, context: Context):
+        if context is not None and context.is_cancelled():
+            logger.info("[DIFY] request cancelled, session_id={}".format(context.get("session_id")))
+            raise RequestCancelled()
+
     # TODO: 异步返回events
-    def _handle_sse_response(self, response: requests.Response):
+    def _handle_sse_response(self, response: requests.Response, cancel_token=None):
         events = []
-        for line in response.iter_lines():
-            if line:
-                decoded_line = line.decode('utf-8')
-                event = self._parse_sse_event(decoded_line)
-                if event:
-                    events.append(event)
+        if cancel_token is not None:
+            # 取消时直接关闭连接，中断阻塞中的iter_lines
+            cancel_token.add_callback(response.close)
+        try:
+            for line in response.iter_lines():
+                if cancel_token is not None and cancel_token.cancelled:
+                    break
+                if line:
+                    decoded_line = line.decode('utf-8')
+                    event = self._parse_sse_event(decoded_line)
+                    if event:
+                        events.append(event)
+        except Exception:
+            # 连接被取消回调关闭时iter_lines会抛出异常，此时按取消处理
+            if cancel_token is None or not cancel_token.cancelled:
+                raise
+        finally:
+            if cancel_token is not None:
+                cancel_token.remove_callback(response.close)
+        if cancel_token is not None and cancel_token.cancelled:
+            logger.info("[DIFY] sse response cancelled")
+            raise RequestCancelled()
 
         merged_message = []
         accumulated_agent_message = ''
@@ -16,7 +16,7 @@ import os
 import time
 from typing import List, Dict, Any, Optional, Union
 
-from bridge.context import ContextType
+from bridge.context import ContextType, RequestCancelled
 from bridge.reply import Reply, ReplyType
 from bot.bot import Bot
 from bot.session_manager import SessionManager
@@ -100,6 +100,10 @@ class GoogleGeminiBot(Bot):
                 logger.warn(f"[Gemini] 不支持的消息类型: {context.type}")
                 return Reply(ReplyType.TEXT, f"暂不支持 {context.type} 类型的消息")
                 
+        except RequestCancelled:
+            # 被取消的提问不会有回复，从会话中撤销，避免下一轮带上没有回答的提问
+            self.sessions.session_discard_query(context.get("session_id"))
+            raise
         except Exception as e:
             logger.error(f"[Gemini] 处理消息时发生错误: {e}", exc_info=True)
             return Reply(ReplyType.TEXT, f"处理消息时发生错误: {str(e)}")
@@ -118,6 +122,8 @@ class GoogleGeminiBot(Bot):
                 # 纯文本处理
                 return self._generate_content([query], session, context)
                     
+        except RequestCancelled:
+            raise
         except Exception as e:
             logger.error(f"[Gemini] 处理文本消息错误: {e}")
             return Reply(ReplyType.TEXT, f"处理文本消息时发生错误: {str(e)}")
@@ -145,6 +151,8 @@ class GoogleGeminiBot(Bot):
             
             return response
             
+        except RequestCancelled:
+            raise
         except Exception as e:
             logger.error(f"[Gemini] 处理图片消息错误: {e}")
             return Reply(ReplyType.TEXT, f"处理图片时发生错误: {str(e)}")
@@ -180,6 +188,8 @@ class GoogleGeminiBot(Bot):
             
             return response
             
+        except RequestCancelled:
+            raise
         except Exception as e:
             logger.error(f"[Gemini] 处理文件消息错误: {e}")
             return Reply(ReplyType.TEXT, f"处理文件时发生错误: {str(e)}")
@@ -229,6 +239,8 @@ class GoogleGeminiBot(Bot):
             
             return response
             
+        except RequestCancelled:
+            raise
         except Exception as e:
             logger.error(f"[Gemini] 处理多模态消息错误: {e}")
             # 清理缓存并回退到文本处理
@@ -415,11 +427,16 @@ class GoogleGeminiBot(Bot):
             
             # 发送请求
             logger.debug(f"[Gemini] 发送内容数量: {len(final_contents)}")
+            if context.is_cancelled():
+                raise RequestCancelled()
             response = self.client.models.generate_content(
                 model=self.model,
                 contents=final_contents,
                 config=config
             )
+            # 请求期间会话被取消，丢弃结果且不写入会话历史
+            if context.is_cancelled():
+                raise RequestCancelled()
             
             if response and hasattr(response, 'candidates') and response.candidates:
                 # 处理多模态响应（可能包含文本和图片）
@@ -500,6 +517,8 @@ class GoogleGeminiBot(Bot):
                 logger.warn(f"[Gemini] 生成内容为空")
                 return Reply(ReplyType.TEXT, "抱歉，我无法生成回复")
                 
+        except RequestCancelled:
+            raise
         except Exception as e:
             logger.error(f"[Gemini] 生成内容错误: {e}")
             return Reply(ReplyType.TEXT, f"生成回复时发生错误: {str(e)}")
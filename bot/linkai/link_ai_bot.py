@@ -14,6 +14,7 @@ from common.log import logger
 from config import conf, pconf
 import threading
 from common import memory, utils
+from common.fetcher import get_fetcher
 import base64
 import os
 
@@ -432,9 +433,7 @@ def _download_file(url: str):
             os.makedirs(file_path)
         file_name = url.split("/")[-1]  # 获取文件名
         file_path = os.path.join(file_path, file_name)
-        response = requests.get(url)
-        with open(file_path, "wb") as f:
-            f.write(response.content)
+        get_fetcher().fetch_to(url, file_path)
         return file_path
     except Exception as e:
         logger.warn(e)
@@ -4,6 +4,7 @@ import time
 import json
 import openai
 import openai.error
+from bot import chat_stream
 from bot.bot import Bot
 from bot.session_manager import SessionManager
 from bridge.context import ContextType
@@ -61,9 +62,13 @@ class ModelScopeBot(Bot):
             if model:
                 new_args["model"] = model
 
-            if new_args["model"] == "Qwen/QwQ-32B":
+            reply_content = None
+            if chat_stream.get_stream_channel(context):
+                # 流式回复，完整的段落直接发送，未发送任何片段就失败时改用下面的请求
+                reply_content = self.reply_text_progressive(session, context, args=new_args)
+            if reply_content is None and new_args["model"] == "Qwen/QwQ-32B":
                 reply_content = self.reply_text_stream(session, args=new_args)
-            else:
+            elif reply_content is None:
                 reply_content = self.reply_text(session, args=new_args)
 
             logger.debug(
@@ -80,9 +85,9 @@ class ModelScopeBot(Bot):
                     reply = Reply(ReplyType.ERROR, reply_content["content"])
                 else:
                     reply = Reply(ReplyType.TEXT, reply_content["content"])
-            elif reply_content["completion_tokens"] > 0:
+            elif reply_content.get("streamed") or reply_content["completion_tokens"] > 0:
                 self.sessions.session_reply(reply_content["content"], session_id, reply_content["total_tokens"])
-                reply = Reply(ReplyType.TEXT, reply_content["content"])
+                reply = Reply(ReplyType.TEXT, reply_content.get("final", reply_content["content"]))
             else:
                 reply = Reply(ReplyType.ERROR, reply_content["content"])
                 logger.debug("[MODELSCOPE_AI] reply {} used 0 tokens.".format(reply_content))
@@ -167,6 +172,23 @@ class ModelScopeBot(Bot):
             else:
                 return result
 
+    def reply_text_progressive(self, session: ModelScopeSession, context, args=None):
+        """
+        call ModelScope's ChatCompletion with stream=True, sending finished paragraphs through the channel
+        :return: same dict as reply_text plus "final" and "streamed", or None to fall back to a normal request
+        """
+        def open_stream():
+            headers = {
+                "Content-Type": "application/json",
+                "Authorization": "Bearer " + self.api_key
+            }
+            body = dict(args or self.args, messages=session.messages, stream=True)
+            res = requests.post(self.base_url, headers=headers, json=body, stream=True)
+            res.raise_for_status()
+            return chat_stream.iter_sse_deltas(res), res.close
+
+        return chat_stream.stream_reply(open_stream, context, "[MODELSCOPE_AI]")
+
     def reply_text_stream(self, session: ModelScopeSession, args=None, retry_count=0) -> dict:
         """
         call ModelScope's ChatCompletion to get the answer with stream response
@@ -192,18 +214,7 @@ class ModelScopeBot(Bot):
                 stream=True
             )
             if res.status_code == 200:
-                content = ""
-                for line in res.iter_lines():
-                    if line:
-                        decoded_line = line.decode('utf-8')
-                        if decoded_line.startswith("data: "):
-                            try:
-                                json_data = json.loads(decoded_line[6:])
-                                delta_content = json_data.get("choices", [{}])[0].get("delta", {}).get("content", "")
-                                if delta_content:
-                                    content += delta_content
-                            except json.JSONDecodeError as e:
-                                pass
+                content = "".join(chat_stream.iter_sse_deltas(res))
                 return {
                     "total_tokens": 1,  # 流式响应通常不返回token使用情况
                     "completion_tokens": 1,
@@ -4,6 +4,7 @@ import time
 
 import openai
 import openai.error
+from bot import chat_stream
 from bot.bot import Bot
 from bot.session_manager import SessionManager
 from bridge.context import ContextType
@@ -56,11 +57,12 @@ class MoonshotBot(Bot):
             new_args = self.args.copy()
             if model:
                 new_args["model"] = model
-            # if context.get('stream'):
-            #     # reply in stream
-            #     return self.reply_text_stream(query, new_query, session_id)
-
-            reply_content = self.reply_text(session, args=new_args)
+            reply_content = None
+            if chat_stream.get_stream_channel(context):
+                # reply in stream, falls back to a normal request if nothing was sent
+                reply_content = self.reply_text_stream(session, context, args=new_args)
+            if reply_content is None:
+                reply_content = self.reply_text(session, args=new_args)
             logger.debug(
                 "[MOONSHOT_AI] new_query={}, session_id={}, reply_cont={}, completion_tokens={}".format(
                     session.messages,
@@ -71,9 +73,9 @@ class MoonshotBot(Bot):
             )
             if reply_content["completion_tokens"] == 0 and len(reply_content["content"]) > 0:
                 reply = Reply(ReplyType.ERROR, reply_content["content"])
-            elif reply_content["completion_tokens"] > 0:
+            elif reply_content.get("streamed") or reply_content["completion_tokens"] > 0:
                 self.sessions.session_reply(reply_content["content"], session_id, reply_content["total_tokens"])
-                reply = Reply(ReplyType.TEXT, reply_content["content"])
+                reply = Reply(ReplyType.TEXT, reply_content.get("final", reply_content["content"]))
             else:
                 reply = Reply(ReplyType.ERROR, reply_content["content"])
                 logger.debug("[MOONSHOT_AI] reply {} used 0 tokens.".format(reply_content))
@@ -82,6 +84,23 @@ class MoonshotBot(Bot):
             reply = Reply(ReplyType.ERROR, "Bot不支持处理{}类型的消息".format(context.type))
             return reply
 
+    def reply_text_stream(self, session: MoonshotSession, context, args=None):
+        """
+        call moonshot's chat completions with stream=True, sending finished paragraphs through the channel
+        :return: same dict as reply_text plus "final" and "streamed", or None to fall back to reply_text
+        """
+        def open_stream():
+            headers = {
+                "Content-Type": "application/json",
+                "Authorization": "Bearer " + self.api_key
+            }
+            body = dict(args or self.args, messages=session.messages, stream=True)
+            res = requests.post(self.base_url, headers=headers, json=body, stream=True)
+            res.raise_for_status()
+            return chat_stream.iter_sse_deltas(res), res.close
+
+        return chat_stream.stream_reply(open_stream, context, "[MOONSHOT_AI]")
+
     def reply_text(self, session: MoonshotSession, args=None, retry_count=0) -> dict:
         """
         call openai's ChatCompletion to get the answer
@@ -64,6 +64,7 @@ class SessionManager(object):
     def session_query(self, query, session_id):
         session = self.build_session(session_id)
         session.add_query(query)
+        session.pending_query = session.messages[-1] if session.messages else None
         try:
             max_tokens = conf().get("conversation_max_tokens", 1000)
             total_tokens = session.discard_exceeding(max_tokens, None)
@@ -72,6 +73,14 @@ class SessionManager(object):
             logger.warning("Exception when counting tokens precisely for prompt: {}".format(str(e)))
         return session
 
+    def session_discard_query(self, session_id):
+        """撤销最近一次session_query加入的提问，用于请求被取消、不会有回复的情况，避免下一轮对话带上没有回答的提问"""
+        session = self.sessions.get(session_id) if session_id is not None else None
+        pending = getattr(session, "pending_query", None)
+        if pending is not None and session.messages and session.messages[-1] is pending:
+            session.messages.pop()
+            session.pending_query = None
+
     def session_reply(self, reply, session_id, total_tokens=None):
         session = self.build_session(session_id)
         session.add_reply(reply)
@@ -4,6 +4,7 @@ import time
 
 import openai
 import openai.error
+from bot import chat_stream
 from bot.bot import Bot
 from bot.zhipuai.zhipu_ai_session import ZhipuAISession
 from bot.zhipuai.zhipu_ai_image import ZhipuAIImage
@@ -55,11 +56,12 @@ class ZHIPUAIBot(Bot, ZhipuAIImage):
             if model:
                 new_args = self.args.copy()
                 new_args["model"] = model
-            # if context.get('stream'):
-            #     # reply in stream
-            #     return self.reply_text_stream(query, new_query, session_id)
-
-            reply_content = self.reply_text(session, api_key, args=new_args)
+            reply_content = None
+            if chat_stream.get_stream_channel(context):
+                # reply in stream, falls back to a normal request if nothing was sent
+                reply_content = self.reply_text_stream(session, context, args=new_args)
+            if reply_content is None:
+                reply_content = self.reply_text(session, api_key, args=new_args)
             logger.debug(
                 "[ZHIPU_AI] new_query={}, session_id={}, reply_cont={}, completion_tokens={}".format(
                     session.messages,
@@ -70,9 +72,9 @@ class ZHIPUAIBot(Bot, ZhipuAIImage):
             )
             if reply_content["completion_tokens"] == 0 and len(reply_content["content"]) > 0:
                 reply = Reply(ReplyType.ERROR, reply_content["content"])
-            elif reply_content["completion_tokens"] > 0:
+            elif reply_content.get("streamed") or reply_content["completion_tokens"] > 0:
                 self.sessions.session_reply(reply_content["content"], session_id, reply_content["total_tokens"])
-                reply = Reply(ReplyType.TEXT, reply_content["content"])
+                reply = Reply(ReplyType.TEXT, reply_content.get("final", reply_content["content"]))
             else:
                 reply = Reply(ReplyType.ERROR, reply_content["content"])
                 logger.debug("[ZHIPU_AI] reply {} used 0 tokens.".format(reply_content))
@@ -90,6 +92,17 @@ class ZHIPUAIBot(Bot, ZhipuAIImage):
             reply = Reply(ReplyType.ERROR, "Bot不支持处理{}类型的消息".format(context.type))
             return reply
 
+    def reply_text_stream(self, session: ZhipuAISession, context, args=None):
+        """
+        call ZhipuAI's chat completions with stream=True, sending finished paragraphs through the channel
+        :return: same dict as reply_text plus "final" and "streamed", or None to fall back to reply_text
+        """
+        def open_stream():
+            response = self.client.chat.completions.create(messages=session.messages, stream=True, **(args or self.args))
+            return chat_stream.iter_sdk_deltas(response), None
+
+        return chat_stream.stream_reply(open_stream, context, "[ZHIPU_AI]")
+
     def reply_text(self, session: ZhipuAISession, api_key=None, args=None, retry_count=0) -> dict:
         """
         call openai's ChatCompletion to get the answer
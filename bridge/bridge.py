@@ -1,12 +1,20 @@
 from bot.bot_factory import create_bot
 from bridge.context import Context
-from bridge.reply import Reply
-from common import const
+import json
+import os
+import time
+
+from bridge import reply_cache
+from bridge.request_coalescer import coalesce_key, coalescer
+from bridge.reply import Reply, ReplyType
+from common import const, media_pool
 from common.log import logger
 from common.singleton import singleton
+from common.tmp_dir import TmpDir
 from config import conf
 from translate.factory import create_translator
 from voice.factory import create_voice
+from voice.tts_cache import get_tts_cache
 
 
 @singleton
@@ -90,13 +98,90 @@ class Bridge(object):
         return self.btype[typename]
 
     def fetch_reply_content(self, query, context: Context) -> Reply:
-        return self.get_bot("chat").reply(query, context)
+        cache = reply_cache.get_reply_cache()
+        key = reply_cache.reply_cache_key(query, context, self.btype["chat"]) if cache is not None else None
+        if key:
+            context["no_stream"] = True  # 缓存保存完整回复，不分段流式发送
+            hit = cache.get(key)
+            if hit:
+                text, latency = hit
+                reply_cache.record_hit(latency)
+                logger.info(f"[bridge] 回复命中缓存, query={query}")
+                return Reply(ReplyType.TEXT, text)
+            reply_cache.record_miss()
+        start = time.time()
+        reply = self._coalesced_reply(query, context)
+        if key and reply and reply.type == ReplyType.TEXT and reply.content:
+            cache.put(key, reply.content, time.time() - start)
+        return reply
+
+    def _coalesced_reply(self, query, context: Context) -> Reply:
+        key = coalesce_key(query, context, self.btype["chat"])
+        if not key:
+            return self.get_bot("chat").reply(query, context)
+
+        def snapshot(reply):
+            # 在唤醒等待方之前复制内容：首个请求方返回后会原地装饰自己的Reply(加@和前缀)；
+            # 首个请求方流式发送时，bot返回的只是最后一个片段，等待方需要完整回复
+            if reply is None:
+                return None
+            content = context.get("stream_content", reply.content) if reply.type == ReplyType.TEXT else reply.content
+            return reply.type, content
+
+        result, shared = coalescer.run(
+            key, lambda: self.get_bot("chat").reply(query, context), conf().get("request_coalescing_timeout", 120), snapshot
+        )
+        if not shared:
+            return result
+        logger.info(f"[bridge] 合并相同提问, session_id={context.get('session_id')}, query={query}")
+        # 每个请求方各自装饰、发送，只从快照构造新的Reply
+        return Reply(*result) if result else None
 
     def fetch_voice_to_text(self, voiceFile) -> Reply:
         return self.get_bot("voice_to_text").voiceToText(voiceFile)
 
+    def fetch_voice_stream_to_text(self, frames, sample_rate=16000) -> Reply:
+        return self.get_bot("voice_to_text").voiceStreamToText(frames, sample_rate)
+
+    def supports_streaming_asr(self) -> bool:
+        return self.get_bot("voice_to_text").supports_streaming_asr
+
     def fetch_text_to_voice(self, text) -> Reply:
-        return self.get_bot("text_to_voice").textToVoice(text)
+        cache = get_tts_cache()
+        bot = self.get_bot("text_to_voice")
+        # 引擎实际使用的音色、语速等设置(包括引擎自身config.json中的配置)参与缓存key，修改后不会命中旧音频
+        params = bot.cache_params() if cache is not None else None
+        key = None
+        if params is not None:
+            voice = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+            key = cache.key(self.btype["text_to_voice"], voice, text)
+        if key:
+            path = cache.get(key, TmpDir().path())
+            if path:
+                logger.debug(f"[bridge] 语音合成命中缓存: {path}")
+                return Reply(ReplyType.VOICE, path)
+        reply = bot.textToVoice(text)
+        if key and reply and reply.type == ReplyType.VOICE and os.path.isfile(reply.content):
+            reply.content = self._prepare_tts_file(reply.content)
+            cache.put(key, reply.content)
+        return reply
+
+    def _prepare_tts_file(self, path):
+        """wxpad只能发送SILK语音，缓存前先转码，命中缓存时直接发送，省去每次的转码"""
+        if conf().get("channel_type") != "wxpad" or path.lower().endswith((".silk", ".sil", ".slk")):
+            return path
+        try:
+            silk_data, duration_ms = media_pool.transcode_audio(path, "silk")
+        except Exception as e:
+            logger.warning(f"[bridge] 合成语音转SILK失败，缓存原始文件: {e}")
+            return path
+        if duration_ms > 60 * 1000:  # 超过一条语音的时长，发送时需要分段，保留原始文件
+            return path
+        silk_path = os.path.splitext(path)[0] + ".silk"
+        with open(silk_path, "wb") as f:
+            f.write(silk_data)
+        os.remove(path)
+        return silk_path
 
     def fetch_translate(self, text, from_lang="", to_lang="en") -> Reply:
         return self.get_bot("translate").translate(text, from_lang, to_lang)
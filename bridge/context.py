@@ -1,5 +1,6 @@
 # encoding:utf-8
 
+import threading
 from enum import Enum
 
 
@@ -27,7 +28,63 @@ class ContextType(Enum):
         return self.name
 
 
+class RequestCancelled(Exception):
+    """请求已被取消（会话被重置或被新消息取代）"""
+
+
+class CancelToken:
+    """协作式取消标记
+
+    channel在取消会话时调用cancel()，bot在发起请求前后、重试等待及读取流式响应时检查，
+    通过add_callback注册的回调（如关闭流式响应）会在取消时立即执行，以尽快释放线程和连接。
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def add_callback(self, callback):
+        """注册取消回调，已取消时立即执行"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def wait(self, timeout=None) -> bool:
+        """等待至多timeout秒，期间被取消则返回True，可用于替代重试前的time.sleep"""
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise RequestCancelled()
+
+
 class Context:
+    __slots__ = ("type", "content", "kwargs")
+
     def __init__(self, type: ContextType = None, content=None, kwargs=dict()):
         self.type = type
         self.content = content
@@ -71,5 +128,9 @@ class Context:
         else:
             del self.kwargs[key]
 
+    def is_cancelled(self) -> bool:
+        token = self.kwargs.get("cancel_token")
+        return token is not None and token.cancelled
+
     def __str__(self):
         return "Context(type={}, content={}, kwargs={})".format(self.type, self.content, self.kwargs)
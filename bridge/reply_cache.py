@@ -0,0 +1,103 @@
+"""
+群聊常见问题的回复缓存
+
+同一个群里不同成员反复问的问题（如"怎么报名"、"营业时间"）直接复用之前的文字回复，省去一次完整的模型调用。
+只缓存与上下文无关的短问题：key包含群、bot类型、模型、人设/应用和规范化后的问题，
+带指代或时间词、有待处理图片的问题不使用缓存。默认关闭，需要在配置中开启。
+"""
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from bridge.context import ContextType
+from common import const, memory, metrics
+from config import conf
+
+# 去掉问题首尾的标点和语气词，"怎么报名？"与"怎么报名"视为同一问题
+_TRIM_RE = re.compile(r"^[\s,.!?;:~，。！？；：～、…]+|[\s,.!?;:~，。！？；：～、…呢啊呀吗吧]+$")
+
+
+def normalize_query(query) -> str:
+    return _TRIM_RE.sub("", re.sub(r"\s+", " ", query or "").lower())
+
+
+class ReplyCache:
+    def __init__(self, capacity=1000, ttl=3600):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._items = OrderedDict()  # key -> (回复文本, 原始调用耗时, 写入时间)，按最近使用排序
+
+    def get(self, key):
+        """命中返回(回复文本, 原始调用耗时秒数)，未命中或已过期返回None"""
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and time.time() - item[2] > self.ttl:
+                del self._items[key]
+                item = None
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            return item[0], item[1]
+
+    def put(self, key, text, latency):
+        with self._lock:
+            self._items[key] = (text, latency, time.time())
+            self._items.move_to_end(key)
+            while len(self._items) > self.capacity:
+                self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
+def reply_cache_key(query, context, bot_type):
+    """生成缓存key，不满足缓存条件时返回None"""
+    if context is None or context.type != ContextType.TEXT or not context.get("isgroup", False):
+        return None
+    group_names = conf().get("reply_cache_group_names", ["ALL_GROUP"])
+    if context.get("group_name") not in group_names and "ALL_GROUP" not in group_names:
+        return None
+    text = normalize_query(query)
+    if not text or len(text) > conf().get("reply_cache_max_query_len", 40):
+        return None
+    if any(word and word in text for word in conf().get("reply_cache_bypass_keywords", [])):
+        return None
+    if context.get("session_id") in memory.USER_IMAGE_CACHE:  # 问题针对刚发送的图片
+        return None
+    scope = [
+        context.get("receiver"),
+        bot_type,
+        conf().get("model"),
+        conf().get("character_desc"),
+        conf().get("dify_api_key") if bot_type == const.DIFY else "",
+        conf().get("coze_bot_id") if bot_type == const.COZE else "",
+        text,
+    ]
+    return hashlib.sha1("\0".join(str(s or "") for s in scope).encode("utf-8")).hexdigest()
+
+
+def record_hit(latency):
+    metrics.get_counter("reply_cache").inc("hit")
+    metrics.get_histogram("reply_cache.saved").observe(latency)
+
+
+def record_miss():
+    metrics.get_counter("reply_cache").inc("miss")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_reply_cache():
+    """按配置返回全局缓存，未开启时返回None"""
+    global _cache
+    if not conf().get("reply_cache_enabled", False):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ReplyCache(conf().get("reply_cache_capacity", 1000), conf().get("reply_cache_ttl", 3600))
+        return _cache
@@ -0,0 +1,82 @@
+"""
+相同请求合并
+
+共享会话的群里热门话题会在短时间内出现大量相同的提问，每条都并行调用一次模型。
+相同key的请求正在进行时，后到的请求不再调用模型，而是等待第一个请求的结果，结果分发给所有请求方。
+"""
+import threading
+
+from bridge.context import ContextType
+from bridge.reply_cache import normalize_query
+from common import metrics
+from config import conf
+
+
+class _Call:
+    __slots__ = ("event", "result", "error", "waiters")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class RequestCoalescer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def run(self, key, fn, timeout=None, snapshot=None):
+        """执行fn或等待相同key正在进行的调用
+
+        :param snapshot: 把首个请求的结果转换为分发给等待方的快照，在唤醒等待方之前执行，
+                         之后首个请求方修改自己的结果对象不会影响等待方
+        :return: (结果, 是否为其他请求的共享结果)；等待超时或首个调用失败时自行调用fn
+        """
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+            else:
+                call.waiters += 1
+        if leader:
+            try:
+                result = fn()
+                call.result = snapshot(result) if snapshot else result
+                return result, False
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._inflight[key]
+                call.event.set()
+        counter = metrics.get_counter("request_coalescer")
+        if not call.event.wait(timeout) or call.error is not None:
+            counter.inc("fallback")
+            return fn(), False
+        counter.inc("coalesced")
+        return call.result, True
+
+    def inflight(self, key) -> int:
+        """正在等待key结果的请求数（不含首个请求），未在进行时返回-1"""
+        with self._lock:
+            call = self._inflight.get(key)
+            return -1 if call is None else call.waiters
+
+
+def coalesce_key(query, context, bot_type):
+    """只合并共享会话群中的文本提问，其他请求返回None"""
+    if not conf().get("request_coalescing", True):
+        return None
+    if context is None or context.type != ContextType.TEXT or not context.get("is_shared_session_group", False):
+        return None
+    text = normalize_query(query)
+    if not text:
+        return None
+    return f"{context.get('session_id')}\0{bot_type}\0{text}"
+
+
+coalescer = RequestCoalescer()
@@ -40,5 +40,8 @@ class Channel(object):
     def build_voice_to_text(self, voice_file) -> Reply:
         return Bridge().fetch_voice_to_text(voice_file)
 
+    def build_voice_stream_to_text(self, frames, sample_rate=16000) -> Reply:
+        return Bridge().fetch_voice_stream_to_text(frames, sample_rate)
+
     def build_text_to_voice(self, text) -> Reply:
         return Bridge().fetch_text_to_voice(text)
@@ -4,25 +4,32 @@ import threading
 import time
 from asyncio import CancelledError
 from concurrent.futures import Future, ThreadPoolExecutor
-import requests
 import json
 import uuid
 
 from bridge.context import *
+from bridge.bridge import Bridge
 from bridge.reply import *
 from channel.channel import Channel
 from common.dequeue import Dequeue
-from common import memory
+from common.fair_scheduler import FairScheduler
+from common.fetcher import get_fetcher
+from common.reorder_buffer import ReorderBuffer
+from common import media_pool, memory, metrics
 from plugins import *
 from database.group_members_db import get_group_member_from_db, save_group_members_to_db
-
-try:
-    from voice.audio_convert import any_to_wav
-except Exception as e:
-    pass
+from voice import audio_codec
+from voice.asr_cache import get_asr_cache
 
 handler_pool = ThreadPoolExecutor(max_workers=8)  # 处理消息的线程池
 
+DEFAULT_SCHEDULE_CLASSES = {
+    "command": {"priority": 0, "weight": 1},
+    "single": {"priority": 1, "weight": 2},
+    "group": {"priority": 1, "weight": 2},
+    "shared_group": {"priority": 1, "weight": 1},
+}
+
 def get_group_member_display_name(group_id, wxid, bot_wxid=None, api_base_url=None):
     """
     获取群成员的显示名称，优先显示名，无则昵称
@@ -93,10 +100,7 @@ def download_image_to_tmp(url):
     filename = f"{uuid.uuid4().hex}{ext}"
     save_path = os.path.join(tmp_dir, filename)
     try:
-        resp = requests.get(url, timeout=10)
-        resp.raise_for_status()
-        with open(save_path, "wb") as f:
-            f.write(resp.content)
+        get_fetcher().fetch_to(url, save_path, timeout=10)
         return save_path
     except Exception as e:
         logger.error(f"[download_image_to_tmp] 下载图片失败: {e}")
@@ -109,6 +113,11 @@ class ChatChannel(Channel):
     futures = {}  # 记录每个session_id提交到线程池的future对象, 用于重置会话时把没执行的future取消掉，正在执行的不会被取消
     sessions = {}  # 用于控制并发，每个session_id同时只能有一个context在处理
     lock = threading.Lock()  # 用于控制对sessions的访问
+    cancel_tokens = {}  # 记录每个session_id正在处理中的context的取消标记，用于取消正在执行的任务
+    reorder_buffers = {}  # 按session_id保存回复的重排序缓冲，保证同一会话并行处理时按到达顺序回复
+    scheduler = FairScheduler()  # 跨会话的公平调度器，决定空闲线程优先分配给哪个会话
+    inflight = 0  # 已提交到线程池且未结束的任务数
+    journal = None  # 入站消息日志(MessageJournal)，由支持重放的channel开启
 
     def __init__(self):
         _thread = threading.Thread(target=self.consume)
@@ -276,9 +285,21 @@ class ChatChannel(Channel):
     def _handle(self, context: Context):
         if context is None or not context.content:
             return
+        if context.is_cancelled():
+            logger.info("[chat_channel] context cancelled before handling, session_id={}".format(context.get("session_id")))
+            return
         logger.debug("[chat_channel] ready to handle context: {}".format(context))
+        for cmsg in context.get("refer_image_msgs", []):  # 合并消息中引用的图片，在处理线程中下载
+            cmsg.download_refer_image_for_multimodal()
         # reply的构建步骤
-        reply = self._generate_reply(context)
+        try:
+            reply = self._generate_reply(context)
+        except RequestCancelled:
+            logger.info("[chat_channel] request cancelled, session_id={}".format(context.get("session_id")))
+            return
+        if context.is_cancelled():
+            logger.info("[chat_channel] context cancelled, drop reply, session_id={}".format(context.get("session_id")))
+            return
 
         logger.debug("[chat_channel] ready to decorate reply: {}".format(reply))
 
@@ -287,8 +308,25 @@ class ChatChannel(Channel):
             reply = self._decorate_reply(context, reply)
 
             # reply的发送步骤
+            if not self._wait_reply_turn(context):
+                return
             self._send_reply(context, reply)
 
+    def _wait_reply_turn(self, context: Context) -> bool:
+        """开启按序回复时，等待同一会话中更早到达的消息处理完毕，返回False表示等待期间被取消"""
+        seq = context.get("reply_seq")
+        buffer = self.reorder_buffers.get(context.get("session_id"))
+        if seq is None or buffer is None:
+            return True
+        timeout = conf().get("ordered_reply_timeout", 60)
+        if not buffer.wait_turn(seq, timeout):
+            metrics.get_counter("chat_channel.reorder_timeout").inc()
+            logger.warning("[chat_channel] wait reply turn timeout, session_id={}, seq={}".format(context.get("session_id"), seq))
+        if context.is_cancelled():
+            logger.info("[chat_channel] context cancelled, drop reply, session_id={}".format(context.get("session_id")))
+            return False
+        return True
+
     def _generate_reply(self, context: Context, reply: Reply = Reply()) -> Reply:
         # 插件优先处理
         e_context = PluginManager().emit_event(
@@ -346,14 +384,41 @@ class ChatChannel(Channel):
                         logger.info(f"[chat_channel] 检测到SILK文件，使用同名MP3文件: {mp3_path}")
                         file_path = mp3_path
                 
-                wav_path = os.path.splitext(file_path)[0] + ".wav"
-                try:
-                    any_to_wav(file_path, wav_path)
-                except Exception as e:  # 转换失败，直接使用mp3，对于某些api，mp3也可以识别
-                    logger.warning("[chat_channel]any to wav error, use raw path. " + str(e))
-                    wav_path = file_path
-                # 语音识别
-                reply = super().build_voice_to_text(wav_path)
+                # 相同语音（转发、重试）直接使用缓存的识别结果，跳过转码和识别
+                asr_cache = get_asr_cache()
+                asr_key = None
+                if asr_cache is not None:
+                    try:
+                        asr_key = asr_cache.key(Bridge().get_bot_type("voice_to_text"), file_path)
+                    except OSError as e:
+                        logger.warning(f"[chat_channel] 读取语音文件失败，不使用识别缓存: {e}")
+                cached_text = asr_cache.get(asr_key) if asr_key else None
+                reply = None
+                if cached_text is not None:
+                    logger.info(f"[chat_channel] 语音识别命中缓存: {cached_text}")
+                    reply = Reply(ReplyType.TEXT, cached_text)
+                elif conf().get("asr_streaming", True) and Bridge().supports_streaming_asr():
+                    # 识别引擎支持流式识别时，解码后直接逐帧发送PCM，不生成wav文件
+                    try:
+                        frames = audio_codec.iter_pcm_frames(file_path, 16000)
+                        reply = super().build_voice_stream_to_text(frames, 16000)
+                    except Exception as e:
+                        logger.warning(f"[chat_channel] 流式语音识别失败，改用文件识别: {e}")
+                if reply is None:
+                    wav_path = os.path.splitext(file_path)[0] + ".wav"
+                    try:
+                        if wav_path != file_path:
+                            # 在媒体进程池中转码，避免占用处理消息线程
+                            wav_data, _ = media_pool.transcode_audio(file_path, "wav")
+                            with open(wav_path, "wb") as f:
+                                f.write(wav_data)
+                    except Exception as e:  # 转换失败，直接使用mp3，对于某些api，mp3也可以识别
+                        logger.warning("[chat_channel]any to wav error, use raw path. " + str(e))
+                        wav_path = file_path
+                    # 语音识别
+                    reply = super().build_voice_to_text(wav_path)
+                if cached_text is None and asr_key and reply.type == ReplyType.TEXT and reply.content:
+                    asr_cache.put(asr_key, reply.content)
                 # 删除临时文件 - 注释掉这部分，避免过早删除文件
                 # try:
                 #     os.remove(file_path)
@@ -367,6 +432,8 @@ class ChatChannel(Channel):
                     new_context = self._compose_context(ContextType.TEXT, reply.content, **context.kwargs)
                     if new_context:
                         reply = self._generate_reply(new_context)
+                        # 识别后的文字回复已流式发送过片段时，最终片段同样不再重复@和前缀
+                        context["stream_sent"] = new_context.get("stream_sent", False)
                     else:
                         return
             elif context.type == ContextType.IMAGE:  # 图片消息，当前仅做下载保存到本地的逻辑
@@ -425,8 +492,11 @@ class ChatChannel(Channel):
                     if desire_rtype == ReplyType.VOICE and ReplyType.VOICE not in self.NOT_SUPPORT_REPLYTYPE:
                         reply = super().build_text_to_voice(reply.content)
                         return self._decorate_reply(context, reply)
+                    # 流式回复：已发送过片段时不再重复@和前缀，中间片段不加后缀
+                    streamed = context.get("stream_sent", False)
+                    partial = context.get("stream_chunk", False)
                     if context.get("isgroup", False):
-                        if not conf().get("no_need_at", False):
+                        if not conf().get("no_need_at", False) and not streamed:
                             # 新增：自动查群成员接口/缓存获取@名称
                             at_name = None
                             try:
@@ -438,11 +508,10 @@ class ChatChannel(Channel):
                             if not at_name:
                                 at_name = context["msg"].actual_user_nickname or context["msg"].from_user_nickname or "群成员"
                             reply_text = f"@{at_name}\n" + reply_text.strip()
-                        reply_text = conf().get("group_chat_reply_prefix", "") + reply_text + conf().get(
-                            "group_chat_reply_suffix", "")
+                        prefix, suffix = conf().get("group_chat_reply_prefix", ""), conf().get("group_chat_reply_suffix", "")
                     else:
-                        reply_text = conf().get("single_chat_reply_prefix", "") + reply_text + conf().get(
-                            "single_chat_reply_suffix", "")
+                        prefix, suffix = conf().get("single_chat_reply_prefix", ""), conf().get("single_chat_reply_suffix", "")
+                    reply_text = ("" if streamed else prefix) + reply_text + ("" if partial else suffix)
                     reply.content = reply_text
                 elif reply.type == ReplyType.ERROR or reply.type == ReplyType.INFO:
                     reply.content = "[" + str(reply.type) + "]\n" + reply.content
@@ -457,6 +526,18 @@ class ChatChannel(Channel):
                 logger.warning("[chat_channel] desire_rtype: {}, but reply type: {}".format(context.get("desire_rtype"), reply.type))
             return reply
 
+    def send_stream_chunk(self, context: Context, text):
+        """流式回复时由bot调用，发送已完整的回复片段；最后一个片段由bot返回，按正常流程发送"""
+        if not context.get("stream_sent", False) and not self._wait_reply_turn(context):
+            raise RequestCancelled()
+        context["stream_chunk"] = True
+        try:
+            reply = self._decorate_reply(context, Reply(ReplyType.TEXT, text))
+        finally:
+            context["stream_chunk"] = False
+        self._send_reply(context, reply)
+        context["stream_sent"] = True
+
     def _send_reply(self, context: Context, reply: Reply):
         if reply and reply.type:
             e_context = PluginManager().emit_event(
@@ -479,7 +560,12 @@ class ChatChannel(Channel):
                 return
             logger.exception(e)
             if retry_cnt < 2:
-                time.sleep(3 + 3 * retry_cnt)
+                token = context.get("cancel_token")
+                if token is not None:
+                    if token.wait(3 + 3 * retry_cnt):
+                        return
+                else:
+                    time.sleep(3 + 3 * retry_cnt)
                 self._send(reply, context, retry_cnt + 1)
 
     # 处理好友申请
@@ -512,71 +598,237 @@ class ChatChannel(Channel):
                 logger.info("Worker cancelled, session_id = {}".format(session_id))
             except Exception as e:
                 logger.exception("Worker raise exception: {}".format(e))
+            if self.journal is not None and kwargs.get("context"):
+                # 无论成功、失败还是取消都视为处理结束，避免异常消息在重启后反复重放
+                for journal_id in kwargs["context"].get("journal_ids", [kwargs["context"].get("journal_id")]):
+                    self.journal.complete(journal_id)
+            seq = kwargs.get("context").get("reply_seq") if kwargs.get("context") else None
+            if seq is not None and session_id in self.reorder_buffers:
+                self.reorder_buffers[session_id].release(seq)
             with self.lock:
+                self.inflight -= 1
+                token = kwargs.get("context").get("cancel_token") if kwargs.get("context") else None
+                if token in self.cancel_tokens.get(session_id, []):
+                    self.cancel_tokens[session_id].remove(token)
                 self.sessions[session_id][1].release()
 
         return func
 
     def produce(self, context: Context):
         session_id = context.get("session_id", 0)
+        context["enqueue_time"] = time.time()
+        if "cancel_token" not in context:
+            context["cancel_token"] = CancelToken()
+        if self.journal is not None and "journal_id" not in context:
+            payload = self._journal_payload(context)
+            if payload is not None:
+                context["journal_id"] = self.journal.append(payload)
+        if context.type == ContextType.TEXT and context.content:
+            if context.content in conf().get("clear_memory_commands", ["#清除记忆"]):
+                self.cancel_running(session_id)  # 清除记忆后，正在处理的旧请求不再需要
+            elif conf().get("cancel_superseded_request", False) and not context.content.startswith("#"):
+                self.cancel_running(session_id)  # 新消息取代正在处理的请求
         with self.lock:
             if session_id not in self.sessions:
                 self.sessions[session_id] = [
                     Dequeue(),
                     threading.BoundedSemaphore(conf().get("concurrency_in_session", 4)),
                 ]
-            if context.type == ContextType.TEXT and context.content.startswith("#"):
+            if self._schedule_class(context) == "command":
                 self.sessions[session_id][0].putleft(context)  # 优先处理管理命令
             else:
                 self.sessions[session_id][0].put(context)
 
+    def _schedule_class(self, context: Context) -> str:
+        """获取context所属的调度类别"""
+        if context.type == ContextType.TEXT and context.content and context.content.startswith("#"):
+            return "command"
+        if context.get("isgroup", False):
+            return "shared_group" if context.get("is_shared_session_group", False) else "group"
+        return "single"
+
+    def _schedule_params(self, session_id, context: Context):
+        """根据调度类别和会话权重配置，计算会话的(优先级, 权重)"""
+        classes = conf().get("session_schedule_classes") or DEFAULT_SCHEDULE_CLASSES
+        schedule_class = self._schedule_class(context)
+        params = classes.get(schedule_class) or DEFAULT_SCHEDULE_CLASSES[schedule_class]
+        weight = params.get("weight", 1)
+        session_weights = conf().get("session_weights") or {}
+        if session_id in session_weights:
+            weight *= session_weights[session_id]
+        elif context.get("group_name") in session_weights:
+            weight *= session_weights[context.get("group_name")]
+        return params.get("priority", 1), weight
+
+    def _peek_context(self, context_queue: Dequeue):
+        with context_queue.mutex:
+            return context_queue.queue[0] if context_queue.queue else None
+
     # 消费者函数，单独线程，用于从消息队列中取出消息并处理
     def consume(self):
         while True:
             with self.lock:
                 session_ids = list(self.sessions.keys())
+            candidates = {}
             for session_id in session_ids:
                 with self.lock:
                     context_queue, semaphore = self.sessions[session_id]
-                if semaphore.acquire(blocking=False):  # 等线程处理完毕才能删除
-                    if not context_queue.empty():
-                        context = context_queue.get()
-                        logger.debug("[chat_channel] consume context: {}".format(context))
-                        future: Future = handler_pool.submit(self._handle, context)
-                        future.add_done_callback(self._thread_pool_callback(session_id, context=context))
-                        with self.lock:
-                            if session_id not in self.futures:
-                                self.futures[session_id] = []
-                            self.futures[session_id].append(future)
-                    elif semaphore._initial_value == semaphore._value + 1:  # 除了当前，没有任务再申请到信号量，说明所有任务都处理完毕
+                head = self._peek_context(context_queue)
+                if head is not None:
+                    if semaphore._value > 0 and self._coalesce_ready(context_queue, head):
+                        candidates[session_id] = self._schedule_params(session_id, head)
+                elif semaphore.acquire(blocking=False):  # 等线程处理完毕才能删除
+                    if context_queue.empty() and semaphore._initial_value == semaphore._value + 1:  # 除了当前，没有任务再申请到信号量，说明所有任务都处理完毕
                         with self.lock:
-                            self.futures[session_id] = [t for t in self.futures[session_id] if not t.done()]
+                            self.futures[session_id] = [t for t in self.futures.get(session_id, []) if not t.done()]
                             assert len(self.futures[session_id]) == 0, "thread pool error"
                             del self.sessions[session_id]
+                            self.cancel_tokens.pop(session_id, None)
+                            self.reorder_buffers.pop(session_id, None)
                     else:
                         semaphore.release()
+            # 线程池空闲的名额按公平调度分配给各会话，超出的消息留在各自会话队列中等待
+            while candidates and self.inflight < handler_pool._max_workers:
+                session_id = self.scheduler.next(candidates)
+                with self.lock:
+                    context_queue, semaphore = self.sessions[session_id]
+                if not semaphore.acquire(blocking=False):
+                    del candidates[session_id]
+                    continue
+                if context_queue.empty():
+                    semaphore.release()
+                    del candidates[session_id]
+                    continue
+                context = self._coalesce_context(context_queue, context_queue.get())
+                if conf().get("ordered_reply_in_session", False) and semaphore._initial_value > 1:
+                    # 出队顺序即到达顺序（管理命令插队除外），按出队顺序领取回复序号
+                    with self.lock:
+                        buffer = self.reorder_buffers.setdefault(session_id, ReorderBuffer())
+                    context["reply_seq"] = buffer.issue()
+                self._observe_queue_wait(context)
+                logger.debug("[chat_channel] consume context: {}".format(context))
+                with self.lock:
+                    self.inflight += 1
+                future: Future = handler_pool.submit(self._handle, context)
+                future.add_done_callback(self._thread_pool_callback(session_id, context=context))
+                with self.lock:
+                    if session_id not in self.futures:
+                        self.futures[session_id] = []
+                    self.futures[session_id].append(future)
+                    if context.get("cancel_token") is not None and not future.done():
+                        self.cancel_tokens.setdefault(session_id, []).append(context["cancel_token"])
+                head = self._peek_context(context_queue)
+                if head is not None and semaphore._value > 0 and self._coalesce_ready(context_queue, head):
+                    candidates[session_id] = self._schedule_params(session_id, head)
+                else:
+                    del candidates[session_id]
             time.sleep(0.2)
 
-    # 取消session_id对应的所有任务，只能取消排队的消息和已提交线程池但未执行的任务
+    def _coalesce_key(self, context: Context):
+        """可合并的消息返回(发送者, 接收者)，不可合并返回None"""
+        if context.type != ContextType.TEXT or self._schedule_class(context) == "command":
+            return None
+        cmsg = context.get("msg")
+        sender = (getattr(cmsg, "actual_user_id", None) or getattr(cmsg, "from_user_id", None)) if cmsg else None
+        return sender, context.get("receiver")
+
+    def _coalesce_ready(self, context_queue: Dequeue, head: Context) -> bool:
+        """合并窗口内还可能有同一发送者的后续消息时，暂不处理"""
+        window = conf().get("message_coalesce_window_ms", 0) / 1000
+        if window <= 0 or self._coalesce_key(head) is None:
+            return True
+        with context_queue.mutex:
+            tail = context_queue.queue[-1] if context_queue.queue else head
+        now = time.time()
+        if now - head.get("enqueue_time", now) >= conf().get("message_coalesce_max_wait_ms", 3000) / 1000:
+            return True
+        return now - tail.get("enqueue_time", now) >= window
+
+    def _coalesce_context(self, context_queue: Dequeue, context: Context) -> Context:
+        """将队列中紧随其后、同一发送者的文本消息合并到context中"""
+        if conf().get("message_coalesce_window_ms", 0) <= 0:
+            return context
+        key = self._coalesce_key(context)
+        if key is None:
+            return context
+        merged = [context]
+        while True:
+            head = self._peek_context(context_queue)
+            if head is None or self._coalesce_key(head) != key:
+                break
+            merged.append(context_queue.get())
+        if len(merged) == 1:
+            return context
+        context.content = "\n".join(c.content for c in merged if c.content)
+        context["coalesced_msgs"] = [c.get("msg") for c in merged]
+        context["journal_ids"] = [c.get("journal_id") for c in merged]
+        # 合并前的消息可能引用了图片，后续消息会清理图片缓存，处理时按顺序重新放入缓存；
+        # 下载可能阻塞，不能在调度线程中执行
+        refer_image_msgs = []
+        for c in merged:
+            cmsg = c.get("msg")
+            refer_image_info = getattr(cmsg, "_refer_image_info", None)
+            if refer_image_info and refer_image_info.get("has_refer_image") and hasattr(cmsg, "download_refer_image_for_multimodal"):
+                refer_image_msgs.append(cmsg)
+        if refer_image_msgs:
+            context["refer_image_msgs"] = refer_image_msgs
+        metrics.get_counter("chat_channel.coalesced").inc("messages", len(merged) - 1)
+        logger.info("[chat_channel] coalesced {} messages in session {}".format(len(merged), context.get("session_id")))
+        return context
+
+    def _journal_payload(self, context: Context):
+        """返回写入消息日志、可用于重启后重放的原始消息，不支持重放的channel返回None"""
+        return None
+
+    def _observe_queue_wait(self, context: Context):
+        enqueue_time = context.get("enqueue_time")
+        if enqueue_time:
+            metrics.get_histogram("chat_channel.queue_wait." + self._schedule_class(context)).observe(time.time() - enqueue_time)
+
+    def get_schedule_stats(self) -> dict:
+        """获取各调度类别的排队等待时间直方图"""
+        return metrics.snapshot("chat_channel.queue_wait.")
+
+    # 取消session_id正在执行的任务，通过取消标记通知bot尽快结束请求并丢弃回复
+    def cancel_running(self, session_id):
+        with self.lock:
+            tokens = list(self.cancel_tokens.get(session_id, []))
+        for token in tokens:
+            token.cancel()
+        if tokens:
+            logger.info("Cancel {} running requests in session {}".format(len(tokens), session_id))
+
+    # 取消session_id对应的所有任务，排队的消息和未执行的任务直接取消，正在执行的任务通过取消标记协作取消
     def cancel_session(self, session_id):
+        self.cancel_running(session_id)
         with self.lock:
             if session_id in self.sessions:
-                for future in self.futures[session_id]:
+                for future in self.futures.get(session_id, []):
                     future.cancel()
-                cnt = self.sessions[session_id][0].qsize()
-                if cnt > 0:
-                    logger.info("Cancel {} messages in session {}".format(cnt, session_id))
-                self.sessions[session_id][0] = Dequeue()
+                self._discard_queue(session_id)
+
+    def _discard_queue(self, session_id):
+        """清空会话中排队的消息，调用方需持有self.lock"""
+        context_queue = self.sessions[session_id][0]
+        cnt = context_queue.qsize()
+        if cnt > 0:
+            logger.info("Cancel {} messages in session {}".format(cnt, session_id))
+            if self.journal is not None:
+                with context_queue.mutex:
+                    for context in context_queue.queue:
+                        self.journal.complete(context.get("journal_id"))
+        self.sessions[session_id][0] = Dequeue()
 
     def cancel_all_session(self):
+        with self.lock:
+            session_ids = list(self.cancel_tokens.keys())
+        for session_id in session_ids:
+            self.cancel_running(session_id)
         with self.lock:
             for session_id in self.sessions:
-                for future in self.futures[session_id]:
+                for future in self.futures.get(session_id, []):
                     future.cancel()
-                cnt = self.sessions[session_id][0].qsize()
-                if cnt > 0:
-                    logger.info("Cancel {} messages in session {}".format(cnt, session_id))
-                self.sessions[session_id][0] = Dequeue()
+                self._discard_queue(session_id)
 
 
 def check_prefix(content, prefix_list):
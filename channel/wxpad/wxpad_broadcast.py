@@ -0,0 +1,88 @@
+import threading
+import time
+
+from common import metrics
+from common.log import logger
+
+
+class BroadcastJob:
+    """一次群发任务的进度"""
+
+    def __init__(self, receivers):
+        self.total = len(receivers)
+        self.sent = 0
+        self.failed = []  # 重试后仍失败的接收者
+        self.done = threading.Event()
+        self.started_at = time.time()
+        self.finished_at = None
+
+    def progress(self) -> dict:
+        return {
+            "total": self.total,
+            "sent": self.sent,
+            "failed": len(self.failed),
+            "done": self.done.is_set(),
+            "elapsed": round((self.finished_at or time.time()) - self.started_at, 3),
+        }
+
+    def wait(self, timeout=None) -> bool:
+        return self.done.wait(timeout)
+
+
+class WxpadBroadcaster:
+    """基于GroupMassMsgText/GroupMassMsgImage的群发
+
+    接收者按batch_size分批，每批一次请求，批次之间至少间隔interval秒，
+    单批失败按退避重试，最终失败的接收者记录在BroadcastJob.failed中。
+    """
+
+    def __init__(self, client, batch_size=50, interval=2, max_retries=2):
+        self.client = client
+        self.batch_size = max(1, batch_size)
+        self.interval = interval
+        self.max_retries = max_retries
+        self._lock = threading.Lock()  # 同一账号的群发任务串行执行，共享限速
+
+    def broadcast_text(self, content, receivers, progress_callback=None) -> BroadcastJob:
+        return self._start(lambda chunk: self.client.group_mass_msg_text(content, chunk), receivers, progress_callback)
+
+    def broadcast_image(self, image_base64, receivers, progress_callback=None) -> BroadcastJob:
+        return self._start(lambda chunk: self.client.group_mass_msg_image(image_base64, chunk), receivers, progress_callback)
+
+    def _start(self, send_chunk, receivers, progress_callback):
+        receivers = list(dict.fromkeys(r for r in receivers if r))  # 去重并保持顺序
+        job = BroadcastJob(receivers)
+        threading.Thread(target=self._run, args=(job, send_chunk, receivers, progress_callback), daemon=True).start()
+        return job
+
+    def _run(self, job, send_chunk, receivers, progress_callback):
+        with self._lock:
+            last_sent = 0
+            for i in range(0, len(receivers), self.batch_size):
+                chunk = receivers[i:i + self.batch_size]
+                for attempt in range(self.max_retries + 1):
+                    wait = self.interval * (attempt + 1) - (time.time() - last_sent)
+                    if wait > 0:
+                        time.sleep(wait)
+                    last_sent = time.time()
+                    try:
+                        result = send_chunk(chunk)
+                        if result.get("Code") == 200:
+                            job.sent += len(chunk)
+                            break
+                        logger.warning(f"[wxpad] 群发第{i // self.batch_size + 1}批失败: {result}")
+                    except Exception as e:
+                        logger.warning(f"[wxpad] 群发第{i // self.batch_size + 1}批异常: {e}")
+                else:
+                    job.failed.extend(chunk)
+                metrics.get_counter("wxpad.broadcast").inc("requests")
+                if progress_callback:
+                    try:
+                        progress_callback(job.progress())
+                    except Exception as e:
+                        logger.warning(f"[wxpad] 群发进度回调异常: {e}")
+            job.finished_at = time.time()
+            job.done.set()
+        metrics.get_counter("wxpad.broadcast").inc("sent", job.sent)
+        metrics.get_counter("wxpad.broadcast").inc("failed", len(job.failed))
+        logger.info(f"[wxpad] 群发完成: {job.progress()}")
@@ -1,10 +1,10 @@
 import os
 import time
 import json
+import random
 import threading
 import uuid
 import base64
-import requests
 import tempfile
 import urllib.request
 from pydub import AudioSegment
@@ -19,19 +19,28 @@ import websocket
 import urllib.parse
 import mimetypes
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 
 from bridge.context import Context, ContextType
 from bridge.reply import Reply, ReplyType
 from channel.chat_channel import ChatChannel, get_group_member_display_name
 from channel.wxpad.wxpad_message import WechatPadProMessage as WxpadMessage
+from channel.wxpad.wxpad_broadcast import WxpadBroadcaster
+from channel.wxpad.wxpad_send_queue import WxpadSendQueue
 from common.log import logger
+from common import media_pool, metrics
+from common.fetcher import get_fetcher
+from common.message_journal import MessageJournal
+from common.seen_set import SeenSet
 from common.singleton import singleton
 from common.tmp_dir import TmpDir
-from config import conf, save_config
+from config import conf, save_config, get_appdata_dir
 from lib.wxpad.client import WxpadClient
+from lib.wxpad.streaming_body import Base64Data
 from voice.audio_convert import mp3_to_silk
 
 MAX_UTF8_LEN = 2048
+voice_encode_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="wxpad_voice")  # 语音片段SILK编码线程池
 ROBOT_STAT_PATH = os.path.join(os.path.dirname(__file__), '../../resource/robot_stat.json')
 ROBOT_STAT_PATH = os.path.abspath(ROBOT_STAT_PATH)
 
@@ -83,14 +92,72 @@ class WxpadChannel(ChatChannel):
         self.ws = None
         self.ws_connected = False
         self.ws_reconnect_count = 0
-        self.max_reconnect_attempts = 5
+        self.ws_disconnected_at = None  # 连接断开的时间，重连后据此补拉断开期间的消息
+        # 按NewMsgId去重，避免重连或服务端重复推送导致同一消息被处理两次
+        self.seen_msg_ids = SeenSet(conf().get("message_dedup_capacity", 10000), conf().get("message_dedup_ttl", 900))
+        self.seen_msg_ids_path = None
+        if conf().get("message_dedup_persist", False):
+            self.seen_msg_ids_path = os.path.join(get_appdata_dir(), "wxpad_seen_msg_ids.json")
+            self.seen_msg_ids.load(self.seen_msg_ids_path)
+        if conf().get("message_journal_enabled", False):
+            journal_path = conf().get("message_journal_path") or os.path.join(get_appdata_dir(), "message_journal.db")
+            self.journal = MessageJournal(journal_path, conf().get("message_journal_flush_ms", 200) / 1000)
+        self.send_queue = None
+        if conf().get("wechatpadpro_send_queue_enabled", False):
+            self.send_queue = WxpadSendQueue(
+                self,
+                workers=conf().get("wechatpadpro_send_workers", 4),
+                rate_per_minute=conf().get("wechatpadpro_send_rate_per_minute", 0),
+                batch_size=conf().get("wechatpadpro_send_batch_size", 5),
+            )
+        self.broadcaster = WxpadBroadcaster(
+            self.client,
+            batch_size=conf().get("wechatpadpro_broadcast_batch_size", 50),
+            interval=conf().get("wechatpadpro_broadcast_interval", 2),
+        )
         logger.info(f"[WeChatPadPro] init: base_url: {self.base_url}, admin_key: {admin_key[:3]}***, user_key: {'已配置' if user_key else '未配置'}")
 
     def startup(self):
         self._ensure_login()
         logger.info(f"[wxpad] channel startup, wxid: {self.wxid}")
+        self._replay_journal()
+        if self.seen_msg_ids_path:
+            threading.Thread(target=self._persist_seen_msg_ids_loop, daemon=True).start()
         threading.Thread(target=self._sync_message_loop, daemon=True).start()
 
+    def _replay_journal(self):
+        """重放上次退出前已接收但未处理完成的消息，过期消息由_should_ignore_message过滤"""
+        if self.journal is None:
+            return
+        entries = self.journal.pending()
+        if not entries:
+            return
+        logger.info(f"[wxpad] 重放未处理完成的消息 {len(entries)} 条")
+        replayed = set()
+        for journal_id, _, msg in entries:
+            try:
+                msg_key = self._msg_key(msg)
+                if msg_key and msg_key in replayed:
+                    # 上次重放中途退出时，同一条消息可能同时留有新旧两条日志
+                    metrics.get_counter("wxpad.ingest").inc("duplicate")
+                    logger.debug(f"[wxpad] ignore duplicate journal entry: {msg_key}")
+                    continue
+                if msg_key:
+                    replayed.add(msg_key)
+                    # 记入去重集合，之后补拉或重新推送的同一条消息不再处理；
+                    # 集合每30秒落盘一次，退出前可能已记录该消息，因此这里不按已存在判为重复
+                    self.seen_msg_ids.add(msg_key)
+                self._handle_message(msg)
+            except Exception as e:
+                logger.error(f"[wxpad] 重放消息异常: {e}")
+            finally:
+                # 重新提交时已写入新的日志记录，旧记录直接结束
+                self.journal.complete(journal_id)
+
+    def _journal_payload(self, context: Context):
+        cmsg = context.get("msg")
+        return cmsg._rawmsg if cmsg is not None and isinstance(cmsg._rawmsg, dict) else None
+
     def _ensure_login(self):
         """确保登录状态"""
         # 1. 检查用户密钥，如果没有则生成
@@ -430,21 +497,26 @@ class WxpadChannel(ChatChannel):
 
         while True:
             try:
+                # run_forever阻塞到连接断开或连接失败，消息在回调中处理
                 self._connect_websocket()
-                if self.ws and self.ws_connected:
-                    # WebSocket连接成功，等待消息
-                    logger.info("[wxpad] WebSocket连接已建立，等待消息...")
-                    # WebSocket会在回调中处理消息，这里只需要保持连接
-                    while self.ws_connected:
-                        time.sleep(1)
-                else:
-                    logger.error("[wxpad] WebSocket连接失败，等待重试..")
-                    time.sleep(5)
-
+                logger.warning("[wxpad] WebSocket连接已断开")
             except Exception as e:
                 logger.error(f"[wxpad] WebSocket消息同步异常: {e}")
                 self.ws_connected = False
-                time.sleep(5)  # 异常时等5秒再重试
+            self._persist_seen_msg_ids()
+            if self.ws_disconnected_at is None:
+                self.ws_disconnected_at = time.time()
+            delay = self._reconnect_delay()
+            self.ws_reconnect_count += 1
+            logger.info(f"[wxpad] {delay:.1f}秒后尝试第{self.ws_reconnect_count}次重连WebSocket")
+            time.sleep(delay)
+
+    def _reconnect_delay(self):
+        """指数退避加随机抖动，避免服务端恢复时所有客户端同时重连"""
+        base = conf().get("wechatpadpro_reconnect_base_delay", 1)
+        max_delay = conf().get("wechatpadpro_reconnect_max_delay", 60)
+        delay = min(max_delay, base * (2 ** min(self.ws_reconnect_count, 16)))
+        return delay / 2 + random.uniform(0, delay / 2)
 
     def _connect_websocket(self):
         """建立WebSocket连接"""
@@ -477,6 +549,9 @@ class WxpadChannel(ChatChannel):
         logger.info("[wxpad] WebSocket连接已建立")
         self.ws_connected = True
         self.ws_reconnect_count = 0
+        if self.ws_disconnected_at is not None:
+            disconnected_at, self.ws_disconnected_at = self.ws_disconnected_at, None
+            threading.Thread(target=self._catch_up_messages, args=(disconnected_at,), daemon=True).start()
 
     def _on_ws_message(self, ws, message):
         """WebSocket消息接收回调"""
@@ -493,6 +568,9 @@ class WxpadChannel(ChatChannel):
                     from_user = self._extract_str(data.get('from_user_name', {}))
                     msg_type = data.get('msg_type', 1)
 
+                    if self._is_duplicate(data):
+                        return
+
                     # 简化显示信息，不调用API获取昵称
                     if "@chatroom" in from_user:
                         # 群聊消息 - 只显示ID，避免重复API调用
@@ -514,6 +592,9 @@ class WxpadChannel(ChatChannel):
                         from_user = self._extract_str(msg.get('from_user_name', {}))
                         msg_type = msg.get('msg_type', 1)
 
+                        if self._is_duplicate(msg):
+                            continue
+
                         # 简化显示信息，不调用API获取昵称
                         if "@chatroom" in from_user:
                             # 群聊消息 - 只显示ID，避免重复API调用
@@ -542,14 +623,95 @@ class WxpadChannel(ChatChannel):
         """WebSocket连接关闭回调"""
         logger.warning(f"[wxpad] WebSocket连接已关闭: {close_status_code}, {close_msg}")
         self.ws_connected = False
+        if self.ws_disconnected_at is None:
+            self.ws_disconnected_at = time.time()
+        # 重连由_sync_message_loop按退避间隔发起
+
+    def _catch_up_messages(self, disconnected_at):
+        """重连后通过HTTP同步补拉断开期间的消息，去重后走与WebSocket相同的处理流程"""
+        gap = time.time() - disconnected_at
+        metrics.get_histogram("wxpad.reconnect_gap").observe(gap)
+        batch_size = conf().get("wechatpadpro_catch_up_batch_size", 50)
+        max_batches = conf().get("wechatpadpro_catch_up_max_batches", 10)
+        recovered = 0
+        try:
+            for _ in range(max_batches):
+                batch = self._extract_sync_messages(self.client.http_sync_msg(batch_size))
+                # 按接收顺序逐条提交，保证同一会话的消息入队顺序不变
+                for msg in batch:
+                    msg_key = self._msg_key(msg)
+                    if msg_key and msg_key in self.seen_msg_ids:
+                        metrics.get_counter("wxpad.ingest").inc("duplicate")
+                        continue
+                    if self._ingest_message(msg):
+                        recovered += 1
+                        if msg_key:
+                            # 提交处理后才记为已接收，处理失败的消息之后仍可再次补拉
+                            self.seen_msg_ids.add(msg_key)
+                            metrics.get_counter("wxpad.ingest").inc("accepted")
+                if len(batch) < batch_size:  # 已没有更多积压消息
+                    break
+        except Exception as e:
+            logger.error(f"[wxpad] 补拉断线期间消息异常: {e}")
+        metrics.get_counter("wxpad.catch_up").inc("recovered", recovered)
+        logger.info(f"[wxpad] WebSocket断开{gap:.1f}秒，补拉消息{recovered}条")
+
+    def _extract_sync_messages(self, resp):
+        """从HttpSyncMsg的返回中取出消息列表，统一为WebSocket推送的字段格式"""
+        if not isinstance(resp, dict) or resp.get("Code") not in (200, 0, None):
+            return []
+        data = resp.get("Data")
+        if isinstance(data, dict):
+            data = data.get("AddMsgs") or data.get("add_msgs") or data.get("List") or []
+        if not isinstance(data, list):
+            return []
+        key_map = {
+            "MsgId": "msg_id", "NewMsgId": "new_msg_id", "FromUserName": "from_user_name",
+            "ToUserName": "to_user_name", "MsgType": "msg_type", "Content": "content",
+            "CreateTime": "create_time", "MsgSource": "msg_source",
+        }
+        return [{key_map.get(k, k): v for k, v in msg.items()} for msg in data if isinstance(msg, dict)]
 
-        # 重连逻辑
-        if self.ws_reconnect_count < self.max_reconnect_attempts:
-            self.ws_reconnect_count += 1
-            logger.info(f"[wxpad] 尝试重连WebSocket ({self.ws_reconnect_count}/{self.max_reconnect_attempts})")
-            time.sleep(5)  # 等待5秒后重连
-        else:
-            logger.error(f"[wxpad] WebSocket重连次数已达上限，停止重连")
+    def _ingest_message(self, msg) -> bool:
+        """处理一条补拉的消息，返回是否成功提交"""
+        try:
+            self._handle_message(self._convert_message(msg))
+            return True
+        except Exception as e:
+            logger.error(f"[wxpad] 处理补拉消息异常: {e}")
+            return False
+
+    @staticmethod
+    def _msg_key(msg):
+        """消息去重key：new_msg_id，缺失时用msg_id；兼容转换后的NewMsgId/MsgId格式"""
+        msg_key = msg.get('new_msg_id') or msg.get('msg_id') or msg.get('NewMsgId') or msg.get('MsgId')
+        return str(msg_key) if msg_key else None
+
+    def _is_duplicate(self, msg):
+        """按new_msg_id(缺失时用msg_id)判断消息是否已处理过"""
+        msg_key = self._msg_key(msg)
+        if not msg_key:
+            return False
+        if self.seen_msg_ids.add(msg_key):
+            metrics.get_counter("wxpad.ingest").inc("accepted")
+            return False
+        metrics.get_counter("wxpad.ingest").inc("duplicate")
+        logger.debug(f"[wxpad] ignore duplicate message: {msg_key}")
+        return True
+
+    def _persist_seen_msg_ids_loop(self, interval=30):
+        """定时保存去重记录，WebSocket回调线程中收到的消息id也能及时落盘"""
+        while True:
+            time.sleep(interval)
+            self._persist_seen_msg_ids()
+
+    def _persist_seen_msg_ids(self):
+        if not self.seen_msg_ids_path:
+            return
+        try:
+            self.seen_msg_ids.dump(self.seen_msg_ids_path)
+        except Exception as e:
+            logger.warning(f"[wxpad] 保存消息去重记录失败: {e}")
 
     def _extract_str(self, value):
         """提取字符串值"""
@@ -598,7 +760,38 @@ class WxpadChannel(ChatChannel):
 
         return False
 
+    def _prefilter_message(self, msg):
+        """在构造消息对象(解析XML、查库、调用接口)之前，直接基于原始字段做廉价过滤
+
+        Returns:
+            str: 需要丢弃时返回原因，否则返回None
+        """
+        try:
+            create_time = int(msg.get('CreateTime') or 0)
+        except (ValueError, TypeError):
+            create_time = 0
+        if create_time and create_time < int(time.time()) - 60 * 5:  # 5分钟过期
+            return "expired"
+        from_user_id = msg.get('FromUserName', '')
+        if self.wxid and from_user_id == self.wxid:
+            return "self"
+        content = msg.get('Content') or {}
+        if isinstance(content, dict):
+            content = content.get('str', content.get('string', ''))
+        msg_source = msg.get('MsgSource') or ''
+        if WxpadMessage._is_non_user_message(msg_source, from_user_id, str(content or ''), msg.get('MsgType', 0)):
+            return "non_user"
+        if msg.get('MsgType') == 34 and not conf().get("speech_recognition", False):
+            return "voice_disabled"
+        return None
+
     def _handle_message(self, msg):
+        reason = self._prefilter_message(msg)
+        if reason:
+            metrics.get_counter("wxpad.prefilter_drop").inc(reason)
+            logger.debug(f"[wxpad] 消息被预过滤: from={msg.get('FromUserName')}, reason={reason}")
+            return
+
         xmsg = WxpadMessage(msg, self.client)
 
         # 统一过滤检查
@@ -659,16 +852,58 @@ class WxpadChannel(ChatChannel):
 
             logger.info(f"[wxpad] 消息已提交处理")
             self.produce(context)
+            if not conf().get("keep_raw_message", False):
+                xmsg.release_raw()
         else:
             logger.warning(f"[wxpad] 无法生成上下文，消息类型: {xmsg.ctype}")
 
-    def send(self, reply: Reply, context: Context):
-        """发送消息到微信
+    def _send(self, reply: Reply, context: Context, retry_cnt=0):
+        """开启出站队列时交给队列异步发送，由队列负责顺序、合并和重试"""
+        if self.send_queue is None:
+            return super()._send(reply, context, retry_cnt)
+        receiver = self._resolve_receiver(context)
+        if not receiver:
+            logger.error(f"[wxpad] Cannot determine receiver for reply: {reply.type}")
+            return
+        self.send_queue.put(receiver, reply, context)
+
+    def broadcast(self, reply: Reply, receivers, progress_callback=None):
+        """群发文本或图片给多个接收者，按批调用群发接口，后台执行
 
         Args:
-            reply: 回复对象
-            context: 上下文对象
+            reply: TEXT/INFO 或 IMAGE/IMAGE_URL 类型的回复
+            receivers: 接收者wxid或群id列表
+            progress_callback: 每批完成后回调，参数为进度字典
+
+        Returns:
+            BroadcastJob: 可通过progress()查看进度、wait()等待完成；不支持的类型返回None
         """
+        if reply.type in [ReplyType.TEXT, ReplyType.INFO]:
+            return self.broadcaster.broadcast_text(reply.content, receivers, progress_callback)
+        if reply.type in [ReplyType.IMAGE, ReplyType.IMAGE_URL]:
+            image_base64 = self._image_to_base64(reply.content)  # 图片只转换一次，所有批次共用
+            if not image_base64:
+                logger.error("[wxpad] 群发图片转换失败")
+                return None
+            return self.broadcaster.broadcast_image(image_base64, receivers, progress_callback)
+        logger.error(f"[wxpad] 不支持群发的消息类型: {reply.type}")
+        return None
+
+    def _send_text_batch(self, receiver, contents):
+        """一次请求发送多条文本给同一接收者"""
+        msg_item = [{
+            "AtWxIDList": [],
+            "ImageContent": "",
+            "MsgType": 0,  # 文本消息类型
+            "TextContent": content,
+            "ToUserName": receiver
+        } for content in contents]
+        result = self.client.send_text_message(msg_item)
+        if result.get("Code") != 200:
+            raise Exception(f"发送文本消息失败: {result}")
+        logger.info(f"[wxpad] ✅ 发送{len(contents)}条文本消息到 {receiver}: {contents[0][:50]}...")
+
+    def _resolve_receiver(self, context: Context):
         # 获取接收者，优先从context的receiver获取，其次从msg中获取
         receiver = context.get("receiver")
         if not receiver and context.get("msg"):
@@ -682,7 +917,16 @@ class WxpadChannel(ChatChannel):
             # 备用：尝试从other_user_id获取
             elif hasattr(msg, "other_user_id"):
                 receiver = msg.other_user_id
+        return receiver
+
+    def send(self, reply: Reply, context: Context):
+        """发送消息到微信
 
+        Args:
+            reply: 回复对象
+            context: 上下文对象
+        """
+        receiver = self._resolve_receiver(context)
         if not receiver:
             logger.error(f"[wxpad] Cannot determine receiver for reply: {reply.type}")
             return
@@ -749,7 +993,6 @@ class WxpadChannel(ChatChannel):
                 # 语音消息 - 使用SILK转换
                 try:
                     import os
-                    import asyncio
                     import time
 
                     original_voice_file_path = reply.content
@@ -769,37 +1012,46 @@ class WxpadChannel(ChatChannel):
                     temp_files_to_clean.append(original_voice_file_path)
 
                     try:
-                        # 微信语音条支持最多60秒，超60秒分段
-                        from voice.audio_convert import split_audio
-                        total_duration_ms, segment_paths = split_audio(original_voice_file_path, 60 * 1000)
-                        temp_files_to_clean.extend(segment_paths) # Add segment paths from split_audio for cleanup
+                        # 微信语音条支持最多60秒，超60秒分段；非SILK文件只解码一次，在内存中分段后直接编码
+                        from voice import audio_codec
+                        if audio_codec.is_silk(original_voice_file_path):
+                            segments = [original_voice_file_path]
+                        else:
+                            segments = audio_codec.decode_file(original_voice_file_path).split(60 * 1000)
 
-                        if not segment_paths:
+                        if not segments:
                             logger.error(f"[wxpad] Voice splitting failed for {original_voice_file_path}. No segments created.")
                             logger.info(f"[wxpad] Attempting to send {original_voice_file_path} as fallback.")
                             # 直接发送原文件作为回退
-                            fallback_result = asyncio.run(self._send_voice(receiver, original_voice_file_path))
+                            fallback_result = self._send_voice_segment(receiver, original_voice_file_path)
                             if fallback_result and isinstance(fallback_result, dict) and fallback_result.get("Success", False):
                                 logger.info(f"[wxpad] Fallback: Sent voice file successfully: {original_voice_file_path}")
                             else:
                                 logger.warning(f"[wxpad] Fallback: Sending voice file failed: {original_voice_file_path}, Result: {fallback_result}")
                             return
 
-                        logger.info(f"[wxpad] Voice file {original_voice_file_path} split into {len(segment_paths)} segments.")
-
-                        for i, segment_path in enumerate(segment_paths):
-                            # SILK转换和发送都在_send_voice方法中处理
-                            segment_result = asyncio.run(self._send_voice(receiver, segment_path))
+                        logger.info(f"[wxpad] Voice file {original_voice_file_path} split into {len(segments)} segments.")
+
+                        # 所有片段并行编码，按顺序上传：第一个片段编码完成即可开始发送
+                        encode_futures = [voice_encode_pool.submit(self._encode_voice_segment, segment) for segment in segments]
+                        last_upload = 0
+                        for i, future in enumerate(encode_futures):
+                            encoded = future.result()
+                            if encoded.get("Success"):
+                                # 片段间保持间隔，避免发送过快；编码耗时已计入间隔
+                                wait = 0.8 - (time.time() - last_upload)
+                                if last_upload and wait > 0:
+                                    time.sleep(wait)
+                                segment_result = self._upload_voice_segment(receiver, encoded)
+                                last_upload = time.time()
+                            else:
+                                segment_result = encoded
                             if segment_result and isinstance(segment_result, dict) and segment_result.get("Success", False):
-                                logger.info(f"[wxpad] Sent voice segment {i+1}/{len(segment_paths)} successfully: {segment_path}")
+                                logger.info(f"[wxpad] Sent voice segment {i+1}/{len(segments)} successfully: {original_voice_file_path}")
                             else:
-                                logger.warning(f"[wxpad] Sending voice segment {i+1}/{len(segment_paths)} failed: {segment_path}, Result: {segment_result}")
+                                logger.warning(f"[wxpad] Sending voice segment {i+1}/{len(segments)} failed: {original_voice_file_path}, Result: {segment_result}")
                                 # 如果片段失败，继续发送其他片段
 
-                            # 片段间添加间隔，避免发送过快
-                            if i < len(segment_paths) - 1:
-                                time.sleep(0.8)
-
                     except Exception as e_split_send:
                         logger.error(f"[wxpad] Error during voice splitting or segmented sending for {original_voice_file_path}: {e_split_send}")
                         import traceback
@@ -859,11 +1111,6 @@ class WxpadChannel(ChatChannel):
                         self.client.send_text_message(msg_item)
                         return
 
-                    # 下载视频
-                    headers = {
-                        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.212 Safari/537.36"
-                    }
-
                     # 使用项目临时目录保存视频
                     temp_path = None
                     try:
@@ -872,99 +1119,47 @@ class WxpadChannel(ChatChannel):
 
                         logger.info(f"[wxpad] 正在下载视频至临时文件: {temp_path}")
 
-                        # 下载视频到临时文件
-                        with open(temp_path, 'wb') as f:
-                            response = requests.get(video_url, headers=headers, stream=True, timeout=60)
-                            response.raise_for_status()
-                            total_size = int(response.headers.get('Content-Length', 0))
-                            downloaded = 0
-
-                            for chunk in response.iter_content(chunk_size=8192):
-                                if chunk:
-                                    f.write(chunk)
-                                    downloaded += len(chunk)
-                                    percent = int(downloaded / total_size * 100) if total_size > 0 else 0
-                                    if percent % 20 == 0:  # 每20%记录一次
-                                        logger.info(f"[wxpad] 视频下载进度: {percent}%")
-
-                        content_type = response.headers.get('Content-Type', '')
-                        logger.info(f"[wxpad] 视频下载完成: {temp_path}, 内容类型: {content_type}, 大小: {downloaded}字节")
-
-                        # 用OpenCV提取第一帧为缩略图并获取视频时长（与示例脚本保持一致）
-                        thumb_path = temp_path + "_thumb.jpg"
+                        # 流式下载视频到临时文件，超过大小限制时中止；同一URL再次发送时使用缓存
+                        fetched = get_fetcher().fetch_to(video_url, temp_path, timeout=60)
+                        logger.info(f"[wxpad] 视频下载完成: {temp_path}, 内容类型: {fetched.content_type}, 大小: {fetched.size}字节, 缓存: {fetched.from_cache}")
+
+                        # 从MP4头部读取时长，截取第一个关键帧为缩略图（最长边200，保持宽高比）
                         video_length = 10  # 默认10秒
                         try:
-                            import cv2
-
-                            # 打开视频文件
-                            cap = cv2.VideoCapture(temp_path)
-
-                            # 检查视频是否成功打开
-                            if not cap.isOpened():
-                                raise Exception(f"无法打开视频文件: {temp_path}")
-
-                            # 获取视频时长
-                            fps = cap.get(cv2.CAP_PROP_FPS)
-                            frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
-                            if fps > 0 and frame_count > 0:
-                                duration = frame_count / fps
+                            duration, thumb_bytes = media_pool.video_probe_thumbnail(temp_path, 200)
+                            if duration:
                                 video_length = max(1, int(duration))  # 至少1秒
-                                logger.info(f"[wxpad] 获取视频时长成功: {video_length}秒 (FPS: {fps:.2f}, 帧数: {frame_count})")
+                                logger.info(f"[wxpad] 获取视频时长成功: {video_length}秒")
                             else:
                                 logger.warning(f"[wxpad] 无法获取视频时长信息，使用默认值: {video_length}秒")
+                            if not thumb_bytes:
+                                raise Exception("缩略图为空")
+                            logger.info(f"[wxpad] 缩略图提取成功，大小: {len(thumb_bytes) / 1024:.2f} KB")
 
-                            # 读取第一帧
-                            ret, frame = cap.read()
-
-                            if not ret:
-                                cap.release()
-                                raise Exception("无法读取视频帧")
-
-                            # 调整缩略图大小为200x200（与示例脚本一致）
-                            frame = cv2.resize(frame, (200, 200))
-
-                            # 保存缩略图
-                            cv2.imwrite(thumb_path, frame)
-
-                            # 释放视频对象
-                            cap.release()
-
-                            # 验证缩略图文件是否成功生成
-                            if not (os.path.exists(thumb_path) and os.path.getsize(thumb_path) > 0):
-                                raise Exception("缩略图文件生成失败或为空")
-
-                            logger.info(f"[wxpad] 缩略图提取成功: {thumb_path}")
-                            logger.info(f"[wxpad] 缩略图文件大小: {os.path.getsize(thumb_path) / 1024:.2f} KB")
-
-                        except ImportError:
-                            logger.error(f"[wxpad] OpenCV未安装，无法生成缩略图，停止视频上传")
-                            raise Exception("OpenCV未安装，无法生成缩略图")
                         except Exception as e:
                             logger.error(f"[wxpad] 缩略图生成失败: {e}，停止视频上传")
                             raise Exception(f"缩略图生成失败: {e}")
 
 
 
-                        # 读取视频和缩略图为base64
-                        with open(temp_path, 'rb') as f:
-                            video_base64 = base64.b64encode(f.read()).decode('utf-8')
+                        # 视频在上传时从临时文件分块编码为base64，不整体读入内存
+                        video_base64 = Base64Data(temp_path)
 
-                        # 读取缩略图为base64（缩略图生成已确保成功）
-                        with open(thumb_path, 'rb') as f:
-                            thumb_data = base64.b64encode(f.read()).decode('utf-8')
+                        # 缩略图转为base64（缩略图生成已确保成功）
+                        thumb_data = base64.b64encode(thumb_bytes).decode('utf-8')
                         logger.info(f"[wxpad] 缩略图已准备，大小: {len(thumb_data)} 字符")
 
-                        logger.info(f"[wxpad] 视频Base64大小: {len(video_base64)}, 时长: {video_length}秒")
+                        logger.info(f"[wxpad] 视频Base64大小: {video_base64.encoded_length()}, 时长: {video_length}秒")
 
                         # 使用CDN上传视频（参考示例脚本的成功实现）
                         logger.info(f"[wxpad] 开始上传视频到CDN...")
                         logger.info(f"[wxpad] 包含缩略图数据")
 
-                        # 直接使用base64格式上传（与示例脚本保持一致）
+                        # 视频仍以base64字段上传（与示例脚本保持一致），请求体流式发送
                         upload_result = self.client.cdn_upload_video(
                             thumb_data=thumb_data,
                             to_user_name=receiver,
-                            video_data=video_base64  # 修正：直接使用base64字符串格式
+                            video_data=video_base64
                         )
 
                         # 清理临时文件
@@ -975,14 +1170,6 @@ class WxpadChannel(ChatChannel):
                             except Exception as e:
                                 logger.warning(f"[wxpad] 清理临时视频文件失败: {e}")
 
-                        # 清理缩略图临时文件
-                        if thumb_path and os.path.exists(thumb_path):
-                            try:
-                                os.remove(thumb_path)
-                                logger.debug(f"[wxpad] 已清理临时缩略图文件: {thumb_path}")
-                            except Exception as e:
-                                logger.warning(f"[wxpad] 清理临时缩略图文件失败: {e}")
-
                         if upload_result.get("Code") == 200:
                             logger.info(f"[wxpad] 视频URL上传成功")
                             upload_data = upload_result.get("Data", {})
@@ -992,7 +1179,7 @@ class WxpadChannel(ChatChannel):
                                 "AesKey": upload_data.get("FileAesKey", ""),
                                 "CdnThumbLength": upload_data.get("ThumbDataSize", 0),
                                 "CdnVideoUrl": upload_data.get("FileID", ""),
-                                "Length": upload_data.get("VideoDataSize", len(video_base64)),
+                                "Length": upload_data.get("VideoDataSize", video_base64.encoded_length()),
                                 "PlayLength": video_length,
                                 "ToUserName": receiver
                             }]
@@ -1059,13 +1246,6 @@ class WxpadChannel(ChatChannel):
                                 os.remove(temp_path)
                             except:
                                 pass
-                        # 清理缩略图文件
-                        thumb_path = temp_path + "_thumb.jpg" if temp_path else None
-                        if thumb_path and os.path.exists(thumb_path):
-                            try:
-                                os.remove(thumb_path)
-                            except:
-                                pass
                 except Exception as e:
                     logger.error(f"[wxpad] 处理视频URL异常: {e}")
                     msg_item = [{
@@ -1105,119 +1285,47 @@ class WxpadChannel(ChatChannel):
                     import os
                     import uuid
                     
+                    # 视频数据先分块写入临时文件，时长/缩略图探测和上传都基于该文件，不在内存中复制整段视频
+                    temp_video_path = os.path.join(TmpDir().path(), f"temp_video_{uuid.uuid4().hex[:8]}.mp4")
+
                     try:
-                        # 处理不同类型的视频数据
-                        if isinstance(video_data, str):
-                            video_base64 = video_data
-                        elif isinstance(video_data, BytesIO):
-                            # BytesIO对象 - 读取数据并编码
-                            video_data.seek(0)  # 重置指针到开头
-                            video_bytes = video_data.read()
-                            video_base64 = b64_module.b64encode(video_bytes).decode('utf-8')
-                        elif isinstance(video_data, bytes):
-                            # 字节数据 - 直接编码
-                            video_base64 = b64_module.b64encode(video_data).decode('utf-8')
-                        elif hasattr(video_data, 'read'):
-                            # 文件对象 - 读取数据并编码
-                            video_data.seek(0)  # 重置指针到开头
-                            video_bytes = video_data.read()
-                            video_base64 = b64_module.b64encode(video_bytes).decode('utf-8')
-                        else:
-                            # 其他类型，尝试直接编码
-                            video_base64 = b64_module.b64encode(video_data).decode('utf-8')
+                        with open(temp_video_path, 'wb') as f:
+                            if isinstance(video_data, str):
+                                # base64字符串 - 解码后写入
+                                f.write(b64_module.b64decode(video_data))
+                            elif hasattr(video_data, 'read'):
+                                # BytesIO或文件对象 - 从头按块复制
+                                video_data.seek(0)
+                                shutil.copyfileobj(video_data, f)
+                            else:
+                                # 字节数据 - 直接写入
+                                f.write(video_data)
+                        # 上传时从临时文件分块读取并编码
+                        video_base64 = Base64Data(temp_video_path)
 
                         # 处理缩略图数据 - 如果没有提供则自动生成
                         if not thumb_data or (isinstance(thumb_data, str) and not thumb_data.strip()):
                             logger.info(f"[wxpad] 没有提供缩略图，开始自动生成...")
 
-                            # 需要从video_data生成缩略图
-                            temp_dir = TmpDir().path()
-                            temp_video_path = os.path.join(temp_dir, f"temp_video_{uuid.uuid4().hex[:8]}.mp4")
-                            temp_thumb_path = temp_video_path + "_thumb.jpg"
-
                             try:
-                                # 将视频数据写入临时文件 - 统一处理不同数据类型
-                                if isinstance(video_data, str):
-                                    # 如果是base64字符串，先解码
-                                    video_bytes = b64_module.b64decode(video_data)
-                                elif isinstance(video_data, BytesIO):
-                                    # BytesIO对象 - 读取字节数据
-                                    video_data.seek(0)
-                                    video_bytes = video_data.read()
-                                elif isinstance(video_data, bytes):
-                                    # 字节数据 - 直接使用
-                                    video_bytes = video_data
-                                elif hasattr(video_data, 'read'):
-                                    # 文件对象 - 读取数据
-                                    video_data.seek(0)
-                                    video_bytes = video_data.read()
-                                else:
-                                    # 其他类型，尝试直接使用
-                                    video_bytes = video_data
-
-                                with open(temp_video_path, 'wb') as f:
-                                    f.write(video_bytes)
-
-                                # 使用OpenCV生成缩略图并计算时长
-                                import cv2
-                                cap = cv2.VideoCapture(temp_video_path)
-
-                                if not cap.isOpened():
-                                    raise Exception(f"无法打开临时视频文件: {temp_video_path}")
-
-                                # 计算视频时长
-                                fps = cap.get(cv2.CAP_PROP_FPS)
-                                frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
-                                if fps > 0 and frame_count > 0:
-                                    duration = frame_count / fps
+                                # 从MP4头部读取时长，截取第一个关键帧为缩略图（最长边200，保持宽高比）
+                                duration, thumb_bytes = media_pool.video_probe_thumbnail(temp_video_path, 200)
+                                if duration:
                                     calculated_length = max(1, int(duration))  # 至少1秒
-                                    logger.info(f"[wxpad] 计算视频时长: {calculated_length}秒 (FPS: {fps:.2f}, 帧数: {frame_count})")
+                                    logger.info(f"[wxpad] 计算视频时长: {calculated_length}秒")
                                     play_length = calculated_length  # 使用计算的时长
                                 else:
                                     logger.warning(f"[wxpad] 无法计算视频时长，使用传入值: {play_length}秒")
 
-                                ret, frame = cap.read()
-                                if not ret:
-                                    cap.release()
-                                    raise Exception("无法读取视频帧")
-
-                                # 调整缩略图大小为200x200
-                                frame = cv2.resize(frame, (200, 200))
-                                cv2.imwrite(temp_thumb_path, frame)
-                                cap.release()
-
-                                # 验证缩略图生成
-                                if not (os.path.exists(temp_thumb_path) and os.path.getsize(temp_thumb_path) > 0):
-                                    raise Exception("缩略图文件生成失败或为空")
-
-                                # 读取生成的缩略图
-                                with open(temp_thumb_path, 'rb') as f:
-                                    thumb_base64 = b64_module.b64encode(f.read()).decode('utf-8')
+                                if not thumb_bytes:
+                                    raise Exception("缩略图为空")
+                                thumb_base64 = b64_module.b64encode(thumb_bytes).decode('utf-8')
 
                                 logger.info(f"[wxpad] 缩略图自动生成成功")
 
-                                # 清理临时文件
-                                try:
-                                    os.remove(temp_video_path)
-                                    os.remove(temp_thumb_path)
-                                except Exception:
-                                    pass
-
-                            except ImportError:
-                                logger.error(f"[wxpad] OpenCV未安装，无法自动生成缩略图，停止视频上传")
-                                thumb_base64 = None  # 确保变量有值
-                                raise Exception("OpenCV未安装，无法自动生成缩略图")
                             except Exception as e:
                                 logger.error(f"[wxpad] 自动生成缩略图失败: {e}，停止视频上传")
                                 thumb_base64 = None  # 确保变量有值
-                                # 清理临时文件
-                                try:
-                                    if os.path.exists(temp_video_path):
-                                        os.remove(temp_video_path)
-                                    if os.path.exists(temp_thumb_path):
-                                        os.remove(temp_thumb_path)
-                                except Exception:
-                                    pass
                                 raise Exception(f"自动生成缩略图失败: {e}")
                         else:
                             # 已提供缩略图数据，但仍需计算时长
@@ -1228,60 +1336,18 @@ class WxpadChannel(ChatChannel):
                             logger.info(f"[wxpad] 使用提供的缩略图数据")
 
                             # 即使有缩略图，也要计算准确的视频时长
-                            temp_dir = TmpDir().path()
-                            temp_video_path = os.path.join(temp_dir, f"temp_video_{uuid.uuid4().hex[:8]}.mp4")
-
                             try:
-                                # 将视频数据写入临时文件用于时长计算 - 统一处理不同数据类型
-                                if isinstance(video_data, str):
-                                    video_bytes = b64_module.b64decode(video_data)
-                                elif isinstance(video_data, BytesIO):
-                                    video_data.seek(0)
-                                    video_bytes = video_data.read()
-                                elif isinstance(video_data, bytes):
-                                    video_bytes = video_data
-                                elif hasattr(video_data, 'read'):
-                                    video_data.seek(0)
-                                    video_bytes = video_data.read()
-                                else:
-                                    video_bytes = video_data
-
-                                with open(temp_video_path, 'wb') as f:
-                                    f.write(video_bytes)
-
-                                # 使用OpenCV计算时长
-                                import cv2
-                                cap = cv2.VideoCapture(temp_video_path)
-
-                                if cap.isOpened():
-                                    fps = cap.get(cv2.CAP_PROP_FPS)
-                                    frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
-                                    if fps > 0 and frame_count > 0:
-                                        duration = frame_count / fps
-                                        calculated_length = max(1, int(duration))
-                                        logger.info(f"[wxpad] 重新计算视频时长: {calculated_length}秒 (原传入值: {play_length}秒)")
-                                        play_length = calculated_length  # 使用计算的时长
-                                    else:
-                                        logger.warning(f"[wxpad] 无法计算视频时长，使用传入值: {play_length}秒")
-                                    cap.release()
+                                # 从MP4头部读取时长，非MP4时再用OpenCV计算
+                                duration, _ = media_pool.video_probe_thumbnail(temp_video_path, None)
+                                if duration:
+                                    calculated_length = max(1, int(duration))
+                                    logger.info(f"[wxpad] 重新计算视频时长: {calculated_length}秒 (原传入值: {play_length}秒)")
+                                    play_length = calculated_length  # 使用计算的时长
                                 else:
-                                    logger.warning(f"[wxpad] 无法打开视频文件计算时长，使用传入值: {play_length}秒")
-
-                                # 清理临时文件
-                                try:
-                                    if os.path.exists(temp_video_path):
-                                        os.remove(temp_video_path)
-                                except Exception:
-                                    pass
+                                    logger.warning(f"[wxpad] 无法计算视频时长，使用传入值: {play_length}秒")
 
                             except Exception as e:
                                 logger.warning(f"[wxpad] 时长计算失败: {e}，使用传入值: {play_length}秒")
-                                # 清理临时文件
-                                try:
-                                    if os.path.exists(temp_video_path):
-                                        os.remove(temp_video_path)
-                                except Exception:
-                                    pass
 
                         # 使用CDN上传视频（参考示例脚本的成功实现）
                         logger.info(f"[wxpad] 开始上传视频到CDN...")
@@ -1291,11 +1357,11 @@ class WxpadChannel(ChatChannel):
                             logger.error(f"[wxpad] 视频或缩略图数据未正确初始化")
                             raise Exception("视频或缩略图数据未正确初始化")
 
-                        # 直接使用base64格式上传（与示例脚本保持一致）
+                        # 视频仍以base64字段上传（与示例脚本保持一致），请求体流式发送
                         upload_result = self.client.cdn_upload_video(
                             thumb_data=thumb_base64,
                             to_user_name=receiver,
-                            video_data=video_base64  # 修正：直接使用base64字符串格式
+                            video_data=video_base64
                         )
 
                         if upload_result.get("Code") == 200:
@@ -1307,7 +1373,7 @@ class WxpadChannel(ChatChannel):
                                 "AesKey": upload_data.get("FileAesKey", ""),
                                 "CdnThumbLength": upload_data.get("ThumbDataSize", 0),
                                 "CdnVideoUrl": upload_data.get("FileID", ""),
-                                "Length": upload_data.get("VideoDataSize", len(video_base64) if video_base64 else 0),
+                                "Length": upload_data.get("VideoDataSize", video_base64.encoded_length() if isinstance(video_base64, Base64Data) else len(video_base64)),
                                 "PlayLength": play_length,
                                 "ToUserName": receiver
                             }]
@@ -1343,6 +1409,13 @@ class WxpadChannel(ChatChannel):
                         logger.error(f"[wxpad] 视频发送异常 {e}")
                         import traceback
                         logger.error(f"[wxpad] 详细错误信息: {traceback.format_exc()}")
+                    finally:
+                        # 上传完成后清理临时文件
+                        try:
+                            if os.path.exists(temp_video_path):
+                                os.remove(temp_video_path)
+                        except Exception:
+                            pass
                 else:
                     logger.error(f"[wxpad] Invalid video content format: {type(reply.content)}")
 
@@ -1477,25 +1550,71 @@ class WxpadChannel(ChatChannel):
         Returns:
             bool: 发送是否成功
         """
-        temp_file_path = None
         try:
-            # 根据数据类型处理图片，直接转换为base64
+            image_base64 = self._image_to_base64(image_data)
+            if not image_base64:
+                return False
+
+            # 使用client API发送图片
+            msg_item = [{
+                "AtWxIDList": [],
+                "ImageContent": image_base64,
+                "MsgType": 3,  # 图片消息类型
+                "TextContent": "",
+                "ToUserName": to_wxid
+            }]
+
+            # 尝试使用新的图片发送接口
+            result = self.client.send_image_new_message(msg_item)
+
+            if result.get("Code") == 200:
+                # 检查详细的响应数据 - 新API响应格式
+                data = result.get("Data", [])
+                if data and isinstance(data, list) and len(data) > 0:
+                    first_item = data[0]
+                    if isinstance(first_item, dict):
+                        # 新API使用resp.baseResponse.ret来判断成功状态
+                        resp_data = first_item.get("resp", {})
+                        if resp_data:
+                            base_response = resp_data.get("baseResponse", {})
+                            ret_code = base_response.get("ret", -1)
+
+                            # 新API：ret=0表示成功
+                            if ret_code != 0:
+                                logger.warning(f"[send_image] 图片发送失败 ret={ret_code}")
+                                return False
+                        else:
+                            # 兼容旧API格式
+                            is_success = first_item.get("isSendSuccess", False)
+                            if not is_success:
+                                err_msg = first_item.get("errMsg", "")
+                                logger.warning(f"[send_image] 图片发送失败 {err_msg}")
+                                return False
+
+                logger.info(f"[wxpad] ✅ 发送图片到 {to_wxid}")
+                return True
+            else:
+                logger.error(f"[send_image] 图片发送失败 Code={result.get('Code')}, Text={result.get('Text', '')}")
+                return False
+
+        except Exception as e:
+            logger.error(f"[send_image] 发送图片异常 {e}")
+            return False
+
+    def _image_to_base64(self, image_data):
+        """把send_image支持的各种图片数据统一转换为base64，失败返回None"""
+        try:
             image_base64 = None
 
             if isinstance(image_data, str):
                 # 检查是否为URL
                 if image_data.startswith(('http://', 'https://')):
-                    # 直接下载到内存，不保存临时文件
+                    # 通过共享下载服务获取（连接复用、大小限制、条件请求缓存）
                     try:
-                        headers = {
-                            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-                        }
-                        response = requests.get(image_data, headers=headers, timeout=30)
-                        response.raise_for_status()
-                        image_base64 = base64.b64encode(response.content).decode("utf-8")
+                        image_base64 = base64.b64encode(get_fetcher().fetch(image_data, timeout=30).read()).decode("utf-8")
                     except Exception as e:
                         logger.error(f"[send_image] 下载图片失败: {e}")
-                        return False
+                        return None
 
                 elif image_data.startswith('data:image/'):
                     # base64格式: data:image/jpeg;base64,/9j/4AAQ...
@@ -1512,24 +1631,13 @@ class WxpadChannel(ChatChannel):
                     # 本地文件路径
                     if not os.path.exists(image_data):
                         logger.error(f"[send_image] 本地图片文件不存在 {image_data}")
-                        return False
+                        return None
 
-                    # 预处理图片：确保格式兼容
+                    # 预处理图片：已是JPEG且大小合适时直接使用，否则在媒体进程池中重新编码为JPEG（确保兼容性）
                     try:
-                        from PIL import Image
-                        import io
-
-                        # 用PIL重新处理图片
-                        img = Image.open(image_data)
-
-                        # 转换为RGB模式（确保兼容性）
-                        if img.mode != 'RGB':
-                            img = img.convert('RGB')
-
-                        # 重新编码为JPEG格式（确保兼容性）
-                        output = io.BytesIO()
-                        img.save(output, format='JPEG', quality=85, optimize=True)
-                        processed_bytes = output.getvalue()
+                        processed_bytes = media_pool.reencode_image(
+                            image_data, quality=85, max_bytes=conf().get("wechatpadpro_image_max_bytes")
+                        )
 
                         image_base64 = base64.b64encode(processed_bytes).decode('utf-8')
 
@@ -1579,16 +1687,16 @@ class WxpadChannel(ChatChannel):
 
             else:
                 logger.error(f"[send_image] 不支持的图片数据类型: {type(image_data)}")
-                return False
+                return None
 
             if not image_base64:
                 logger.error(f"[send_image] 无法获取图片base64数据")
-                return False
+                return None
 
             # 验证Base64数据完整
             if len(image_base64) < 100:  # Base64数据太短
                 logger.error(f"[send_image] Base64数据过短，可能有问题: {len(image_base64)}字符")
-                return False
+                return None
 
             # 验证Base64格式
             try:
@@ -1596,56 +1704,16 @@ class WxpadChannel(ChatChannel):
                 test_decode = base64.b64decode(image_base64)
                 if len(test_decode) < 50:  # 解码后数据太短
                     logger.error(f"[send_image] 解码后数据过短，可能有问题: {len(test_decode)}字节")
-                    return False
+                    return None
             except Exception as e:
                 logger.error(f"[send_image] Base64数据格式验证失败: {e}")
-                return False
-
-            # 使用client API发送图片
-            msg_item = [{
-                "AtWxIDList": [],
-                "ImageContent": image_base64,
-                "MsgType": 3,  # 图片消息类型
-                "TextContent": "",
-                "ToUserName": to_wxid
-            }]
-
-            # 尝试使用新的图片发送接口
-            result = self.client.send_image_new_message(msg_item)
-
-            if result.get("Code") == 200:
-                # 检查详细的响应数据 - 新API响应格式
-                data = result.get("Data", [])
-                if data and isinstance(data, list) and len(data) > 0:
-                    first_item = data[0]
-                    if isinstance(first_item, dict):
-                        # 新API使用resp.baseResponse.ret来判断成功状态
-                        resp_data = first_item.get("resp", {})
-                        if resp_data:
-                            base_response = resp_data.get("baseResponse", {})
-                            ret_code = base_response.get("ret", -1)
-
-                            # 新API：ret=0表示成功
-                            if ret_code != 0:
-                                logger.warning(f"[send_image] 图片发送失败 ret={ret_code}")
-                                return False
-                        else:
-                            # 兼容旧API格式
-                            is_success = first_item.get("isSendSuccess", False)
-                            if not is_success:
-                                err_msg = first_item.get("errMsg", "")
-                                logger.warning(f"[send_image] 图片发送失败 {err_msg}")
-                                return False
+                return None
 
-                logger.info(f"[wxpad] ✅ 发送图片到 {to_wxid}")
-                return True
-            else:
-                logger.error(f"[send_image] 图片发送失败 Code={result.get('Code')}, Text={result.get('Text', '')}")
-                return False
+            return image_base64
 
         except Exception as e:
-            logger.error(f"[send_image] 发送图片异常 {e}")
-            return False
+            logger.error(f"[send_image] 图片转换base64异常 {e}")
+            return None
 
 
 
@@ -1659,101 +1727,95 @@ class WxpadChannel(ChatChannel):
         Returns:
             dict: 包含Success字段的结果数据
         """
-        try:
-            import os
-            import base64
-            import time
-            import traceback
-            from common.tmp_dir import TmpDir
-
-            if not to_user_id:
-                logger.error("[wxpad] Send voice failed: receiver ID is empty")
-                return {"Success": False, "Message": "Receiver ID empty"}
-            if not os.path.exists(voice_file_path_segment):
-                logger.error(f"[wxpad] Send voice failed: voice segment file not found at {voice_file_path_segment}")
-                return {"Success": False, "Message": f"Voice segment not found: {voice_file_path_segment}"}
-
-            # 微信语音条只支持SILK格式，需要转换
-            silk_file_path = None
-            temp_files_to_clean = []
-
-            try:
-                # 检查是否已经是SILK格式
-                if voice_file_path_segment.lower().endswith(('.silk', '.sil', '.slk')):
-                    silk_file_path = voice_file_path_segment
-                    # 对于已有的SILK文件，尝试获取时长
-                    try:
-                        import pilk
-                        duration_ms = pilk.get_duration(silk_file_path)
-                        duration_seconds = max(1, int(duration_ms / 1000))
-                        logger.debug(f"[wxpad] 文件已是SILK格式: {voice_file_path_segment}, 时长={duration_seconds}秒")
-                    except Exception as e:
-                        duration_seconds = 10  # 默认10秒
-                        logger.warning(f"[wxpad] 无法获取SILK文件时长，使用默认10秒 {e}")
-                else:
-                    # 转换为SILK格式
-                    from voice.audio_convert import any_to_sil
-
-                    # 创建临时SILK文件
-                    temp_dir = TmpDir().path()
-                    silk_filename = f"voice_{int(time.time())}_{os.path.basename(voice_file_path_segment)}.silk"
-                    silk_file_path = os.path.join(temp_dir, silk_filename)
-                    temp_files_to_clean.append(silk_file_path)
-
-                    logger.info(f"[wxpad] 转换语音为SILK格式: {voice_file_path_segment} -> {silk_file_path}")
-
-                    # 执行转换
-                    duration_ms = any_to_sil(voice_file_path_segment, silk_file_path)
-                    duration_seconds = max(1, int(duration_ms / 1000))
-                    logger.info(f"[wxpad] SILK转换成功: 时长={duration_ms}ms ({duration_seconds}秒)")
-
-                # 读取SILK文件并转换为base64
-                with open(silk_file_path, "rb") as f:
-                    silk_data = f.read()
-                    silk_base64 = base64.b64encode(silk_data).decode()
-
-                # 使用xbot协议发送SILK语音
-                logger.info(f"[wxpad] 发送SILK语音: 接收者{to_user_id}, 时长={duration_seconds}秒 大小={len(silk_data)}字节")
+        return self._send_voice_segment(to_user_id, voice_file_path_segment)
 
-                # 验证SILK文件质量
-                if len(silk_data) < 100:  # SILK文件过小可能有问题
-                    logger.warning(f"[wxpad] SILK文件可能过小: {len(silk_data)}字节")
+    def _send_voice_segment(self, to_user_id, voice_file_path_segment):
+        """同步完成单个语音片段的SILK编码和发送"""
+        if not to_user_id:
+            logger.error("[wxpad] Send voice failed: receiver ID is empty")
+            return {"Success": False, "Message": "Receiver ID empty"}
+        encoded = self._encode_voice_segment(voice_file_path_segment)
+        if not encoded.get("Success"):
+            return encoded
+        return self._upload_voice_segment(to_user_id, encoded)
 
-                # 确保时长合理（至多60秒，最少1秒）
-                duration_seconds = max(1, min(60, duration_seconds))
-
-                result = self.client.send_voice(
-                    to_user_name=to_user_id,
-                    voice_data=silk_base64,
-                    voice_format=4,  # 修正：SILK格式使用1而不使用4
-                    voice_second=duration_seconds
-                )
-
-                if result.get("Code") == 200:
-                    logger.info(f"[wxpad] 发送SILK语音消息成功: 接收者 {to_user_id}")
-                    return {"Success": True, "Data": result.get("Data", {})}
-                else:
-                    logger.error(f"[wxpad] 发送SILK语音消息失败: {result}")
-                    return {"Success": False, "Error": f"API返回错误: {result}"}
+    def _encode_voice_segment(self, voice_file_path_segment):
+        """把语音片段转换为SILK数据，可在线程池中与上一个片段的上传并行执行
 
+        Args:
+            voice_file_path_segment: 语音文件路径，或已解码的PCM片段(audio_codec.PcmAudio)
+        Returns:
+            dict: Success为True时包含silk_data和duration_seconds
+        """
+        import traceback
+        from voice import audio_codec
+        if isinstance(voice_file_path_segment, audio_codec.PcmAudio):
+            try:
+                silk_data, duration_ms = media_pool.transcode_audio(voice_file_path_segment, "silk")
+                duration_seconds = max(1, int(duration_ms / 1000))
+                return {"Success": True, "silk_data": silk_data, "duration_seconds": duration_seconds}
             except Exception as e:
-                logger.error(f"[wxpad] 发送语音消息失败 {e}")
+                logger.error(f"[wxpad] 语音片段编码SILK失败: {e}")
+                logger.error(traceback.format_exc())
                 return {"Success": False, "Error": str(e)}
+        if not os.path.exists(voice_file_path_segment):
+            logger.error(f"[wxpad] Send voice failed: voice segment file not found at {voice_file_path_segment}")
+            return {"Success": False, "Message": f"Voice segment not found: {voice_file_path_segment}"}
 
-            finally:
-                # 清理临时文件
-                for temp_file in temp_files_to_clean:
-                    try:
-                        if os.path.exists(temp_file):
-                            os.remove(temp_file)
-                            logger.debug(f"[wxpad] 清理临时SILK文件: {temp_file}")
-                    except Exception as cleanup_e:
-                        logger.warning(f"[wxpad] 清理临时文件失败: {temp_file}, 错误: {cleanup_e}")
+        # 微信语音条只支持SILK格式，需要转换
+        try:
+            # 检查是否已经是SILK格式
+            if voice_file_path_segment.lower().endswith(('.silk', '.sil', '.slk')):
+                # 已是SILK格式（如语音合成缓存中的文件）时原样发送，只解码计算时长
+                try:
+                    silk_data, duration_ms = media_pool.transcode_audio(voice_file_path_segment, "silk")
+                    duration_seconds = max(1, int(duration_ms / 1000))
+                    logger.debug(f"[wxpad] 文件已是SILK格式: {voice_file_path_segment}, 时长={duration_seconds}秒")
+                except Exception as e:
+                    duration_seconds = 10  # 默认10秒
+                    logger.warning(f"[wxpad] 无法获取SILK文件时长，使用默认10秒 {e}")
+                    with open(voice_file_path_segment, "rb") as f:
+                        silk_data = f.read()
+            else:
+                # 在媒体进程池中转换为SILK格式，不写临时文件
+                logger.info(f"[wxpad] 转换语音为SILK格式: {voice_file_path_segment}")
+                silk_data, duration_ms = media_pool.transcode_audio(voice_file_path_segment, "silk")
+                duration_seconds = max(1, int(duration_ms / 1000))
+                logger.info(f"[wxpad] SILK转换成功: 时长={duration_ms}ms ({duration_seconds}秒)")
+
+            # 验证SILK文件质量
+            if len(silk_data) < 100:  # SILK文件过小可能有问题
+                logger.warning(f"[wxpad] SILK文件可能过小: {len(silk_data)}字节")
+            return {"Success": True, "silk_data": silk_data, "duration_seconds": duration_seconds}
 
         except Exception as e:
-            logger.error(f"[wxpad] Exception in _send_voice for {voice_file_path_segment} to {to_user_id}: {e}")
+            logger.error(f"[wxpad] 语音转换SILK失败 {voice_file_path_segment}: {e}")
             logger.error(traceback.format_exc())
-            return {"Success": False, "Message": f"General exception in _send_voice: {e}"}
+            return {"Success": False, "Error": str(e)}
+
+    def _upload_voice_segment(self, to_user_id, encoded):
+        """发送已编码的SILK语音片段"""
+        try:
+            silk_data = encoded["silk_data"]
+            # 确保时长合理（至多60秒，最少1秒）
+            duration_seconds = max(1, min(60, encoded["duration_seconds"]))
+            # 使用xbot协议发送SILK语音
+            logger.info(f"[wxpad] 发送SILK语音: 接收者{to_user_id}, 时长={duration_seconds}秒 大小={len(silk_data)}字节")
+            result = self.client.send_voice(
+                to_user_name=to_user_id,
+                voice_data=base64.b64encode(silk_data).decode(),
+                voice_format=4,  # 修正：SILK格式使用1而不使用4
+                voice_second=duration_seconds
+            )
+            if result.get("Code") == 200:
+                logger.info(f"[wxpad] 发送SILK语音消息成功: 接收者 {to_user_id}")
+                return {"Success": True, "Data": result.get("Data", {})}
+            else:
+                logger.error(f"[wxpad] 发送SILK语音消息失败: {result}")
+                return {"Success": False, "Error": f"API返回错误: {result}"}
+        except Exception as e:
+            logger.error(f"[wxpad] 发送语音消息失败 {e}")
+            return {"Success": False, "Error": str(e)}
 
 
 
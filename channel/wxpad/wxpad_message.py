@@ -11,12 +11,30 @@ import requests
 import xml.etree.ElementTree as ET
 from common import memory
 
+try:
+    # 可选依赖：安装lxml后使用更快的XML解析器
+    from lxml import etree as _lxml_etree
+    _LXML_PARSER = _lxml_etree.XMLParser(resolve_entities=False, no_network=True, huge_tree=False)
+except ImportError:
+    _lxml_etree = None
+
+
+def parse_xml(xml_content: str):
+    """解析XML字符串，解析失败统一抛出ET.ParseError"""
+    if _lxml_etree is not None:
+        try:
+            return _lxml_etree.fromstring(xml_content.encode('utf-8'), parser=_LXML_PARSER)
+        except _lxml_etree.XMLSyntaxError as e:
+            raise ET.ParseError(str(e))
+    return ET.fromstring(xml_content)
+
 
 class WechatPadProMessage(ChatMessage):
     def __init__(self, msg, client: WxpadClient = None):
         super().__init__(msg)
         self.msg = msg
         self.content = ''  # 初始化self.content为空字符串
+        self._xml_cache = {}  # XML内容 -> 解析结果，同一消息的各个提取步骤共享
         
         # 安全初始化：确保关键属性在所有执行路径中都有默认值
         self.msg_source = ''
@@ -128,7 +146,7 @@ class WechatPadProMessage(ChatMessage):
             if xml_start != -1:
                 content_xml = content_xml[xml_start:]
             try:
-                root = ET.fromstring(content_xml)
+                root = self._parse_xml(content_xml)
                 appmsg = root.find('appmsg')
                 if appmsg is not None:
                     msg_type_node = appmsg.find('type')
@@ -199,7 +217,7 @@ class WechatPadProMessage(ChatMessage):
             if any(note in content for note in notes_join_group):
                 try:
                     xml_content = content.split(':\n', 1)[1] if ':\n' in content else content
-                    root = ET.fromstring(xml_content)
+                    root = self._parse_xml(xml_content)
                     
                     sysmsgtemplate = root.find('.//sysmsgtemplate')
                     if sysmsgtemplate is None:
@@ -407,10 +425,16 @@ class WechatPadProMessage(ChatMessage):
             self.is_at = False
             msg_source = self.msg_data.get('MsgSource', '')
             
-            # 尝试从XML解析@列表
-            if msg_source:
+            # 尝试从XML解析@列表，常见格式直接做子串判断，无需解析整个MsgSource
+            at_start = msg_source.find('<atuserlist>') if msg_source else -1
+            at_end = msg_source.find('</atuserlist>', at_start) if at_start != -1 else -1
+            if at_end != -1:
+                self.is_at = self.to_user_id in msg_source[at_start + len('<atuserlist>'):at_end]
+            elif msg_source and msg_source.lstrip().startswith('<') and '<atuserlist' not in msg_source:
+                self.is_at = False
+            elif msg_source:
                 try:
-                    root = ET.fromstring(msg_source)
+                    root = self._parse_xml(msg_source)
                     atuserlist_elem = root.find('atuserlist')
                     if atuserlist_elem is not None and atuserlist_elem.text:
                         self.is_at = self.to_user_id in atuserlist_elem.text
@@ -448,8 +472,6 @@ class WechatPadProMessage(ChatMessage):
                 logger.error("[wxpad] 没有找到语音XML内容")
                 return
                 
-            import xml.etree.ElementTree as ET
-            
             try:
                 # 处理群聊消息中的用户ID前缀
                 if self.is_group and ':' in content_xml:
@@ -462,7 +484,7 @@ class WechatPadProMessage(ChatMessage):
                     return
                 
                 # 解析XML获取语音参数
-                root = ET.fromstring(content_xml)
+                root = self._parse_xml(content_xml)
                 voicemsg = root.find('voicemsg')
                 if voicemsg is None:
                     logger.error("[wxpad] XML中没有找到voicemsg元素")
@@ -498,10 +520,21 @@ class WechatPadProMessage(ChatMessage):
                     if voice_base64:
                         import base64
                         import os
-                        from voice.audio_convert import any_to_mp3
+                        from voice.audio_convert import any_to_mp3, silk_to_wav
                         
                         # 解码Base64获取SILK数据
                         voice_data = base64.b64decode(voice_base64)
+                        target_duration = voice_length / 1000.0 if voice_length > 0 else None
+
+                        # 优先在内存中直接解码为语音识别使用的WAV，不落盘SILK/MP3中间文件
+                        wav_file_path = os.path.splitext(self.content)[0] + ".wav"
+                        try:
+                            silk_to_wav(voice_data, wav_file_path, target_duration=target_duration)
+                            self.content = wav_file_path
+                            logger.info(f"[wxpad] 语音处理完成: {wav_file_path}, 时长: {target_duration}秒")
+                            return
+                        except Exception as e:
+                            logger.warning(f"[wxpad] SILK直接转WAV失败，改用MP3转换: {e}")
                         
                         # 保存SILK文件
                         silk_file_path = self.content
@@ -512,7 +545,6 @@ class WechatPadProMessage(ChatMessage):
                         
                         # 转换为MP3，传入目标时长（毫秒转秒）
                         mp3_file_path = os.path.splitext(silk_file_path)[0] + ".mp3"
-                        target_duration = voice_length / 1000.0 if voice_length > 0 else None
                         any_to_mp3(silk_file_path, mp3_file_path, target_duration=target_duration)
                         
                         # 使用MP3文件
@@ -538,14 +570,12 @@ class WechatPadProMessage(ChatMessage):
     def _extract_cdn_info_from_xml(self, xml_content: str) -> dict:
         """从XML内容中提取图片CDN信息"""
         try:
-            import xml.etree.ElementTree as ET
-            
             # 清理XML前缀（处理群聊消息中的用户ID前缀）
             xml_start = xml_content.find('<?xml')
             if xml_start != -1:
                 xml_content = xml_content[xml_start:]
             
-            root = ET.fromstring(xml_content)
+            root = self._parse_xml(xml_content)
             img_element = root.find('img')
 
             if img_element is None:
@@ -712,14 +742,12 @@ class WechatPadProMessage(ChatMessage):
     def _extract_video_info_from_xml(self, xml_content: str) -> dict:
         """从XML内容中提取视频CDN信息"""
         try:
-            import xml.etree.ElementTree as ET
-            
             # 清理XML前缀（处理群聊消息中的用户ID前缀）
             xml_start = xml_content.find('<?xml')
             if xml_start != -1:
                 xml_content = xml_content[xml_start:]
             
-            root = ET.fromstring(xml_content)
+            root = self._parse_xml(xml_content)
             video_element = root.find('videomsg')
 
             if video_element is None:
@@ -848,8 +876,10 @@ class WechatPadProMessage(ChatMessage):
             logger.error(f"[wxpad] 文件下载异常: {e}", exc_info=True)
 
     def prepare(self):
-        if self._prepare_fn:
+        # 下载只需执行一次：媒体消息在接收时已准备好，之后channel/插件/bot再调用时原始数据可能已释放
+        if self._prepare_fn and not self._prepared:
             self._prepare_fn()
+            self._prepared = True
             
     def _clear_image_cache_for_text(self):
         """为普通文本消息清理图片缓存，避免误用之前的多模态内容"""
@@ -882,7 +912,23 @@ class WechatPadProMessage(ChatMessage):
             logger.error(f"[wxpad] 清理图片缓存异常: {e}")
             
 
-    def _is_non_user_message(self, msg_source: str, from_user_id, content: str = '', msg_type: int = 0) -> bool:
+    def release_raw(self):
+        """消息解析、下载完成并提交处理后释放原始数据，缩小在缓存中长期存活的消息对象"""
+        self.msg = None
+        self.msg_data = {}
+        self._rawmsg = None
+        self._xml_cache = {}
+
+    def _parse_xml(self, xml_content: str):
+        """解析XML并按内容缓存，避免类型判断、CDN信息提取等步骤重复解析同一段XML"""
+        root = self._xml_cache.get(xml_content)
+        if root is None:
+            root = parse_xml(xml_content)
+            self._xml_cache[xml_content] = root
+        return root
+
+    @staticmethod
+    def _is_non_user_message(msg_source: str, from_user_id, content: str = '', msg_type: int = 0) -> bool:
         """检查消息是否来自非用户账号（如公众号、腾讯游戏、微信团队等）
         
         Args:
@@ -1129,10 +1175,8 @@ class WechatPadProMessage(ChatMessage):
             dict: 包含文件信息的字典，如果解析失败返回空字典
         """
         try:
-            import xml.etree.ElementTree as ET
-            
             # 尝试解析XML内容
-            root = ET.fromstring(refer_content)
+            root = self._parse_xml(refer_content)
             appmsg = root.find('appmsg')
             
             if appmsg is None:
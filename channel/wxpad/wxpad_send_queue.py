@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from bridge.reply import ReplyType
+from common import metrics
+from common.log import logger
+from common.token_bucket import TokenBucket
+
+TEXT_REPLY_TYPES = (ReplyType.TEXT, ReplyType.ERROR, ReplyType.INFO)
+
+
+class _OutboundItem:
+    __slots__ = ("reply", "context", "attempt", "not_before")
+
+    def __init__(self, reply, context):
+        self.reply = reply
+        self.context = context
+        self.attempt = 0
+        self.not_before = 0
+
+
+class WxpadSendQueue:
+    """wxpad出站消息队列
+
+    - 同一接收者的消息按入队顺序串行发送，不同接收者之间并行
+    - 同一接收者排队中的连续文本合并为一次SendTextMessage请求(MsgItem列表)
+    - 发送失败按退避时间重新排入该接收者队首，等待期间不占用处理线程
+    - 可选按账号限制每分钟发送条数，避免触发风控
+    """
+
+    def __init__(self, channel, workers=4, rate_per_minute=0, batch_size=5, max_retries=2):
+        self.channel = channel
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max_retries
+        # 令牌桶支持小数速率，每分钟不足1条(如0.5)时按配置的间隔发送
+        self._rate_limiter = TokenBucket(float(rate_per_minute)) if rate_per_minute and rate_per_minute > 0 else None
+        self._cond = threading.Condition()
+        self._queues = OrderedDict()  # receiver -> deque[_OutboundItem]
+        self._busy = set()  # 正在发送中的接收者
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="wxpad_send")
+        threading.Thread(target=self._dispatch_loop, daemon=True).start()
+
+    def put(self, receiver, reply, context):
+        with self._cond:
+            self._queues.setdefault(receiver, deque()).append(_OutboundItem(reply, context))
+            self._cond.notify()
+
+    def pending(self) -> int:
+        with self._cond:
+            return sum(len(q) for q in self._queues.values())
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                wait = self._dispatch_ready()
+                self._cond.wait(wait)
+
+    def _dispatch_ready(self):
+        """把可发送的接收者交给线程池，返回距离下一个重试到期的等待时间，调用方需持有self._cond"""
+        now = time.time()
+        wait = None
+        for receiver in list(self._queues.keys()):
+            queue = self._queues[receiver]
+            if not queue:
+                if receiver not in self._busy:
+                    del self._queues[receiver]
+                continue
+            if receiver in self._busy:
+                continue
+            if queue[0].not_before > now:
+                delay = queue[0].not_before - now
+                wait = delay if wait is None else min(wait, delay)
+                continue
+            batch = [queue.popleft()]
+            if batch[0].reply.type in TEXT_REPLY_TYPES:
+                while queue and len(batch) < self.batch_size and queue[0].reply.type in TEXT_REPLY_TYPES and queue[0].not_before <= now:
+                    batch.append(queue.popleft())
+            self._busy.add(receiver)
+            self._queues.move_to_end(receiver)  # 轮转，避免消息多的接收者长期占用线程
+            self._pool.submit(self._deliver, receiver, batch)
+        return wait
+
+    def _deliver(self, receiver, batch):
+        batch = [item for item in batch if not item.context.is_cancelled()]
+        try:
+            if batch:
+                for _ in batch:
+                    if self._rate_limiter:
+                        self._rate_limiter.get_token()
+                if batch[0].reply.type in TEXT_REPLY_TYPES:
+                    self.channel._send_text_batch(receiver, [item.reply.content for item in batch])
+                else:
+                    self.channel.send(batch[0].reply, batch[0].context)
+                metrics.get_counter("wxpad.send_queue").inc("sent", len(batch))
+                if len(batch) > 1:
+                    metrics.get_counter("wxpad.send_queue").inc("batched", len(batch) - 1)
+        except Exception as e:
+            logger.error(f"[wxpad] 发送消息到 {receiver} 失败: {e}")
+            self._schedule_retry(receiver, batch)
+        finally:
+            with self._cond:
+                self._busy.discard(receiver)
+                self._cond.notify()
+
+    def _schedule_retry(self, receiver, batch):
+        retry = []
+        for item in batch:
+            item.attempt += 1
+            if item.attempt > self.max_retries:
+                metrics.get_counter("wxpad.send_queue").inc("dropped")
+                logger.error(f"[wxpad] 消息重试{self.max_retries}次后仍发送失败，放弃: {item.reply}")
+                continue
+            item.not_before = time.time() + 3 * item.attempt  # 与ChatChannel._send一致：3秒、6秒
+            retry.append(item)
+        if retry:
+            metrics.get_counter("wxpad.send_queue").inc("retried", len(retry))
+            with self._cond:
+                self._queues.setdefault(receiver, deque()).extendleft(reversed(retry))
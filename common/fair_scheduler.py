@@ -0,0 +1,61 @@
+from collections import OrderedDict
+
+
+class DeficitRoundRobin:
+    """单位开销的赤字轮转（DRR）调度器
+
+    每个key轮到时获得 quantum * weight 的额度，每调度一次消耗1，
+    额度不足时移到队尾，权重越大的key在一轮中被调度的次数越多。
+    """
+
+    def __init__(self, quantum=1.0):
+        self.quantum = quantum
+        self._deficit = OrderedDict()
+
+    def next(self, weights: dict):
+        """从可调度的key中选出下一个
+
+        :param weights: 可调度的key及其权重，不在其中的key会被移出轮转并清空额度
+        :return: 选中的key，没有可调度的key时返回None
+        """
+        for key in list(self._deficit.keys()):
+            if key not in weights:
+                del self._deficit[key]
+        for key in weights:
+            if key not in self._deficit:
+                self._deficit[key] = 0.0
+        if not self._deficit:
+            return None
+        while True:
+            key = next(iter(self._deficit))
+            if self._deficit[key] >= 1:
+                self._deficit[key] -= 1
+                return key
+            # 当前key额度不足，移到队尾，下一个key获得新一轮额度
+            self._deficit.move_to_end(key)
+            head = next(iter(self._deficit))
+            self._deficit[head] += self.quantum * max(weights[head], 0.01)
+
+
+class FairScheduler:
+    """带优先级的公平调度器
+
+    先按优先级严格选择（数值越小越优先），同一优先级内按权重做DRR轮转。
+    """
+
+    def __init__(self, quantum=1.0):
+        self.quantum = quantum
+        self._levels = {}
+
+    def next(self, candidates: dict):
+        """
+        :param candidates: {key: (priority, weight)}
+        :return: 选中的key，没有候选时返回None
+        """
+        if not candidates:
+            return None
+        top = min(priority for priority, _ in candidates.values())
+        weights = {key: weight for key, (priority, weight) in candidates.items() if priority == top}
+        if top not in self._levels:
+            self._levels[top] = DeficitRoundRobin(self.quantum)
+        return self._levels[top].next(weights)
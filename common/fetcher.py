@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from common import metrics
+from common.log import logger
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.212 Safari/537.36"
+}
+
+
+class FetchTooLarge(Exception):
+    """下载内容超过大小限制"""
+    pass
+
+
+class FetchResult:
+    __slots__ = ("url", "path", "size", "content_type", "from_cache")
+
+    def __init__(self, url, path, size, content_type, from_cache):
+        self.url = url
+        self.path = path
+        self.size = size
+        self.content_type = content_type
+        self.from_cache = from_cache
+
+    def read(self) -> bytes:
+        with open(self.path, "rb") as f:
+            return f.read()
+
+
+class Fetcher:
+    """共享的URL下载服务
+
+    - 复用连接池，同一host的并发请求数不超过per_host
+    - 流式写入磁盘，超过max_bytes立即中止
+    - 下载结果按URL缓存在cache_dir，服务端返回ETag/Last-Modified时再次下载使用条件请求，304直接用本地文件
+    - 缓存目录总大小超过cache_max_bytes时删除最早的文件
+
+    缓存文件由Fetcher管理，调用方需要自行删除的文件应使用fetch_to获取独立副本。
+    """
+
+    def __init__(self, cache_dir, max_bytes=100 * 1024 * 1024, cache_max_bytes=512 * 1024 * 1024, per_host=4, timeout=30):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.cache_max_bytes = cache_max_bytes
+        self.per_host = per_host
+        self.timeout = timeout
+        os.makedirs(cache_dir, exist_ok=True)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=max(per_host, 4))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self._host_slots = {}
+
+    def _host_slot(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_slots[host]
+
+    def _cache_path(self, url):
+        ext = os.path.splitext(urlparse(url).path)[1]
+        if not ext or len(ext) > 5:
+            ext = ""
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ext)
+
+    @staticmethod
+    def _load_meta(path):
+        try:
+            with open(path + ".meta", "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def fetch(self, url, max_bytes=None, timeout=None, headers=None) -> FetchResult:
+        """下载url到缓存目录，返回缓存文件信息；失败抛出异常"""
+        max_bytes = max_bytes or self.max_bytes
+        counter = metrics.get_counter("fetcher")
+        path = self._cache_path(url)
+        meta = self._load_meta(path) if os.path.exists(path) else None
+        request_headers = dict(DEFAULT_HEADERS)
+        request_headers.update(headers or {})
+        if meta:
+            if meta.get("etag"):
+                request_headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                request_headers["If-Modified-Since"] = meta["last_modified"]
+
+        counter.inc("requests")
+        with self._host_slot(url):
+            with self.session.get(url, headers=request_headers, stream=True, timeout=timeout or self.timeout) as resp:
+                if resp.status_code == 304 and meta:
+                    counter.inc("not_modified")
+                    os.utime(path)  # 刷新时间，避免被当作最早的文件淘汰
+                    return FetchResult(url, path, meta.get("size", 0), meta.get("content_type", ""), True)
+                resp.raise_for_status()
+                length = int(resp.headers.get("Content-Length") or 0)
+                if length > max_bytes:
+                    counter.inc("too_large")
+                    raise FetchTooLarge(f"{url} 大小{length}字节，超过限制{max_bytes}字节")
+                part_path = f"{path}.{uuid.uuid4().hex[:8]}.part"
+                size = 0
+                try:
+                    with open(part_path, "wb") as f:
+                        for chunk in resp.iter_content(chunk_size=64 * 1024):
+                            size += len(chunk)
+                            if size > max_bytes:
+                                counter.inc("too_large")
+                                raise FetchTooLarge(f"{url} 超过大小限制{max_bytes}字节")
+                            f.write(chunk)
+                    os.replace(part_path, path)
+                finally:
+                    if os.path.exists(part_path):
+                        os.remove(part_path)
+                meta = {
+                    "url": url,
+                    "etag": resp.headers.get("ETag"),
+                    "last_modified": resp.headers.get("Last-Modified"),
+                    "content_type": resp.headers.get("Content-Type", ""),
+                    "size": size,
+                    "fetched_at": time.time(),
+                }
+        with open(path + ".meta", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        counter.inc("bytes", size)
+        self._evict()
+        return FetchResult(url, path, size, meta["content_type"], False)
+
+    def fetch_to(self, url, dest_path, **kwargs) -> FetchResult:
+        """下载url并在dest_path得到一份调用方可以自由删除的文件（优先硬链接，不复制数据）"""
+        result = self.fetch(url, **kwargs)
+        dest_dir = os.path.dirname(dest_path)
+        if dest_dir:
+            os.makedirs(dest_dir, exist_ok=True)
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        try:
+            os.link(result.path, dest_path)
+        except OSError:
+            shutil.copyfile(result.path, dest_path)
+        return FetchResult(url, dest_path, result.size, result.content_type, result.from_cache)
+
+    def _evict(self):
+        try:
+            entries = []
+            total = 0
+            for name in os.listdir(self.cache_dir):
+                if name.endswith((".meta", ".part")):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+            if total <= self.cache_max_bytes:
+                return
+            for _, size, path in sorted(entries):
+                for p in (path, path + ".meta"):
+                    if os.path.exists(p):
+                        os.remove(p)
+                total -= size
+                if total <= self.cache_max_bytes:
+                    break
+        except OSError as e:
+            logger.warning(f"[fetcher] 清理下载缓存失败: {e}")
+
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher() -> Fetcher:
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            from config import conf, get_appdata_dir
+
+            _fetcher = Fetcher(
+                cache_dir=conf().get("fetcher_cache_dir") or os.path.join(get_appdata_dir(), "media_cache"),
+                max_bytes=conf().get("fetcher_max_mb", 100) * 1024 * 1024,
+                cache_max_bytes=conf().get("fetcher_cache_max_mb", 512) * 1024 * 1024,
+                per_host=conf().get("fetcher_per_host_limit", 4),
+            )
+        return _fetcher
@@ -0,0 +1,155 @@
+import hashlib
+import io
+import threading
+import time
+from collections import OrderedDict
+
+from PIL import Image
+
+from common.log import logger
+
+JPEG_MAGIC = b"\xff\xd8\xff"
+QUALITY_STEP = 5
+
+
+def _encode_jpeg(img, quality) -> bytes:
+    out = io.BytesIO()
+    img.save(out, "JPEG", quality=quality, optimize=True)
+    return out.getvalue()
+
+
+def _to_rgb(img):
+    if img.mode == "RGB":
+        return img
+    if img.mode in ("RGBA", "LA", "P"):
+        # JPEG不支持透明度，透明区域填充白色
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1])
+        return background
+    return img.convert("RGB")
+
+
+def _fits(data, img, max_bytes, max_side):
+    return (not max_bytes or len(data) <= max_bytes) and (not max_side or max(img.size) <= max_side)
+
+
+def prepare_jpeg(data: bytes, quality=85, max_bytes=None, max_side=None, min_quality=30, stats=None) -> bytes:
+    """把图片准备为满足大小限制的JPEG
+
+    - 已是JPEG且不超过max_bytes和max_side时原样返回，不重新编码
+    - 否则先按quality编码，超出max_bytes时在[min_quality, quality)区间二分查找能满足大小的最高质量档位
+    - 最低质量仍超出时按比例缩小分辨率后重新查找
+
+    :param stats: 可选dict，记录编码次数(encodes)，用于基准测试
+    """
+    stats = stats if stats is not None else {}
+    stats["encodes"] = 0
+    img = Image.open(io.BytesIO(data))
+    if data.startswith(JPEG_MAGIC) and img.mode in ("RGB", "L") and _fits(data, img, max_bytes, max_side):
+        return data
+
+    img = _to_rgb(img)
+    if max_side and max(img.size) > max_side:
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    while True:
+        stats["encodes"] += 1
+        best = _encode_jpeg(img, quality)
+        if not max_bytes or len(best) <= max_bytes:
+            return best
+        smallest = best
+        # 在按QUALITY_STEP递减的质量档位上二分，档位内的差异对体积影响很小
+        candidates = list(range(quality - QUALITY_STEP, min_quality - 1, -QUALITY_STEP))
+        low, high = 0, len(candidates) - 1
+        best = None
+        while low <= high:
+            mid = (low + high) // 2
+            stats["encodes"] += 1
+            encoded = _encode_jpeg(img, candidates[mid])
+            if len(encoded) <= max_bytes:
+                best, high = encoded, mid - 1
+            else:
+                smallest, low = encoded, mid + 1
+        if best is not None:
+            return best
+        if min(img.size) <= 16:
+            logger.warning(f"[image_prepare] 无法把图片压缩到{max_bytes}字节以内，使用最小结果{len(smallest)}字节")
+            return smallest
+        # 文件大小大致与像素数成正比，按面积比例缩小边长，留出余量
+        scale = max(0.1, min(0.9, (max_bytes / len(smallest)) ** 0.5 * 0.9))
+        img = img.resize((max(1, int(img.width * scale)), max(1, int(img.height * scale))), Image.LANCZOS)
+
+
+class PreparedImageCache:
+    """按内容哈希缓存处理后的图片，按总字节数淘汰最早使用的记录"""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self._size = 0
+
+    @staticmethod
+    def key(data: bytes, *params) -> str:
+        return hashlib.sha1(data).hexdigest() + ":" + ":".join(str(p) for p in params)
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._items[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+
+
+prepared_cache = PreparedImageCache()
+
+
+def _benchmark(corpus_dir, max_bytes):
+    """对比逐级降低质量(每次-5)与二分查找的编码次数和耗时"""
+    import os
+
+    def legacy(data):
+        rgb = Image.open(io.BytesIO(data)).convert("RGB")
+        quality, encodes = 95, 0
+        while True:
+            encodes += 1
+            out = _encode_jpeg(rgb, quality)
+            if len(out) <= max_bytes or quality <= 5:
+                return encodes
+            quality -= 5
+
+    files = [os.path.join(corpus_dir, name) for name in sorted(os.listdir(corpus_dir))]
+    corpus = []
+    for path in files:
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                corpus.append(f.read())
+    for name, run in (
+        ("stepwise", legacy),
+        ("binary_search", lambda data: prepare_jpeg(data, quality=95, max_bytes=max_bytes, stats=stats) and stats["encodes"]),
+    ):
+        stats = {}
+        start = time.time()
+        encodes = sum(run(data) for data in corpus)
+        elapsed = time.time() - start
+        print(f"{name}: {len(corpus)} images, {encodes} encodes, {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    import sys
+
+    _benchmark(sys.argv[1] if len(sys.argv) > 1 else ".", int(sys.argv[2]) if len(sys.argv) > 2 else 200 * 1024)
@@ -0,0 +1,209 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from common import metrics
+from common.log import logger
+
+
+class MediaPoolBusy(Exception):
+    """媒体处理队列已满"""
+    pass
+
+
+class MediaPool:
+    """媒体处理进程池
+
+    音频转码、图片重编码、视频缩略图等CPU密集任务放到独立进程执行，不占用处理消息线程的GIL。
+    排队中的任务数不超过max_pending，排队超时抛出MediaPoolBusy；单个任务超过timeout秒抛出TimeoutError。
+    已开始执行的任务无法取消，超时后新任务换用新的进程池；旧池中已排队的任务照常执行，旧进程执行完后退出。
+    workers为0时直接在调用线程中执行。
+    """
+
+    def __init__(self, workers=2, max_pending=16, timeout=60):
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        self._lock = threading.Lock()
+        self._executor = None
+        self._futures = {}  # 进程池 -> 尚未结束的任务
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # 主进程中有大量线程，fork可能继承被占用的锁，使用spawn启动工作进程
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+                self._futures[self._executor] = set()
+            return self._executor
+
+    def _reset_executor(self, executor, cancel_pending=False):
+        """停止向executor提交新任务，已排队的任务默认照常执行完，由各自的调用方等待结果"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+            futures = self._futures.pop(executor, set())
+        if cancel_pending:
+            # shutdown的cancel_futures参数需要Python 3.9，这里逐个取消排队中的任务
+            for future in futures:
+                future.cancel()
+        executor.shutdown(wait=False)
+
+    def _task_done(self, executor, future):
+        self._slots.release()
+        with self._lock:
+            self._futures.get(executor, set()).discard(future)
+
+    def run(self, fn, *args, timeout=None):
+        """在进程池中执行fn(*args)并返回结果，fn和参数必须可pickle"""
+        if self.workers <= 0:
+            return fn(*args)
+        timeout = timeout or self.timeout
+        counter = metrics.get_counter("media_pool")
+        if not self._slots.acquire(timeout=timeout):
+            counter.inc("busy")
+            raise MediaPoolBusy(f"media pool queue is full, task {fn.__name__} rejected")
+        start = time.time()
+        executor = self._get_executor()
+        try:
+            future = executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            if executor in self._futures:
+                self._futures[executor].add(future)
+        future.add_done_callback(lambda f: self._task_done(executor, f))
+        counter.inc("submitted")
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            counter.inc("timeout")
+            logger.warning(f"[media_pool] task {fn.__name__} timed out after {timeout}s")
+            if not future.cancel():
+                # 任务已在执行，无法中断，之后的任务改用新的进程池；旧池中排队的任务仍在旧池执行
+                logger.warning(f"[media_pool] task {fn.__name__} is still running, recycle pool")
+                self._reset_executor(executor)
+            raise
+        except BrokenProcessPool:
+            counter.inc("broken")
+            logger.error(f"[media_pool] worker process died while running {fn.__name__}, restart pool")
+            self._reset_executor(executor)
+            raise
+        finally:
+            metrics.get_histogram("media_pool.latency").observe(time.time() - start)
+
+    def shutdown(self):
+        with self._lock:
+            executor = self._executor
+        if executor:
+            self._reset_executor(executor, cancel_pending=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_media_pool() -> MediaPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            from config import conf
+
+            _pool = MediaPool(
+                workers=conf().get("media_pool_workers", 2),
+                max_pending=conf().get("media_pool_max_pending", 16),
+                timeout=conf().get("media_task_timeout", 60),
+            )
+        return _pool
+
+
+# ---- 以下函数在工作进程中执行，只做纯计算，依赖在函数内导入 ----
+
+def _transcode_audio(source, target):
+    from voice import audio_codec
+
+    if target == "silk" and isinstance(source, str) and audio_codec.is_silk(source):
+        with open(source, "rb") as f:
+            data = f.read()
+        return data, audio_codec.decode_silk(data).duration_ms
+    pcm = source if isinstance(source, audio_codec.PcmAudio) else audio_codec.decode_file(source)
+    if target == "wav":
+        return audio_codec.to_wav_bytes(pcm), pcm.duration_ms
+    if target == "silk":
+        return audio_codec.encode_silk(pcm, 48000), pcm.duration_ms
+    raise ValueError(f"unsupported audio target: {target}")
+
+
+def _reencode_image(data, quality, max_bytes):
+    from common.image_prepare import prepare_jpeg
+
+    return prepare_jpeg(data, quality=quality, max_bytes=max_bytes)
+
+
+def _video_probe_thumbnail(video_path, thumb_max_side):
+    from common import video_probe
+
+    return video_probe.probe(video_path, thumb_max_side)
+
+
+# ---- 对外的任务接口 ----
+
+def transcode_audio(source, target, timeout=None):
+    """音频转码
+
+    :param source: 音频文件路径或audio_codec.PcmAudio
+    :param target: "wav"(语音识别) 或 "silk"(发送微信语音)
+    :return: (转码后的字节, 时长毫秒)
+    """
+    return get_media_pool().run(_transcode_audio, source, target, timeout=timeout)
+
+
+def reencode_image(path, quality=85, max_bytes=None, timeout=None) -> bytes:
+    """图片准备为RGB JPEG并返回JPEG字节
+
+    已是JPEG且不超过max_bytes时不重新编码；结果按内容哈希缓存，同一张图片重复发送时不再处理。
+    """
+    from common.image_prepare import prepared_cache
+
+    with open(path, "rb") as f:
+        data = f.read()
+    key = prepared_cache.key(data, quality, max_bytes)
+    prepared = prepared_cache.get(key)
+    if prepared is None:
+        prepared = get_media_pool().run(_reencode_image, data, quality, max_bytes, timeout=timeout)
+        prepared_cache.put(key, prepared)
+    else:
+        metrics.get_counter("media_pool").inc("image_cache_hit")
+    return prepared
+
+
+def video_probe_thumbnail(video_path, thumb_max_side=200, timeout=None):
+    """读取视频时长并截取第一个关键帧作为缩略图
+
+    MP4时长直接从文件头读取，不占用进程池；截图在进程池中执行，结果按视频内容哈希缓存。
+    无法截图时（如未安装OpenCV和ffmpeg）返回纯色占位缩略图，保证视频仍可发送。
+
+    :param thumb_max_side: 缩略图最长边，为None时只读取时长
+    :return: (时长秒数，无法获取时为None, 缩略图JPEG字节或None)
+    """
+    from common import video_probe
+
+    video_path = os.fspath(video_path)
+    key = (video_probe.file_hash(video_path), thumb_max_side)
+    cached = video_probe.probe_cache.get(key)
+    if cached is not None:
+        metrics.get_counter("media_pool").inc("video_probe_cache_hit")
+        return cached
+    duration = video_probe.mp4_duration(video_path)
+    if duration and not thumb_max_side:
+        result = (duration, None)
+    else:
+        result = get_media_pool().run(_video_probe_thumbnail, video_path, thumb_max_side, timeout=timeout)
+        if thumb_max_side and result[1] is None:
+            logger.warning(f"[media_pool] 无法截取视频缩略图，使用占位图: {video_path}")
+            result = (result[0], video_probe.placeholder_thumbnail((thumb_max_side, thumb_max_side)))
+    video_probe.probe_cache.put(key, result)
+    return result
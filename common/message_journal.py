@@ -0,0 +1,122 @@
+import json
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+from common.log import logger
+
+
+class MessageJournal:
+    """入站消息日志，保证已接收但未处理完成的消息在重启后可以重放
+
+    写入在调用线程中只是入队，由后台线程批量写入SQLite(WAL模式)并按flush_interval提交，
+    同一批次内已完成的消息直接抵消，不落盘。每次提交都同步到磁盘(synchronous=FULL)，
+    已提交的记录在进程崩溃或断电后仍然保留；尚未提交的最后flush_interval内的消息可能丢失。
+    """
+
+    def __init__(self, path, flush_interval=0.2):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._init_db()
+        self._thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")  # NORMAL在断电时可能丢失最近提交的事务
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS message_journal (
+                id TEXT PRIMARY KEY,
+                created_at REAL,
+                payload TEXT
+            )
+            """
+        )
+        conn.commit()
+        conn.close()
+
+    def append(self, payload: dict) -> str:
+        """记录一条已接收的消息，返回日志id"""
+        journal_id = uuid.uuid4().hex
+        self._queue.put(("append", journal_id, time.time(), payload))
+        return journal_id
+
+    def complete(self, journal_id):
+        """标记消息处理完成"""
+        if journal_id:
+            self._queue.put(("complete", journal_id, None, None))
+
+    def pending(self) -> list:
+        """读取未完成的消息，按接收顺序返回[(journal_id, created_at, payload)]"""
+        self.flush()
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT id, created_at, payload FROM message_journal ORDER BY created_at").fetchall()
+        finally:
+            conn.close()
+        result = []
+        for journal_id, created_at, payload in rows:
+            try:
+                result.append((journal_id, created_at, json.loads(payload)))
+            except ValueError:
+                logger.warning("[journal] drop corrupted entry {}".format(journal_id))
+                self.complete(journal_id)
+        return result
+
+    def flush(self, timeout=5):
+        """等待已入队的记录写入完成"""
+        event = threading.Event()
+        self._queue.put(("flush", None, None, event))
+        event.wait(timeout)
+
+    def _writer_loop(self):
+        conn = self._connect()
+        while True:
+            ops = [self._queue.get()]
+            deadline = time.time() + self.flush_interval
+            # 攒一批再提交，flush请求立即提交
+            while ops[-1][0] != "flush":
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    ops.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(conn, ops)
+            except Exception as e:
+                logger.error("[journal] write batch failed: {}".format(e))
+            for op, _, _, event in ops:
+                if op == "flush":
+                    event.set()
+
+    def _write_batch(self, conn, ops):
+        appends = {}
+        completes = []
+        for op, journal_id, created_at, payload in ops:
+            if op == "append":
+                appends[journal_id] = (journal_id, created_at, payload)
+            elif op == "complete":
+                if appends.pop(journal_id, None) is None:
+                    completes.append((journal_id,))
+        if not appends and not completes:
+            return
+        rows = []
+        for journal_id, created_at, payload in appends.values():
+            try:
+                rows.append((journal_id, created_at, json.dumps(payload, ensure_ascii=False)))
+            except (TypeError, ValueError) as e:
+                logger.warning("[journal] payload not serializable, skip: {}".format(e))
+        conn.executemany("INSERT OR REPLACE INTO message_journal (id, created_at, payload) VALUES (?, ?, ?)", rows)
+        conn.executemany("DELETE FROM message_journal WHERE id = ?", completes)
+        conn.commit()
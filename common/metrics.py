@@ -0,0 +1,82 @@
+import bisect
+import threading
+
+
+class Counter:
+    """线程安全的计数器，按标签累加"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, label="total", n=1):
+        with self._lock:
+            self._values[label] = self._values.get(label, 0) + n
+
+    def get(self, label="total"):
+        with self._lock:
+            return self._values.get(label, 0)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+
+class Histogram:
+    """线程安全的固定桶直方图，用于统计耗时分布（单位：秒）"""
+
+    DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self, buckets=None):
+        self.buckets = tuple(sorted(buckets or self.DEFAULT_BUCKETS))
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.buckets) + 1)  # 最后一个桶为 +Inf
+        self._count = 0
+        self._sum = 0.0
+
+    def observe(self, value):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[idx] += 1
+            self._count += 1
+            self._sum += value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            buckets = {}
+            cumulative = 0
+            for bound, cnt in zip(self.buckets, self._counts):
+                cumulative += cnt
+                buckets[f"le_{bound}"] = cumulative
+            buckets["+Inf"] = cumulative + self._counts[-1]
+            return {
+                "count": self._count,
+                "sum": round(self._sum, 6),
+                "avg": round(self._sum / self._count, 6) if self._count else 0,
+                "buckets": buckets,
+            }
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_counter(name) -> Counter:
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Counter()
+        return _registry[name]
+
+
+def get_histogram(name, buckets=None) -> Histogram:
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Histogram(buckets)
+        return _registry[name]
+
+
+def snapshot(prefix="") -> dict:
+    """导出所有（或指定前缀的）指标快照"""
+    with _registry_lock:
+        items = [(name, metric) for name, metric in _registry.items() if name.startswith(prefix)]
+    return {name: metric.snapshot() for name, metric in items}
@@ -0,0 +1,51 @@
+import threading
+
+
+class ReorderBuffer:
+    """按序号放行的重排序缓冲
+
+    每条消息出队时领取递增序号，处理可以并行，但发送回复前需等待所有更早的序号结束（发送完成或被放弃）。
+    等待超时后放弃更早序号的顺序约束，避免某条慢请求阻塞后续所有回复。
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._issued = 0
+        self._next_seq = 0  # 小于该值的序号都已结束
+        self._done = set()  # 已结束但前面还有未结束序号的序号
+
+    def issue(self) -> int:
+        with self._cond:
+            seq = self._issued
+            self._issued += 1
+            return seq
+
+    def wait_turn(self, seq, timeout=None) -> bool:
+        """等待轮到seq发送
+
+        :return: 按序轮到返回True，超时返回False（此时更早的序号不再参与排序）
+        """
+        with self._cond:
+            if self._cond.wait_for(lambda: self._next_seq >= seq, timeout):
+                return True
+            self._done = {s for s in self._done if s > seq}
+            self._next_seq = seq
+            self._cond.notify_all()
+            return False
+
+    def release(self, seq):
+        """标记seq已结束，可重复调用"""
+        with self._cond:
+            if seq < self._next_seq:
+                return
+            self._done.add(seq)
+            while self._next_seq in self._done:
+                self._done.remove(self._next_seq)
+                self._next_seq += 1
+            self._cond.notify_all()
+
+    @property
+    def pending(self) -> int:
+        """已领取但尚未结束的序号数量"""
+        with self._cond:
+            return self._issued - self._next_seq - len(self._done)
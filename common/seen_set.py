@@ -0,0 +1,73 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from common.log import logger
+
+
+class SeenSet:
+    """有容量上限和过期时间的去重集合（按插入时间淘汰的LRU）
+
+    用于消息id去重：超过ttl秒或超出容量的最早记录会被淘汰，内存占用与capacity成正比。
+    """
+
+    def __init__(self, capacity=10000, ttl=900):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._items = OrderedDict()  # key -> 首次出现的时间戳
+
+    def add(self, key) -> bool:
+        """记录key，首次出现返回True，重复出现返回False"""
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            if key in self._items:
+                return False
+            self._items[key] = now
+            if len(self._items) > self.capacity:
+                self._items.popitem(last=False)
+            return True
+
+    def __contains__(self, key):
+        with self._lock:
+            self._evict(time.time())
+            return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def _evict(self, now):
+        while self._items:
+            key, ts = next(iter(self._items.items()))
+            if now - ts <= self.ttl:
+                break
+            self._items.popitem(last=False)
+
+    def dump(self, path):
+        with self._lock:
+            self._evict(time.time())
+            data = list(self._items.items())
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning("[SeenSet] load {} failed: {}".format(path, e))
+            return
+        now = time.time()
+        with self._lock:
+            for key, ts in data:
+                if now - ts <= self.ttl and key not in self._items:
+                    self._items[key] = ts
+            while len(self._items) > self.capacity:
+                self._items.popitem(last=False)
@@ -4,14 +4,16 @@ import time
 
 class TokenBucket:
     def __init__(self, tpm, timeout=None):
-        self.capacity = int(tpm)  # 令牌桶容量
+        if not tpm or tpm <= 0:
+            raise ValueError(f"tokens per minute must be positive, got {tpm}")
+        self.capacity = max(1, int(tpm))  # 令牌桶容量
         self.tokens = 0  # 初始令牌数为0
-        self.rate = int(tpm) / 60  # 令牌每秒生成速率
+        self.rate = float(tpm) / 60  # 令牌每秒生成速率，每分钟不足1个时保留小数
         self.timeout = timeout  # 等待令牌超时时间
         self.cond = threading.Condition()  # 条件变量
         self.is_running = True
         # 开启令牌生成线程
-        threading.Thread(target=self._generate_tokens).start()
+        threading.Thread(target=self._generate_tokens, daemon=True).start()  # 速率很低时线程长时间休眠，不能阻塞进程退出
 
     def _generate_tokens(self):
         """生成令牌"""
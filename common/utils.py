@@ -4,7 +4,7 @@ import os
 from typing import List, Dict
 
 from urllib.parse import urlparse
-from PIL import Image
+from common.image_prepare import prepare_jpeg
 from common.log import logger
 
 def fsize(file):
@@ -26,15 +26,8 @@ def compress_imgfile(file, max_size):
     if fsize(file) <= max_size:
         return file
     file.seek(0)
-    img = Image.open(file)
-    rgb_image = img.convert("RGB")
-    quality = 95
-    while True:
-        out_buf = io.BytesIO()
-        rgb_image.save(out_buf, "JPEG", quality=quality)
-        if fsize(out_buf) <= max_size:
-            return out_buf
-        quality -= 5
+    # 二分查找满足大小的最高JPEG质量，必要时缩小分辨率
+    return io.BytesIO(prepare_jpeg(file.read(), quality=95, max_bytes=max_size))
 
 
 def split_string_by_utf8_length(string, max_length, max_split=0):
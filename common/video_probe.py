@@ -0,0 +1,164 @@
+import hashlib
+import io
+import shutil
+import struct
+import subprocess
+import threading
+from collections import OrderedDict
+
+from common.log import logger
+
+
+def _iter_boxes(f, start, end):
+    """遍历[start, end)范围内的MP4 box，返回(类型, 内容起始位置, 结束位置)"""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack(">I4s", header)
+        header_size = 8
+        if size == 1:  # 64位长度
+            size = struct.unpack(">Q", f.read(8))[0]
+            header_size = 16
+        elif size == 0:  # 延伸到文件末尾
+            size = end - pos
+        if size < header_size:
+            return
+        yield box_type, pos + header_size, min(pos + size, end)
+        pos += size
+
+
+def mp4_duration(path):
+    """从moov/mvhd读取MP4时长（秒），不解码视频，读取不到返回None"""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, io.SEEK_END)
+            file_end = f.tell()
+            for box_type, start, end in _iter_boxes(f, 0, file_end):
+                if box_type != b"moov":
+                    continue
+                for child_type, child_start, _ in _iter_boxes(f, start, end):
+                    if child_type != b"mvhd":
+                        continue
+                    f.seek(child_start)
+                    version = f.read(4)[0]
+                    if version == 1:
+                        f.seek(16, io.SEEK_CUR)  # creation_time + modification_time
+                        timescale, duration = struct.unpack(">IQ", f.read(12))
+                    else:
+                        f.seek(8, io.SEEK_CUR)
+                        timescale, duration = struct.unpack(">II", f.read(8))
+                    return duration / timescale if timescale else None
+    except (OSError, struct.error, IndexError) as e:
+        logger.debug(f"[video_probe] 读取MP4时长失败 {path}: {e}")
+    return None
+
+
+def _thumbnail_with_cv2(path, max_side):
+    import cv2
+
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            return None, None
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        duration = frame_count / fps if fps > 0 and frame_count > 0 else None
+        if not max_side:
+            return duration, None
+        ret, frame = cap.read()  # 第一帧即关键帧，只解码这一帧
+        if not ret:
+            return duration, None
+        height, width = frame.shape[:2]
+        scale = min(1.0, max_side / max(width, height))
+        frame = cv2.resize(frame, (max(1, int(width * scale)), max(1, int(height * scale))))
+        ok, buffer = cv2.imencode(".jpg", frame)
+        return duration, buffer.tobytes() if ok else None
+    finally:
+        cap.release()
+
+
+def _thumbnail_with_ffmpeg(path, max_side):
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        return None
+    cmd = [
+        ffmpeg, "-v", "error", "-skip_frame", "nokey", "-i", path, "-frames:v", "1",
+        "-vf", f"scale={max_side}:{max_side}:force_original_aspect_ratio=decrease",
+        "-f", "image2pipe", "-vcodec", "mjpeg", "pipe:1",
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=30)
+    if result.returncode != 0 or not result.stdout:
+        logger.debug(f"[video_probe] ffmpeg提取缩略图失败: {result.stderr[:200]}")
+        return None
+    return result.stdout
+
+
+def probe(path, thumb_max_side=200):
+    """读取视频时长，并在需要时截取第一个关键帧作为缩略图（保持宽高比，最长边为thumb_max_side）
+
+    时长优先从MP4头部读取；缩略图依次尝试OpenCV、ffmpeg，都不可用时返回None。
+    :return: (时长秒数或None, 缩略图JPEG字节或None)
+    """
+    duration = mp4_duration(path)
+    if duration and not thumb_max_side:
+        return duration, None
+    thumb = None
+    try:
+        cv2_duration, thumb = _thumbnail_with_cv2(path, thumb_max_side)
+        duration = duration or cv2_duration
+    except ImportError:
+        pass
+    except Exception as e:
+        logger.warning(f"[video_probe] OpenCV读取视频失败: {e}")
+    if thumb is None and thumb_max_side:
+        try:
+            thumb = _thumbnail_with_ffmpeg(path, thumb_max_side)
+        except Exception as e:
+            logger.warning(f"[video_probe] ffmpeg提取缩略图异常: {e}")
+    return duration, thumb
+
+
+def placeholder_thumbnail(size=(200, 200)) -> bytes:
+    """无法截取视频帧时使用的纯色缩略图"""
+    from PIL import Image
+
+    out = io.BytesIO()
+    Image.new("RGB", size, (32, 32, 32)).save(out, "JPEG", quality=80)
+    return out.getvalue()
+
+
+def file_hash(path) -> str:
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+class ProbeCache:
+    """按视频内容哈希缓存探测结果"""
+
+    def __init__(self, capacity=128):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.capacity:
+                self._items.popitem(last=False)
+
+
+probe_cache = ProbeCache()
@@ -56,6 +56,33 @@ available_setting = {
     "image_proxy": True,  # 是否需要图片代理，国内访问LinkAI时需要
     "image_create_prefix": ["画", "看", "找"],  # 开启图片回复的前缀
     "concurrency_in_session": 1,  # 同一会话最多有多少条消息在处理中，大于1可能乱序
+    # 会话调度配置：不同会话之间按优先级+权重公平调度(DRR)，priority越小越优先，同优先级内按weight分配处理线程
+    "session_schedule_classes": {
+        "command": {"priority": 0, "weight": 1},  # #开头的管理命令
+        "single": {"priority": 1, "weight": 2},  # 私聊
+        "group": {"priority": 1, "weight": 2},  # 非共享会话的群聊
+        "shared_group": {"priority": 1, "weight": 1},  # group_chat_in_one_session中的共享会话群
+    },
+    "session_weights": {},  # 指定会话的权重倍数，key为session_id或群名称，如 {"ChatGPT测试群": 0.5}
+    "message_coalesce_window_ms": 0,  # 同一发送者连续文本消息的合并窗口(毫秒)，窗口内的多条消息合并为一次请求，0表示不合并
+    "message_coalesce_max_wait_ms": 3000,  # 合并等待的最长时间(毫秒)，避免用户持续发消息时迟迟不回复
+    "cancel_superseded_request": False,  # 同一会话收到新消息时是否取消正在处理中的旧请求（清除记忆命令总会取消）
+    "ordered_reply_in_session": False,  # 会话内并发处理时(concurrency_in_session>1)是否按消息到达顺序发送回复
+    "ordered_reply_timeout": 60,  # 按序回复时等待更早消息处理完成的最长时间(秒)，超时后不再等待
+    "message_journal_enabled": False,  # 是否开启入站消息日志，重启后重放已接收但未处理完成的消息(目前仅wxpad)
+    "message_journal_path": "",  # 消息日志文件路径，为空时使用数据目录下的message_journal.db
+    "message_journal_flush_ms": 200,  # 消息日志批量落盘间隔(毫秒)
+    "message_dedup_capacity": 10000,  # 消息去重记录的最大条数
+    "message_dedup_ttl": 900,  # 消息去重记录的保留时间(秒)
+    "message_dedup_persist": False,  # 是否持久化消息去重记录，重启后仍能识别重复推送的消息
+    "keep_raw_message": False,  # 消息提交处理后是否保留原始消息数据(msg/msg_data)，插件需要读取原始数据时开启
+    "media_pool_workers": 2,  # 音频转码、图片重编码、视频缩略图等媒体处理使用的进程数，0表示在处理消息的线程中直接执行
+    "media_pool_max_pending": 16,  # 媒体处理任务的最大排队数，超出后等待，等待超过超时时间则放弃
+    "media_task_timeout": 60,  # 单个媒体处理任务的超时时间（秒）
+    "fetcher_cache_dir": "",  # 下载的图片/视频/文件缓存目录，为空时使用appdata目录下的media_cache
+    "fetcher_cache_max_mb": 512,  # 下载缓存目录的最大占用空间(MB)，超出时删除最早的文件
+    "fetcher_max_mb": 100,  # 单个下载文件的最大大小(MB)，超出时中止下载
+    "fetcher_per_host_limit": 4,  # 同一域名同时进行的最大下载数
     "image_create_size": "256x256",  # 图片大小,可选有 256x256, 512x512, 1024x1024 (dall-e-3默认为1024x1024)
     "group_chat_exit_group": False,
     "group_exit_msg": "",  # 退出群聊的消息
@@ -64,6 +91,20 @@ available_setting = {
     "expires_in_seconds": 3600,  # 无操作会话的过期时间
     # 人格描述
     "character_desc": "你是ChatGPT, 一个由OpenAI训练的大型语言模型, 你旨在回答并解决人们的任何问题，并且可以使用多种语言与人交流。",
+    # 群聊常见问题回复缓存：同一群内相同的短问题直接复用之前的文字回复，适合FAQ类群聊，默认关闭
+    "reply_cache_enabled": False,
+    "reply_cache_group_names": ["ALL_GROUP"],  # 开启回复缓存的群名称，ALL_GROUP表示所有群，私聊不缓存
+    "reply_cache_ttl": 3600,  # 缓存回复的有效期(秒)
+    "reply_cache_capacity": 1000,  # 最多缓存的回复条数
+    "reply_cache_max_query_len": 40,  # 超过该长度的问题不缓存
+    "reply_cache_bypass_keywords": ["今天", "明天", "现在", "刚才", "上面", "这个", "那个", "继续"],  # 包含这些词的问题依赖上下文或时间，不缓存
+    "request_coalescing": True,  # 共享会话群(group_chat_in_one_session)中相同提问正在处理时，后到的提问等待并共用同一个回复
+    "request_coalescing_timeout": 120,  # 等待相同提问结果的最长时间(秒)，超时后自行请求
+    # 流式回复：OpenAI兼容接口(chatgpt,deepseek,moonshot,glm,modelscope)边生成边按段落发送，缩短长回复的等待时间
+    "stream_reply": False,
+    "stream_reply_mode": "paragraph",  # 切分方式，paragraph按段落，sentence按句子
+    "stream_reply_min_chars": 50,  # 片段最少字数，过短的段落与后面的内容合并发送
+    "stream_reply_max_chars": 500,  # 段落超过该长度仍未结束时在句子结尾处切分
     "conversation_max_tokens": 1000,  # 支持上下文记忆的最多字符数
     # chatgpt限流配置
     "rate_limit_chatgpt": 20,  # chatgpt的调用频率限制
@@ -126,6 +167,9 @@ available_setting = {
     "voice_reply_voice": False,  # 是否使用语音回复语音，需要设置对应语音合成引擎的api key
     "always_reply_voice": False,  # 是否一直使用语音回复
     "voice_to_text": "openai",  # 语音识别引擎，支持openai,baidu,google,azure,xunfei,ali
+    "asr_cache_capacity": 2000,  # 语音识别结果缓存条数，相同语音（转发、重试）直接使用缓存结果，0表示关闭
+    "asr_cache_ttl": 86400,  # 语音识别结果缓存的过期时间(秒)
+    "asr_streaming": True,  # 识别引擎支持流式识别(xunfei,ali,azure)时直接发送解码后的PCM帧，不生成wav文件
     "text_to_voice": "openai",  # 语音合成引擎，支持openai,baidu,google,azure,xunfei,ali,pytts(offline),elevenlabs,edge(online)
     "text_to_voice_model": "tts-1",
     "tts_voice_id": "alloy",
@@ -141,6 +185,10 @@ available_setting = {
     # elevenlabs 语音api配置
     "xi_api_key": "",    #获取ap的方法可以参考https://docs.elevenlabs.io/api-reference/quick-start/authentication
     "xi_voice_id": "",   #ElevenLabs提供了9种英式、美式等英语发音id，分别是"Adam/Antoni/Arnold/Bella/Domi/Elli/Josh/Rachel/Sam"
+    # 语音合成缓存
+    "tts_cache_enabled": True,  # 是否缓存语音合成结果，相同引擎、音色设置和文本直接复用（音色设置包括引擎自身config.json中的配置）
+    "tts_cache_max_mb": 128,  # 语音合成缓存的最大总大小(MB)，超过后淘汰最久未使用的音频
+    "tts_cache_max_text_len": 200,  # 超过该长度的文本很少重复，不缓存
     # 图像模型设置
     "image_recognition": False, # 是否开启图片识别
     # 服务时间限制，目前支持itchat
@@ -221,6 +269,17 @@ available_setting = {
     "wechatpadpro_admin_key": "12345",
     "wechatpadpro_user_key": "",
     "wechatpadpro_ws_url": "ws://localhost:1239/ws/GetSyncMsg",
+    "wechatpadpro_reconnect_base_delay": 1,  # WebSocket重连的初始等待时间(秒)，之后按指数退避
+    "wechatpadpro_reconnect_max_delay": 60,  # WebSocket重连的最长等待时间(秒)
+    "wechatpadpro_catch_up_batch_size": 50,  # 重连后通过HTTP补拉断线期间消息的每批条数
+    "wechatpadpro_catch_up_max_batches": 10,  # 重连后最多补拉的批数
+    "wechatpadpro_send_queue_enabled": False,  # 是否通过出站队列发送回复：同一接收者按序发送、合并连续文本、失败异步重试
+    "wechatpadpro_send_workers": 4,  # 出站队列的发送线程数
+    "wechatpadpro_send_batch_size": 5,  # 同一接收者合并到一次请求的最多文本条数
+    "wechatpadpro_send_rate_per_minute": 0,  # 每分钟最多发送的消息条数，0表示不限制
+    "wechatpadpro_broadcast_batch_size": 50,  # 群发时每次请求包含的接收者数量
+    "wechatpadpro_broadcast_interval": 2,  # 群发批次之间的最小间隔(秒)，失败重试时按倍数退避
+    "wechatpadpro_image_max_bytes": 2 * 1024 * 1024,  # 发送图片的最大字节数，已是JPEG且不超过该大小的图片直接发送，超出时降低质量或分辨率压缩
     # DPBot配置
     "dpbot_base_url": "http://127.0.0.1:8059",
     
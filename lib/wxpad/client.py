@@ -2,6 +2,8 @@ import requests
 import os
 import json
 
+from lib.wxpad.streaming_body import StreamingJsonBody
+
 class WxpadClient:
     def __init__(self, base_url, admin_key=None, user_key=None):
         self.base_url = base_url.rstrip('/')
@@ -96,6 +98,9 @@ class WxpadClient:
             params = {}
         params['key'] = final_user_key
 
+        if StreamingJsonBody.needed(data):
+            # 包含大文件字段时流式发送请求体，避免在内存中生成完整的base64和JSON副本
+            return self._request_with_retry('POST', url, data=StreamingJsonBody(data), params=params, headers=headers)
         return self._request_with_retry('POST', url, json=data, params=params, headers=headers)
 
     def _get_with_user_key(self, path, user_key=None, params=None):
@@ -446,7 +451,7 @@ class WxpadClient:
         Args:
             thumb_data: 缩略图数据
             to_user_name: 接收者用户名
-            video_data: 视频数据（数组格式）
+            video_data: 视频数据，base64字符串或Base64Data（从文件/内存流式编码上传）
             user_key: 普通用户密钥（可选，优先使用传入值，否则从配置文件读取）
 
         Returns:
@@ -0,0 +1,147 @@
+import base64
+import json
+import os
+
+CHUNK_SIZE = 3 * 64 * 1024  # 3的倍数，保证分块编码结果拼接后与整体编码一致
+
+
+class Base64Data:
+    """JSON请求中以base64字符串发送的二进制内容，发送时才按块读取并编码
+
+    source可以是文件路径，也可以是bytes/bytearray/memoryview（按切片编码，不复制整个数据）。
+    """
+
+    def __init__(self, source):
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            self._view = memoryview(source).cast("B")
+            self._path = None
+            self.size = self._view.nbytes
+        else:
+            self._view = None
+            self._path = os.fspath(source)
+            self.size = os.path.getsize(self._path)
+
+    def encoded_length(self) -> int:
+        return (self.size + 2) // 3 * 4
+
+    def iter_encoded(self, chunk_size=CHUNK_SIZE):
+        if self._view is not None:
+            for start in range(0, self.size, chunk_size):
+                yield base64.b64encode(self._view[start:start + chunk_size])
+            return
+        with open(self._path, "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield base64.b64encode(chunk)
+
+    def __repr__(self):
+        return f"<Base64Data {self._path or 'memory'} {self.size} bytes>"
+
+
+class StreamingJsonBody:
+    """把包含Base64Data字段的dict序列化为可迭代的JSON请求体
+
+    普通字段照常序列化，Base64Data字段在迭代时分块编码输出，内存占用只与块大小有关；
+    提供__len__使requests设置Content-Length，每次迭代都重新读取数据，可用于失败重试。
+    """
+
+    def __init__(self, data: dict):
+        self._parts = []
+        items = list(data.items())
+        for i, (key, value) in enumerate(items):
+            prefix = ("{" if i == 0 else ",") + json.dumps(key) + ":"
+            if isinstance(value, Base64Data):
+                self._parts.append((prefix + '"').encode("utf-8"))
+                self._parts.append(value)
+                self._parts.append(b'"')
+            else:
+                self._parts.append((prefix + json.dumps(value, ensure_ascii=False)).encode("utf-8"))
+        self._parts.append(b"}" if items else b"{}")
+
+    def __len__(self):
+        return sum(part.encoded_length() if isinstance(part, Base64Data) else len(part) for part in self._parts)
+
+    def __iter__(self):
+        for part in self._parts:
+            if isinstance(part, Base64Data):
+                yield from part.iter_encoded()
+            else:
+                yield part
+
+    @staticmethod
+    def needed(data) -> bool:
+        return isinstance(data, dict) and any(isinstance(v, Base64Data) for v in data.values())
+
+
+def _benchmark(video_mb=50, concurrency=10):
+    """对比整体base64+JSON与流式请求体上传时的峰值内存（每种方式在独立子进程中运行）"""
+    import subprocess
+    import sys
+
+    for mode in ("buffered", "streaming"):
+        out = subprocess.run(
+            [sys.executable, "-m", "lib.wxpad.streaming_body", "--run", mode, str(video_mb), str(concurrency)],
+            stdout=subprocess.PIPE, text=True,
+        )
+        print(out.stdout.strip())
+
+
+def _run_mode(mode, video_mb, concurrency):
+    import http.server
+    import resource
+    import tempfile
+    import threading
+
+    import requests
+
+    class _Handler(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            remaining = int(self.headers.get("Content-Length", 0))
+            while remaining > 0:
+                remaining -= len(self.rfile.read(min(remaining, 1 << 20)))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b'{"Code": 200}')
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/message/CdnUploadVideo"
+
+    fd, path = tempfile.mkstemp(suffix=".mp4")
+    with os.fdopen(fd, "wb") as f:
+        for _ in range(video_mb):
+            f.write(os.urandom(1 << 20))
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    def send():
+        if mode == "buffered":
+            with open(path, "rb") as f:
+                video_base64 = base64.b64encode(f.read()).decode("utf-8")
+            requests.post(url, json={"ThumbData": "", "ToUserName": "x", "VideoData": video_base64}, timeout=120)
+        else:
+            body = StreamingJsonBody({"ThumbData": "", "ToUserName": "x", "VideoData": Base64Data(path)})
+            requests.post(url, data=body, headers={"Content-Type": "application/json"}, timeout=120)
+
+    threads = [threading.Thread(target=send) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    os.remove(path)
+    print(f"{mode}: {concurrency} x {video_mb}MB, peak RSS +{(peak - baseline) / 1024:.0f}MB")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "--run":
+        _run_mode(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))
+    else:
+        _benchmark(*(int(arg) for arg in sys.argv[1:3]))
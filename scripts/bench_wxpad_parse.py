@@ -0,0 +1,128 @@
+"""
+WechatPadProMessage解析耗时基准
+
+用法: python scripts/bench_wxpad_parse.py [语料.jsonl] [轮数]
+语料为每行一条wxpad回调原始消息(JSON)，不指定时使用内置的代表性样例（文本、群聊@、图片、语音、视频、文件、引用）。
+输出每条消息的平均解析耗时，以及@判断、CDN信息提取在优化前后写法下的耗时对比。
+"""
+import json
+import os
+import sys
+import timeit
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from channel.wxpad.wxpad_message import WechatPadProMessage  # noqa: E402
+
+BOT = "wxid_bot"
+GROUP = "12345678@chatroom"
+MSG_SOURCE = (
+    "<msgsource><atuserlist>{}</atuserlist><pua>1</pua><silence>0</silence><membercount>312</membercount>"
+    "<signature>V1_{}</signature><tmp_node><publisher-id></publisher-id></tmp_node></msgsource>"
+)
+IMAGE_XML = (
+    '<?xml version="1.0"?>\n<msg><img aeskey="{key}" encryver="1" cdnthumbaeskey="{key}" cdnthumburl="{url}" '
+    'cdnthumblength="4321" cdnthumbheight="120" cdnthumbwidth="90" cdnmidheight="0" cdnmidwidth="0" '
+    'cdnhdheight="0" cdnhdwidth="0" cdnmidimgurl="{url}" length="204800" md5="d41d8cd98f00b204e9800998ecf8427e" '
+    'hevc_mid_size="102400" /><platform_signature></platform_signature><imgdatahash></imgdatahash></msg>'
+).format(key="a" * 32, url="3057020100044b30490201000204" + "f" * 160)
+VOICE_XML = (
+    '<msg><voicemsg endflag="1" cancelflag="0" forwardflag="0" voiceformat="4" voicelength="3200" length="5120" '
+    'bufid="0" aeskey="{}" voiceurl="{}" voicemd5="" clientmsgid="41" fromusername="wxid_sender" /></msg>'
+).format("b" * 32, "3052020100" + "e" * 120)
+VIDEO_XML = (
+    '<?xml version="1.0"?>\n<msg><videomsg aeskey="{key}" cdnvideourl="{url}" cdnthumburl="{url}" length="1048576" '
+    'playlength="12" cdnthumblength="8000" cdnthumbwidth="224" cdnthumbheight="398" fromusername="wxid_sender" '
+    'md5="0cc175b9c0f1b6a831c399e269772661" newmd5="" isplaceholder="0" /></msg>'
+).format(key="c" * 32, url="3057020100044b" + "d" * 160)
+FILE_XML = (
+    '<?xml version="1.0"?>\n<msg><appmsg appid="" sdkver="0"><title>季度报告.pdf</title><des></des><type>6</type>'
+    '<appattach><totallen>524288</totallen><attachid>@cdn_{0}_1</attachid><fileext>pdf</fileext>'
+    '<cdnattachurl>{0}</cdnattachurl><aeskey>{1}</aeskey></appattach><md5>92eb5ffee6ae2fec3ad71c777531578f</md5>'
+    '</appmsg><fromusername>wxid_sender</fromusername></msg>'
+).format("3057020100" + "9" * 120, "e" * 32)
+REFER_XML = (
+    '<?xml version="1.0"?>\n<msg><appmsg appid="" sdkver="0"><title>这张图里写的是什么</title><type>57</type>'
+    '<refermsg><type>3</type><svrid>7250000000000000002</svrid><fromusr>{0}</fromusr><chatusr>wxid_other</chatusr>'
+    '<displayname>小王</displayname><content>{1}</content></refermsg></appmsg></msg>'
+).format(GROUP, IMAGE_XML.replace("<", "&lt;").replace(">", "&gt;"))
+
+
+def _raw(msg_id, msg_type, content, group=False, at=False):
+    source = MSG_SOURCE.format(BOT if at else "", "s" * 200) if group else "<msgsource><signature>V1_x</signature></msgsource>"
+    return {
+        "msg_id": msg_id,
+        "new_msg_id": 7250000000000000000 + msg_id,
+        "from_user_name": {"str": GROUP if group else "wxid_sender"},
+        "to_user_name": {"str": BOT},
+        "msg_type": msg_type,
+        "content": {"str": ("wxid_sender:\n" + content) if group else content},
+        "create_time": 1700000000,
+        "msg_source": source,
+    }
+
+
+def builtin_corpus():
+    return [
+        _raw(1, 1, "你好，帮我查一下明天的天气"),
+        _raw(2, 1, "@小艾 今天开会的纪要发一下", group=True, at=True),
+        _raw(3, 1, "收到，谢谢大家", group=True),
+        _raw(4, 3, IMAGE_XML),
+        _raw(5, 3, IMAGE_XML, group=True),
+        _raw(6, 34, VOICE_XML),
+        _raw(7, 43, VIDEO_XML),
+        _raw(8, 49, FILE_XML),
+        _raw(9, 49, REFER_XML, group=True, at=True),
+    ]
+
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def at_by_parse(msg_source, user_id):
+    """优化前：解析整个MsgSource判断是否被@"""
+    node = ET.fromstring(msg_source).find("atuserlist")
+    return node is not None and bool(node.text) and user_id in node.text
+
+
+def at_by_scan(msg_source, user_id):
+    """优化后：直接截取<atuserlist>内容判断"""
+    start = msg_source.find("<atuserlist>")
+    end = msg_source.find("</atuserlist>", start) if start != -1 else -1
+    return end != -1 and user_id in msg_source[start + len("<atuserlist>"):end]
+
+
+def _per_call_us(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    corpus = load_corpus(sys.argv[1]) if len(sys.argv) > 1 else builtin_corpus()
+    number = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    parse_us = _per_call_us(lambda: [WechatPadProMessage(raw) for raw in corpus], max(1, number // 10)) / len(corpus)
+    print(f"messages: {len(corpus)}, parse: {parse_us:.1f}us/msg")
+
+    sources = [raw.get("msg_source") or raw.get("MsgSource") or "" for raw in corpus]
+    sources = [s for s in sources if "<atuserlist>" in s]
+    if sources:
+        old = _per_call_us(lambda: [at_by_parse(s, BOT) for s in sources], number) / len(sources)
+        new = _per_call_us(lambda: [at_by_scan(s, BOT) for s in sources], number) / len(sources)
+        print(f"@ check: parse {old:.2f}us -> scan {new:.2f}us")
+
+    msg = WechatPadProMessage(_raw(4, 3, IMAGE_XML))
+
+    def uncached():
+        msg._xml_cache.clear()
+        msg._extract_cdn_info_from_xml(IMAGE_XML)
+
+    old = _per_call_us(uncached, number)
+    new = _per_call_us(lambda: msg._extract_cdn_info_from_xml(IMAGE_XML), number)
+    print(f"cdn info: uncached {old:.2f}us -> cached {new:.2f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import os
+import tempfile
+import time
+import unittest
+
+from common import metrics
+from voice.asr_cache import AsrCache
+
+
+class TestAsrCache(unittest.TestCase):
+    def test_key_by_content_and_engine(self):
+        """相同内容的不同文件使用同一个key，引擎不同则不同"""
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for name in ("a.wav", "b.wav"):
+                paths.append(os.path.join(tmp, name))
+                with open(paths[-1], "wb") as f:
+                    f.write(b"voice")
+            self.assertEqual(AsrCache.key("openai", paths[0]), AsrCache.key("openai", paths[1]))
+            self.assertNotEqual(AsrCache.key("openai", paths[0]), AsrCache.key("xunfei", paths[0]))
+
+    def test_capacity_ttl_and_metrics(self):
+        """超出容量淘汰最久未使用的记录，过期记录视为未命中"""
+        counter = metrics.get_counter("asr_cache")
+        hits, misses = counter.get("hit"), counter.get("miss")
+        cache = AsrCache(capacity=2, ttl=0.05)
+        cache.put("a", "你好")
+        cache.put("b", "世界")
+        self.assertEqual(cache.get("a"), "你好")
+        cache.put("c", "!")
+        self.assertIsNone(cache.get("b"))
+        time.sleep(0.06)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(counter.get("hit") - hits, 1)
+        self.assertEqual(counter.get("miss") - misses, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
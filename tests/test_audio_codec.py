@@ -0,0 +1,53 @@
+import os
+import unittest
+
+from voice import audio_codec
+from voice.voice import Voice
+
+
+class TestAudioCodec(unittest.TestCase):
+    def _tone(self, sample_rate=16000, duration_ms=1000):
+        samples = sample_rate * duration_ms // 1000
+        data = b"".join(((i % 200) * 100 - 10000).to_bytes(2, "little", signed=True) for i in range(samples))
+        return audio_codec.PcmAudio(data, sample_rate)
+
+    def test_wav_round_trip(self):
+        """PCM写成WAV字节后可以原样解码"""
+        pcm = self._tone()
+        decoded = audio_codec.decode_wav(audio_codec.to_wav_bytes(pcm))
+        self.assertEqual(decoded.sample_rate, 16000)
+        self.assertEqual(decoded.data, pcm.data)
+
+    def test_resample_keeps_duration(self):
+        """重采样后时长不变"""
+        pcm = audio_codec.resample(self._tone(16000, 1000), 48000)
+        self.assertEqual(pcm.sample_rate, 48000)
+        self.assertAlmostEqual(pcm.duration_ms, 1000, delta=5)
+
+    def test_split(self):
+        """按最大时长分段，最后一段为剩余部分"""
+        segments = self._tone(8000, 2500).split(1000)
+        self.assertEqual([s.duration_ms for s in segments], [1000, 1000, 500])
+
+    def test_iter_pcm_frames(self):
+        """按帧时长切分并重采样到目标采样率"""
+        frames = list(audio_codec.iter_pcm_frames(self._tone(8000, 250), 16000, frame_ms=100))
+        self.assertEqual([len(f) for f in frames[:2]], [3200, 3200])
+        self.assertAlmostEqual(len(frames[2]), 1600, delta=4)  # 重采样边界可能相差一两个采样
+
+    def test_stream_fallback_for_file_engines(self):
+        """不支持流式识别的引擎收到的是包含全部帧的临时WAV文件，识别后删除"""
+        class FileVoice(Voice):
+            def voiceToText(self, voice_file):
+                self.path = voice_file
+                with open(voice_file, "rb") as f:
+                    return audio_codec.decode_wav(f.read())
+
+        voice = FileVoice()
+        pcm = voice.voiceStreamToText(iter([b"\x01\x00" * 100, b"\x02\x00" * 50]), 16000)
+        self.assertEqual(pcm.data, b"\x01\x00" * 100 + b"\x02\x00" * 50)
+        self.assertFalse(os.path.exists(voice.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+
+from bot.chat_stream import TextChunker, iter_sse_deltas, stream_reply
+from bridge.context import CancelToken, Context, ContextType
+
+
+class _Channel:
+    def __init__(self):
+        self.sent = []
+
+    def send_stream_chunk(self, context, text):
+        self.sent.append(text)
+
+
+class _Response:
+    def __init__(self, lines):
+        self.lines = lines
+
+    def iter_lines(self):
+        return iter(self.lines)
+
+
+class TestChatStream(unittest.TestCase):
+    def _context(self, channel):
+        context = Context(ContextType.TEXT, "")
+        context.kwargs = {"channel": channel, "cancel_token": CancelToken()}
+        return context
+
+    def test_paragraph_chunks(self):
+        """按段落切分，短段落合并，代码块内的空行不切分"""
+        chunker = TextChunker("paragraph", min_chars=6, max_chars=100)
+        chunks = []
+        for delta in ["第一段", "内容\n\n短\n\n", "```\na\n\nb\n```", "\n\n尾"]:
+            chunks += chunker.feed(delta)
+        self.assertEqual(chunks, ["第一段内容", "短\n\n```\na\n\nb\n```"])
+        self.assertEqual(chunker.flush(), "尾")
+
+    def test_long_paragraph_split_at_sentence(self):
+        chunker = TextChunker("paragraph", min_chars=2, max_chars=10)
+        self.assertEqual(chunker.feed("一二三。四五六七。八九十一二"), ["一二三。四五六七。"])
+
+    def test_sse_deltas(self):
+        lines = [line.encode("utf-8") for line in [
+            'data: {"choices":[{"delta":{"role":"assistant"}}]}', "",
+            'data: {"choices":[{"delta":{"content":"你"}}]}', 'data: {"choices":[{"delta":{"content":"好"}}]}', "data: [DONE]",
+        ]]
+        self.assertEqual(list(iter_sse_deltas(_Response(lines))), ["你", "好"])
+
+    def test_stream_reply_holds_back_last_chunk(self):
+        """完整片段立即发送，最后一个片段作为回复返回，会话保存全文"""
+        channel = _Channel()
+        deltas = ["第一段内容很长很长很长很长很长很长很长很长很长很长很长很长很长很长很长很长很长很长很长很长很长很长很长很长\n\n",
+                  "第二段内容也很长很长很长很长很长很长很长很长很长很长很长很长很长很长很长很长很长很长很长很长很长很长\n\n", "结尾"]
+        result = stream_reply(lambda: (iter(deltas), None), self._context(channel))
+        self.assertEqual(len(channel.sent), 2)
+        self.assertEqual(result["final"], "结尾")
+        self.assertEqual(result["content"], "".join(deltas))
+        self.assertTrue(result["streamed"])
+        self.assertIsNone(result["completion_tokens"])
+
+    def test_fallback_when_nothing_sent(self):
+        def broken():
+            raise IOError("connection refused")
+
+        self.assertIsNone(stream_reply(lambda: (broken(), None), self._context(_Channel())))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+from collections import Counter
+
+from common.fair_scheduler import DeficitRoundRobin, FairScheduler
+
+
+class TestDeficitRoundRobin(unittest.TestCase):
+    def test_equal_weights_alternate(self):
+        """测试相同权重时轮流调度"""
+        drr = DeficitRoundRobin()
+        picks = [drr.next({"a": 1, "b": 1}) for _ in range(6)]
+        self.assertEqual(Counter(picks), {"a": 3, "b": 3})
+        self.assertNotEqual(picks[0], picks[1])
+
+    def test_weighted_share(self):
+        """测试按权重比例分配"""
+        drr = DeficitRoundRobin()
+        picks = [drr.next({"chatty": 1, "private": 3}) for _ in range(400)]
+        counts = Counter(picks)
+        self.assertEqual(counts["private"], 300)
+        self.assertEqual(counts["chatty"], 100)
+
+    def test_removed_key(self):
+        """测试不可调度的key不会被选中"""
+        drr = DeficitRoundRobin()
+        drr.next({"a": 1, "b": 1})
+        self.assertEqual(drr.next({"b": 1}), "b")
+        self.assertIsNone(drr.next({}))
+
+
+class TestFairScheduler(unittest.TestCase):
+    def test_priority_first(self):
+        """测试高优先级类别优先调度"""
+        scheduler = FairScheduler()
+        candidates = {"cmd": (0, 1), "group": (1, 5)}
+        self.assertEqual(scheduler.next(candidates), "cmd")
+        del candidates["cmd"]
+        self.assertEqual(scheduler.next(candidates), "group")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import http.server
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from common.fetcher import Fetcher, FetchTooLarge
+
+BODY = b"x" * 1000
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestFetcher(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/a.jpg"
+        self.dir = tempfile.mkdtemp()
+        _Handler.requests_seen = []
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.dir)
+
+    def test_conditional_get(self):
+        """第二次下载带If-None-Match，304时使用缓存文件"""
+        fetcher = Fetcher(os.path.join(self.dir, "cache"))
+        first = fetcher.fetch(self.url)
+        second = fetcher.fetch(self.url)
+        self.assertFalse(first.from_cache)
+        self.assertTrue(second.from_cache)
+        self.assertEqual(second.read(), BODY)
+        self.assertEqual(_Handler.requests_seen, [None, '"v1"'])
+
+    def test_fetch_to_is_independent(self):
+        """fetch_to得到的文件删除后不影响缓存"""
+        fetcher = Fetcher(os.path.join(self.dir, "cache"))
+        dest = os.path.join(self.dir, "out", "a.jpg")
+        fetcher.fetch_to(self.url, dest)
+        os.remove(dest)
+        self.assertEqual(fetcher.fetch(self.url).read(), BODY)
+
+    def test_max_bytes(self):
+        """超过大小限制时中止且不留下缓存文件"""
+        fetcher = Fetcher(os.path.join(self.dir, "cache"), max_bytes=100)
+        with self.assertRaises(FetchTooLarge):
+            fetcher.fetch(self.url)
+        self.assertEqual(os.listdir(os.path.join(self.dir, "cache")), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
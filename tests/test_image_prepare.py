@@ -0,0 +1,47 @@
+import io
+import random
+import unittest
+
+from PIL import Image
+
+from common.image_prepare import prepare_jpeg
+
+
+def _noise_image(size, mode="RGB"):
+    rnd = random.Random(0)
+    img = Image.new(mode, size)
+    img.putdata([tuple(rnd.randrange(256) for _ in mode) for _ in range(size[0] * size[1])])
+    return img
+
+
+def _encode(img, fmt, **kwargs):
+    out = io.BytesIO()
+    img.save(out, fmt, **kwargs)
+    return out.getvalue()
+
+
+class TestPrepareJpeg(unittest.TestCase):
+    def test_small_jpeg_not_reencoded(self):
+        """满足限制的JPEG原样返回"""
+        data = _encode(_noise_image((64, 64)), "JPEG", quality=90)
+        stats = {}
+        self.assertIs(prepare_jpeg(data, max_bytes=len(data), stats=stats), data)
+        self.assertEqual(stats["encodes"], 0)
+
+    def test_png_converted_to_jpeg(self):
+        """透明PNG转换为JPEG"""
+        data = _encode(_noise_image((32, 32), "RGBA"), "PNG")
+        result = prepare_jpeg(data)
+        self.assertTrue(result.startswith(b"\xff\xd8"))
+
+    def test_hits_byte_target(self):
+        """二分查找质量，结果不超过目标大小，编码次数远少于逐级降低质量"""
+        data = _encode(_noise_image((200, 200)), "PNG")
+        stats = {}
+        result = prepare_jpeg(data, quality=95, max_bytes=20 * 1024, stats=stats)
+        self.assertLessEqual(len(result), 20 * 1024)
+        self.assertLessEqual(stats["encodes"], 16)
+
+
+if __name__ == "__main__":
+    unittest.main()
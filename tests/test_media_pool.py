@@ -0,0 +1,46 @@
+import threading
+import time
+import unittest
+from concurrent.futures import TimeoutError
+
+from common.media_pool import MediaPool
+
+
+class TestMediaPool(unittest.TestCase):
+    def test_timeout_keeps_queued_tasks(self):
+        """一个任务超时换池时，旧池中排队的其他任务不被取消"""
+        pool = MediaPool(workers=1, max_pending=8, timeout=30)
+        self.addCleanup(pool.shutdown)
+        self.assertEqual(pool.run(abs, -1), 1)  # 预热，启动工作进程
+
+        timed_out = threading.Event()
+
+        def slow():
+            try:
+                pool.run(time.sleep, 2, timeout=1)
+            except TimeoutError:
+                timed_out.set()
+
+        results, errors = [], []
+
+        def quick(i):
+            try:
+                results.append(pool.run(abs, -i, timeout=10))
+            except BaseException as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=slow)]
+        threads[0].start()
+        time.sleep(0.3)  # 慢任务已在执行，后面的任务在同一个进程池中排队
+        threads += [threading.Thread(target=quick, args=(i,)) for i in range(1, 5)]
+        for t in threads[1:]:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertTrue(timed_out.is_set())
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(results), [1, 2, 3, 4])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import threading
+import time
+import unittest
+
+from common.reorder_buffer import ReorderBuffer
+
+
+class TestReorderBuffer(unittest.TestCase):
+    def test_release_in_order(self):
+        """测试后到的序号等待前面的序号结束后才放行"""
+        buffer = ReorderBuffer()
+        seqs = [buffer.issue() for _ in range(3)]
+        sent = []
+
+        def worker(seq, delay):
+            time.sleep(delay)
+            buffer.wait_turn(seq, timeout=5)
+            sent.append(seq)
+            buffer.release(seq)
+
+        threads = [threading.Thread(target=worker, args=(seq, delay)) for seq, delay in zip(seqs, (0.2, 0.1, 0))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(sent, [0, 1, 2])
+        self.assertEqual(buffer.pending, 0)
+
+    def test_timeout_skips_earlier(self):
+        """测试等待超时后不再等待更早的序号"""
+        buffer = ReorderBuffer()
+        first, second = buffer.issue(), buffer.issue()
+        self.assertFalse(buffer.wait_turn(second, timeout=0.05))
+        buffer.release(second)
+        # 超时被跳过的序号之后结束时立即放行
+        self.assertTrue(buffer.wait_turn(first, timeout=0))
+        buffer.release(first)
+        self.assertEqual(buffer.pending, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import time
+import unittest
+from unittest import mock
+
+from bridge.bridge import Bridge
+from bridge.context import Context, ContextType
+from bridge.reply import Reply, ReplyType
+from bridge.reply_cache import ReplyCache, normalize_query, reply_cache_key
+from config import conf
+
+
+class TestReplyCache(unittest.TestCase):
+    def _context(self, ctype=ContextType.TEXT, isgroup=True, receiver="g1@chatroom"):
+        context = Context(ctype, "")
+        context.kwargs = {"isgroup": isgroup, "group_name": "测试群", "receiver": receiver, "session_id": receiver}
+        return context
+
+    def test_normalize(self):
+        """忽略首尾标点、语气词、大小写和多余空白"""
+        self.assertEqual(normalize_query(" 怎么报名？"), normalize_query("怎么报名呢"))
+        self.assertEqual(normalize_query("Open  Time?"), "open time")
+
+    def test_key_scope_and_bypass(self):
+        """按群区分，私聊、非文本、过长或带上下文词的问题不缓存"""
+        old_keywords = conf().get("reply_cache_bypass_keywords")
+        self.addCleanup(conf().__setitem__, "reply_cache_bypass_keywords", old_keywords)
+        conf()["reply_cache_bypass_keywords"] = ["刚才"]
+        key = reply_cache_key("营业时间？", self._context(), "dify")
+        self.assertIsNotNone(key)
+        self.assertEqual(key, reply_cache_key("营业时间", self._context(), "dify"))
+        self.assertNotEqual(key, reply_cache_key("营业时间", self._context(receiver="g2@chatroom"), "dify"))
+        self.assertNotEqual(key, reply_cache_key("营业时间", self._context(), "coze"))
+        self.assertIsNone(reply_cache_key("营业时间", self._context(isgroup=False), "dify"))
+        self.assertIsNone(reply_cache_key("营业时间", self._context(ContextType.IMAGE_CREATE), "dify"))
+        self.assertIsNone(reply_cache_key("刚才说的是什么", self._context(), "dify"))
+        self.assertIsNone(reply_cache_key("问" * 100, self._context(), "dify"))
+
+    def test_ttl_and_capacity(self):
+        cache = ReplyCache(capacity=1, ttl=0.05)
+        cache.put("a", "答案a", 1.5)
+        self.assertEqual(cache.get("a"), ("答案a", 1.5))
+        cache.put("b", "答案b", 1.0)
+        self.assertIsNone(cache.get("a"))
+        time.sleep(0.06)
+        self.assertIsNone(cache.get("b"))
+
+    def test_bridge_fills_empty_cache(self):
+        """空缓存也要写入，第二次相同提问直接命中，不再调用模型"""
+        cache, calls = ReplyCache(), []
+
+        class FakeBot:
+            def reply(self, query, context):
+                calls.append(query)
+                return Reply(ReplyType.TEXT, "每天9点开门")
+
+        bridge = Bridge()
+        bridge.bots["chat"] = FakeBot()
+        self.addCleanup(bridge.bots.pop, "chat", None)
+        with mock.patch("bridge.reply_cache.get_reply_cache", return_value=cache), \
+                mock.patch("bridge.reply_cache.reply_cache_key", return_value="k"):
+            first = bridge.fetch_reply_content("几点开门", self._context())
+            second = bridge.fetch_reply_content("几点开门", self._context())
+        self.assertEqual((first.content, second.content), ("每天9点开门", "每天9点开门"))
+        self.assertEqual(calls, ["几点开门"])
+
+
+if __name__ == "__main__":
+    unittest.main()
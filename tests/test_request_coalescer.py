@@ -0,0 +1,98 @@
+import threading
+import time
+import unittest
+
+from bridge.request_coalescer import RequestCoalescer
+
+
+class TestRequestCoalescer(unittest.TestCase):
+    def _start_leader(self, coalescer, release, calls):
+        def fn():
+            calls.append(1)
+            release.wait(1)
+            return "回复"
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(coalescer.run("k", fn)))
+        leader.start()
+        while coalescer.inflight("k") < 0:
+            time.sleep(0.001)
+        return leader, results, fn
+
+    def test_concurrent_requests_share_result(self):
+        """相同key进行中时后到的请求等待并共享结果，只调用一次"""
+        coalescer, release, calls = RequestCoalescer(), threading.Event(), []
+        leader, results, fn = self._start_leader(coalescer, release, calls)
+        waiters = [threading.Thread(target=lambda: results.append(coalescer.run("k", fn, 1))) for _ in range(3)]
+        for t in waiters:
+            t.start()
+        while coalescer.inflight("k") < 3:
+            time.sleep(0.001)
+        release.set()
+        for t in [leader] + waiters:
+            t.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results, key=lambda r: r[1]), [("回复", False)] + [("回复", True)] * 3)
+        self.assertEqual(coalescer.inflight("k"), -1)
+
+    def test_waiters_get_snapshot_not_leader_object(self):
+        """首个请求方返回后修改自己的结果，不影响等待方拿到的快照"""
+        coalescer, started, release = RequestCoalescer(), threading.Event(), threading.Event()
+
+        def fn():
+            started.set()
+            release.wait(1)
+            return {"content": "回复"}
+
+        def snapshot(result):
+            return result["content"]
+
+        def run_leader():
+            result, _ = coalescer.run("k", fn, snapshot=snapshot)
+            result["content"] = "@张三 " + result["content"]  # 模拟装饰回复
+
+        leader = threading.Thread(target=run_leader)
+        leader.start()
+        started.wait(1)
+        results = []
+        waiters = [
+            threading.Thread(target=lambda: results.append(coalescer.run("k", fn, 1, snapshot))) for _ in range(3)
+        ]
+        for t in waiters:
+            t.start()
+        while coalescer.inflight("k") < 3:
+            time.sleep(0.001)
+        release.set()
+        for t in [leader] + waiters:
+            t.join()
+        self.assertEqual(results, [("回复", True)] * 3)
+
+    def test_waiter_falls_back_when_leader_fails(self):
+        """首个请求失败时等待方自行调用"""
+        coalescer, started, release = RequestCoalescer(), threading.Event(), threading.Event()
+
+        def failing():
+            started.set()
+            release.wait(1)
+            raise RuntimeError("boom")
+
+        def run_leader():
+            with self.assertRaises(RuntimeError):
+                coalescer.run("k", failing)
+
+        leader = threading.Thread(target=run_leader)
+        leader.start()
+        started.wait(1)
+        result = []
+        waiter = threading.Thread(target=lambda: result.append(coalescer.run("k", lambda: "自行调用", 1)))
+        waiter.start()
+        while coalescer.inflight("k") < 1:
+            time.sleep(0.001)
+        release.set()
+        leader.join()
+        waiter.join()
+        self.assertEqual(result, [("自行调用", False)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,27 @@
+import time
+import unittest
+
+from common.seen_set import SeenSet
+
+
+class TestSeenSet(unittest.TestCase):
+    def test_duplicate(self):
+        """测试重复的key返回False"""
+        seen = SeenSet()
+        self.assertTrue(seen.add("1"))
+        self.assertFalse(seen.add("1"))
+        self.assertIn("1", seen)
+
+    def test_capacity_and_ttl(self):
+        """测试超出容量和过期的key被淘汰"""
+        seen = SeenSet(capacity=2, ttl=0.05)
+        for key in ("1", "2", "3"):
+            seen.add(key)
+        self.assertNotIn("1", seen)
+        self.assertEqual(len(seen), 2)
+        time.sleep(0.1)
+        self.assertTrue(seen.add("2"))
+
+
+if __name__ == "__main__":
+    unittest.main()
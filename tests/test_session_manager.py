@@ -0,0 +1,26 @@
+import unittest
+
+from bot.session_manager import Session, SessionManager
+
+
+class SimpleSession(Session):
+    def discard_exceeding(self, max_tokens=None, cur_tokens=None):
+        return 0
+
+
+class TestSessionManager(unittest.TestCase):
+    def test_discard_cancelled_query(self):
+        """请求被取消时撤销没有回复的提问，不影响之前的对话"""
+        sessions = SessionManager(SimpleSession)
+        sessions.session_query("你好", "s1")
+        sessions.session_reply("你好，有什么可以帮你", "s1")
+        sessions.session_query("讲个长故事", "s1")
+        sessions.session_discard_query("s1")
+        messages = sessions.build_session("s1").messages
+        self.assertEqual([m["content"] for m in messages], ["你好", "你好，有什么可以帮你"])
+        sessions.session_discard_query("s1")  # 没有待回复的提问时不做任何修改
+        self.assertEqual(len(sessions.build_session("s1").messages), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import base64
+import json
+import os
+import tempfile
+import unittest
+
+from lib.wxpad.streaming_body import Base64Data, StreamingJsonBody
+
+
+class TestStreamingJsonBody(unittest.TestCase):
+    def test_matches_json_dumps(self):
+        """流式请求体与整体base64后json序列化的结果一致，长度与Content-Length一致"""
+        payload = os.urandom(200 * 1024 + 1)
+        fd, path = tempfile.mkstemp()
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        self.addCleanup(os.remove, path)
+        encoded = base64.b64encode(payload).decode("utf-8")
+        for source in (path, payload, memoryview(payload)):
+            body = StreamingJsonBody({"ThumbData": "缩略图", "ToUserName": "wxid_a", "VideoData": Base64Data(source)})
+            data = b"".join(body)
+            self.assertEqual(len(data), len(body))
+            self.assertEqual(json.loads(data), {"ThumbData": "缩略图", "ToUserName": "wxid_a", "VideoData": encoded})
+            self.assertEqual(b"".join(body), data)  # 可重复迭代，用于失败重试
+
+    def test_needed(self):
+        """只有包含Base64Data字段时才使用流式请求体"""
+        self.assertFalse(StreamingJsonBody.needed({"a": "b"}))
+        self.assertTrue(StreamingJsonBody.needed({"a": Base64Data(b"x")}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from bridge.bridge import Bridge
+from bridge.reply import Reply, ReplyType
+from voice.tts_cache import TtsCache
+from voice.voice import Voice
+
+
+class FakeVoice(Voice):
+    def __init__(self, out_dir, voice="zh-CN-XiaoxiaoNeural"):
+        self.out_dir = out_dir
+        self.voice = voice
+        self.calls = 0
+
+    def cache_params(self):
+        return {"voice": self.voice} if self.voice else None
+
+    def textToVoice(self, text):
+        self.calls += 1
+        path = os.path.join(self.out_dir, f"reply-{self.calls}.mp3")
+        with open(path, "wb") as f:
+            f.write(os.urandom(64))
+        return Reply(ReplyType.VOICE, path)
+
+
+class TestTtsCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.dir.name, "cache")
+        self.out_dir = os.path.join(self.dir.name, "out")
+        os.makedirs(self.out_dir)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def _audio(self, name, size):
+        path = os.path.join(self.dir.name, name)
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+        return path
+
+    def test_key_normalizes_text(self):
+        """空白差异使用同一个key，引擎或音色不同则不同，超长文本不缓存"""
+        cache = TtsCache(self.cache_dir, max_text_len=10)
+        self.assertEqual(cache.key("openai", "alloy", " 你好\n 世界 "), cache.key("openai", "alloy", "你好 世界"))
+        self.assertNotEqual(cache.key("openai", "alloy", "你好"), cache.key("openai", "nova", "你好"))
+        self.assertNotEqual(cache.key("openai", "alloy", "你好"), cache.key("edge", "alloy", "你好"))
+        self.assertIsNone(cache.key("openai", "alloy", "x" * 11))
+
+    def test_hit_returns_independent_copy(self):
+        """命中返回的文件删除后缓存仍然可用，重启后从目录恢复"""
+        cache = TtsCache(self.cache_dir)
+        key = cache.key("openai", "alloy", "你好")
+        self.assertIsNone(cache.get(key, self.out_dir))
+        cache.put(key, self._audio("a.silk", 100))
+        path = cache.get(key, self.out_dir)
+        self.assertTrue(path.endswith(".silk"))
+        os.remove(path)
+        self.assertIsNotNone(TtsCache(self.cache_dir).get(key, self.out_dir))
+
+    def test_evicts_least_recently_used(self):
+        """超过总大小时淘汰最久未使用的记录"""
+        cache = TtsCache(self.cache_dir, max_bytes=250)
+        keys = [cache.key("openai", "alloy", str(i)) for i in range(3)]
+        cache.put(keys[0], self._audio("0.mp3", 100))
+        cache.put(keys[1], self._audio("1.mp3", 100))
+        cache.get(keys[0], self.out_dir)
+        cache.put(keys[2], self._audio("2.mp3", 100))
+        self.assertIsNotNone(cache.get(keys[0], self.out_dir))
+        self.assertIsNone(cache.get(keys[1], self.out_dir))
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+
+
+class TestBridgeTtsCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.cache = TtsCache(os.path.join(self.dir.name, "cache"))
+        self.bridge = Bridge()
+        self.voice = FakeVoice(self.dir.name)
+        self.bridge.bots["text_to_voice"] = self.voice
+        tmp_dir = mock.Mock()
+        tmp_dir.return_value.path.return_value = self.dir.name + "/"
+        for patcher in (
+            mock.patch("bridge.bridge.get_tts_cache", return_value=self.cache),
+            mock.patch("bridge.bridge.TmpDir", tmp_dir),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.bridge.bots.pop("text_to_voice", None)
+        self.dir.cleanup()
+
+    def test_voice_settings_change_key(self):
+        """引擎音色设置改变后不再命中旧音频"""
+        self.bridge.fetch_text_to_voice("你好")
+        self.bridge.fetch_text_to_voice("你好")
+        self.assertEqual(self.voice.calls, 1)
+        self.voice.voice = "zh-CN-YunjianNeural"
+        self.bridge.fetch_text_to_voice("你好")
+        self.assertEqual(self.voice.calls, 2)
+
+    def test_engine_without_params_not_cached(self):
+        """未声明音色设置的引擎不使用缓存"""
+        self.voice.voice = None
+        self.bridge.fetch_text_to_voice("你好")
+        self.bridge.fetch_text_to_voice("你好")
+        self.assertEqual(self.voice.calls, 2)
+        self.assertEqual(len(self.cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import os
+import struct
+import tempfile
+import unittest
+
+from common.video_probe import mp4_duration
+
+
+def _box(box_type, payload):
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def _mvhd(version, timescale, duration):
+    if version == 1:
+        body = struct.pack(">B3xQQIQ", 1, 0, 0, timescale, duration)
+    else:
+        body = struct.pack(">B3xIIII", 0, 0, 0, timescale, duration)
+    return _box(b"mvhd", body + bytes(80))
+
+
+class TestMp4Duration(unittest.TestCase):
+    def _write(self, data):
+        fd, path = tempfile.mkstemp(suffix=".mp4")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_moov_after_mdat(self):
+        """moov位于mdat之后时跳过mdat读取时长"""
+        data = _box(b"ftyp", b"isom" + bytes(4)) + _box(b"mdat", bytes(4096)) + _box(b"moov", _mvhd(0, 1000, 12500))
+        self.assertAlmostEqual(mp4_duration(self._write(data)), 12.5)
+
+    def test_version1_mvhd(self):
+        """64位mvhd"""
+        data = _box(b"ftyp", b"isom" + bytes(4)) + _box(b"moov", _mvhd(1, 600, 600 * 90))
+        self.assertAlmostEqual(mp4_duration(self._write(data)), 90)
+
+    def test_not_mp4(self):
+        """非MP4文件返回None"""
+        self.assertIsNone(mp4_duration(self._write(b"not a video at all")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import tracemalloc
+import unittest
+
+from channel.wxpad.wxpad_message import WechatPadProMessage
+
+IMAGE_XML = (
+    '<?xml version="1.0"?>\n<msg><img aeskey="{}" cdnmidimgurl="{}" md5="d41d8cd98f00b204e9800998ecf8427e" '
+    'length="102400" hdlength="409600" cdnthumburl="{}"/></msg>'.format("a" * 32, "b" * 200, "c" * 200)
+)
+
+
+def _raw_image_message():
+    return {
+        "msg_id": 1,
+        "new_msg_id": 7250000000000000001,
+        "from_user_name": {"str": "wxid_sender"},
+        "to_user_name": {"str": "wxid_bot"},
+        "msg_type": 3,
+        "content": {"str": IMAGE_XML},
+        "create_time": 1700000000,
+        "msg_source": "<msgsource><signature>{}</signature></msgsource>".format("s" * 400),
+        "img_buf": {"len": 2048, "buffer": "t" * 2048},
+    }
+
+
+def retained_bytes(release, count=200):
+    """解析图片消息后平均每条消息占用的内存(字节)，release为True时先释放原始数据"""
+    WechatPadProMessage(_raw_image_message()).release_raw()  # 预热，排除首次解析的一次性分配
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        messages = []
+        for _ in range(count):
+            msg = WechatPadProMessage(_raw_image_message())
+            if release:
+                msg.release_raw()
+            messages.append(msg)
+        return (tracemalloc.get_traced_memory()[0] - base) // count
+    finally:
+        tracemalloc.stop()
+
+
+class TestWechatPadProMessage(unittest.TestCase):
+    def test_release_raw_shrinks_retained_message(self):
+        """释放原始数据后消息对象明显变小"""
+        full, released = retained_bytes(False), retained_bytes(True)
+        self.assertLess(released, full / 2)
+
+    def test_prepare_runs_once(self):
+        """接收时已下载，之后channel/插件再调用prepare不会在释放原始数据后重新下载"""
+        msg = WechatPadProMessage(_raw_image_message())
+        calls = []
+        msg._prepare_fn = lambda: calls.append(msg.msg_data.get("MsgType"))
+        msg.prepare()
+        msg.release_raw()
+        msg.prepare()
+        self.assertEqual(calls, [3])
+
+
+if __name__ == "__main__":
+    print("retained bytes: raw={} released={}".format(retained_bytes(False), retained_bytes(True)))
+    unittest.main()
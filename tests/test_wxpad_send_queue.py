@@ -0,0 +1,34 @@
+import threading
+import unittest
+from unittest import mock
+
+from bridge.reply import Reply, ReplyType
+from channel.wxpad.wxpad_send_queue import WxpadSendQueue
+
+
+class FakeChannel:
+    def __init__(self):
+        self.sent = []
+        self.event = threading.Event()
+
+    def _send_text_batch(self, receiver, texts):
+        self.sent.append((receiver, texts))
+        self.event.set()
+
+
+class TestWxpadSendQueue(unittest.TestCase):
+    def test_fractional_rate_still_sends(self):
+        """每分钟不足1条的限速保持配置值，第一条消息照常发送"""
+        channel = FakeChannel()
+        queue = WxpadSendQueue(channel, workers=1, rate_per_minute=0.5)
+        self.addCleanup(queue._rate_limiter.close)
+        self.assertAlmostEqual(queue._rate_limiter.rate, 0.5 / 60)
+        context = mock.Mock()
+        context.is_cancelled.return_value = False
+        queue.put("wxid_a", Reply(ReplyType.TEXT, "你好"), context)
+        self.assertTrue(channel.event.wait(5))
+        self.assertEqual(channel.sent, [("wxid_a", ["你好"])])
+
+
+if __name__ == "__main__":
+    unittest.main()
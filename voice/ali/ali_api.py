@@ -68,7 +68,7 @@ def speech_to_text_aliyun(url, audioContent, appkey, token):
 
     参数:
     - url (str): 阿里云语音识别服务的端点URL。
-    - audioContent (byte): pcm音频数据。
+    - audioContent (byte): pcm音频数据，也可以是PCM帧的迭代器，此时以chunked方式边读取边上传。
     - appkey (str): 您的阿里云appkey。
     - token (str): 阿里云API的认证令牌。
 
@@ -101,11 +101,13 @@ def speech_to_text_aliyun(url, audioContent, appkey, token):
     httpHeaders = {
         'X-NLS-Token': token,
         'Content-type': 'application/octet-stream',
-        'Content-Length': len(audioContent)
         }
+    streaming = not isinstance(audioContent, (bytes, bytearray))
+    if not streaming:
+        httpHeaders['Content-Length'] = len(audioContent)
 
     conn = http.client.HTTPSConnection(host)
-    conn.request(method='POST', url=request, body=audioContent, headers=httpHeaders)
+    conn.request(method='POST', url=request, body=audioContent, headers=httpHeaders, encode_chunked=streaming)
 
     response = conn.getresponse()
     body = response.read()
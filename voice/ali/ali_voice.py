@@ -42,6 +42,10 @@ class AliVoice(Voice):
         except Exception as e:
             logger.warn("AliVoice init failed: %s, ignore " % e)
 
+    def cache_params(self):
+        # 音色、语速等参数在api_url_text_to_voice中
+        return {"api_url": getattr(self, "api_url_text_to_voice", None), "app_key": getattr(self, "app_key", None)}
+
     def textToVoice(self, text):
         """
         将文本转换为语音文件。
@@ -81,6 +85,25 @@ class AliVoice(Voice):
             reply = Reply(ReplyType.ERROR, "抱歉，语音识别失败")
         return reply
 
+    supports_streaming_asr = True
+
+    def voiceStreamToText(self, frames, sample_rate=16000):
+        """
+        将PCM帧以chunked方式边解码边上传识别，不生成wav文件。
+
+        :param frames: 16位单声道PCM帧的迭代器。
+        :param sample_rate: 采样率，阿里云一句话识别使用16000。
+        :return: 返回一个Reply对象，其中包含转换得到的文本或错误信息。
+        """
+        token_id = self.get_valid_token()
+        text = speech_to_text_aliyun(self.api_url_voice_to_text, frames, self.app_key, token_id)
+        if text:
+            logger.info("[Ali] VoiceStreamToText = {}".format(text))
+            reply = Reply(ReplyType.TEXT, text)
+        else:
+            reply = Reply(ReplyType.ERROR, "抱歉，语音识别失败")
+        return reply
+
     def get_valid_token(self):
         """
         获取有效的阿里云token。
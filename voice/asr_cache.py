@@ -0,0 +1,70 @@
+"""
+语音识别结果缓存
+
+按(识别引擎, 语音文件内容哈希)缓存识别出的文字。转发到多个群的同一条语音、处理失败后重试的语音
+命中缓存时可以跳过格式转换和语音识别。缓存只保存文字，容量和过期时间都有上限。
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from common import metrics
+
+
+class AsrCache:
+    def __init__(self, capacity=2000, ttl=86400):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._items = OrderedDict()  # key -> (文字, 写入时间)，按最近使用排序
+
+    @staticmethod
+    def key(engine, voice_file):
+        sha1 = hashlib.sha1()
+        with open(voice_file, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha1.update(chunk)
+        return f"{engine}:{sha1.hexdigest()}"
+
+    def get(self, key):
+        counter = metrics.get_counter("asr_cache")
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and time.time() - item[1] > self.ttl:
+                del self._items[key]
+                item = None
+            if item is None:
+                counter.inc("miss")
+                return None
+            self._items.move_to_end(key)
+        counter.inc("hit")
+        return item[0]
+
+    def put(self, key, text):
+        with self._lock:
+            self._items[key] = (text, time.time())
+            self._items.move_to_end(key)
+            while len(self._items) > self.capacity:
+                self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_asr_cache():
+    """按配置返回全局缓存，未开启时返回None"""
+    global _cache
+    from config import conf
+
+    capacity = conf().get("asr_cache_capacity", 2000)
+    if not capacity:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = AsrCache(capacity, conf().get("asr_cache_ttl", 86400))
+        return _cache
@@ -0,0 +1,225 @@
+"""
+进程内音频编解码
+
+所有格式先解码为内存中的16位单声道PCM，再按需输出WAV字节(语音识别)或SILK字节(发送语音)：
+- SILK/WAV直接在进程内解码，不启动ffmpeg
+- 其他格式(mp3/m4a/ogg等)通过pydub调用一次ffmpeg解码
+- 重采样、增益、裁剪、分段都在内存中完成，不写中间文件
+"""
+import io
+import os
+import time
+import warnings
+import wave
+
+from common.log import logger
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        import audioop  # numpy不可用时的重采样回退，Python 3.13起已移除
+except ImportError:
+    audioop = None
+
+try:
+    import pysilk
+except ImportError:
+    pysilk = None
+
+try:
+    from pydub import AudioSegment
+except ImportError:
+    AudioSegment = None
+
+SILK_EXTENSIONS = (".sil", ".silk", ".slk")
+SILK_SAMPLE_RATES = (8000, 12000, 16000, 24000, 32000, 44100, 48000)
+
+
+class PcmAudio:
+    """16位单声道PCM数据"""
+
+    __slots__ = ("data", "sample_rate")
+
+    def __init__(self, data: bytes, sample_rate: int):
+        self.data = data
+        self.sample_rate = sample_rate
+
+    @property
+    def duration_ms(self) -> int:
+        return len(self.data) * 1000 // (2 * self.sample_rate)
+
+    def slice(self, start_ms, end_ms=None):
+        start = start_ms * self.sample_rate // 1000 * 2
+        end = len(self.data) if end_ms is None else end_ms * self.sample_rate // 1000 * 2
+        return PcmAudio(self.data[start:end], self.sample_rate)
+
+    def split(self, max_segment_ms) -> list:
+        """按最大时长分段，不足max_segment_ms时返回只含自身的列表"""
+        if self.duration_ms <= max_segment_ms:
+            return [self]
+        return [self.slice(start, start + max_segment_ms) for start in range(0, self.duration_ms, max_segment_ms)]
+
+
+def is_silk(path) -> bool:
+    return path.lower().endswith(SILK_EXTENSIONS)
+
+
+def closest_silk_rate(sample_rate) -> int:
+    return min(SILK_SAMPLE_RATES, key=lambda x: abs(x - sample_rate))
+
+
+def decode_silk(silk_data: bytes, sample_rate=24000) -> PcmAudio:
+    """SILK字节解码为PCM，由SILK解码器直接输出目标采样率"""
+    if pysilk is None:
+        raise RuntimeError("pysilk is not installed")
+    return PcmAudio(pysilk.decode(silk_data, sample_rate=sample_rate), sample_rate)
+
+
+def decode_wav(wav_data: bytes) -> PcmAudio:
+    """WAV字节解码为PCM，多声道取平均，非16位采样转换为16位"""
+    with wave.open(io.BytesIO(wav_data), "rb") as wav:
+        channels = wav.getnchannels()
+        sample_width = wav.getsampwidth()
+        sample_rate = wav.getframerate()
+        frames = wav.readframes(wav.getnframes())
+    if channels == 1 and sample_width == 2:
+        return PcmAudio(frames, sample_rate)
+    if np is not None:
+        dtype = {1: np.uint8, 2: np.int16, 4: np.int32}.get(sample_width)
+        if dtype is None:
+            raise ValueError("unsupported wav sample width: {}".format(sample_width))
+        samples = np.frombuffer(frames, dtype=dtype).astype(np.float32)
+        if sample_width == 1:
+            samples = (samples - 128) * 256
+        elif sample_width == 4:
+            samples = samples / 65536
+        samples = samples.reshape(-1, channels).mean(axis=1)
+        return PcmAudio(np.clip(samples, -32768, 32767).astype(np.int16).tobytes(), sample_rate)
+    if audioop is None:
+        raise RuntimeError("numpy is not installed")
+    if sample_width == 1:
+        frames = audioop.bias(frames, 1, -128)
+    frames = audioop.lin2lin(frames, sample_width, 2)
+    if channels == 2:
+        frames = audioop.tomono(frames, 2, 0.5, 0.5)
+    elif channels != 1:
+        raise ValueError("unsupported wav channels: {}".format(channels))
+    return PcmAudio(frames, sample_rate)
+
+
+def decode_file(path, sample_rate=None) -> PcmAudio:
+    """读取任意格式音频为PCM，SILK和WAV在进程内解码，其他格式调用一次ffmpeg"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in SILK_EXTENSIONS:
+        with open(path, "rb") as f:
+            pcm = decode_silk(f.read(), closest_silk_rate(sample_rate or 24000))
+    elif ext == ".wav":
+        with open(path, "rb") as f:
+            wav_data = f.read()
+        try:
+            pcm = decode_wav(wav_data)
+        except (wave.Error, ValueError, EOFError) as e:  # 如浮点WAV，交给ffmpeg
+            logger.debug(f"[音频编解码] wave模块无法解析 {path}: {e}")
+            pcm = _decode_with_pydub(path)
+    else:
+        pcm = _decode_with_pydub(path)
+    if sample_rate:
+        pcm = resample(pcm, sample_rate)
+    return pcm
+
+
+def _decode_with_pydub(path) -> PcmAudio:
+    if AudioSegment is None:
+        raise RuntimeError("pydub is not installed")
+    audio = AudioSegment.from_file(path).set_channels(1).set_sample_width(2)
+    return PcmAudio(audio.raw_data, audio.frame_rate)
+
+
+def resample(pcm: PcmAudio, sample_rate: int) -> PcmAudio:
+    """线性插值重采样"""
+    if pcm.sample_rate == sample_rate or not pcm.data:
+        return PcmAudio(pcm.data, sample_rate)
+    if np is not None:
+        samples = np.frombuffer(pcm.data, dtype=np.int16)
+        count = int(len(samples) * sample_rate / pcm.sample_rate)
+        positions = np.arange(count, dtype=np.float64) * (pcm.sample_rate / sample_rate)
+        resampled = np.interp(positions, np.arange(len(samples)), samples)
+        return PcmAudio(np.round(resampled).astype(np.int16).tobytes(), sample_rate)
+    if audioop is None:
+        raise RuntimeError("numpy is not installed")
+    data, _ = audioop.ratecv(pcm.data, 2, 1, pcm.sample_rate, sample_rate, None)
+    return PcmAudio(data, sample_rate)
+
+
+def apply_gain(pcm: PcmAudio, db: float) -> PcmAudio:
+    """调整音量，超出16位范围的采样截断"""
+    factor = 10 ** (db / 20)
+    if np is not None:
+        samples = np.frombuffer(pcm.data, dtype=np.int16).astype(np.float32) * factor
+        return PcmAudio(np.clip(samples, -32768, 32767).astype(np.int16).tobytes(), pcm.sample_rate)
+    if audioop is None:
+        raise RuntimeError("numpy is not installed")
+    return PcmAudio(audioop.mul(pcm.data, 2, factor), pcm.sample_rate)
+
+
+def to_wav_bytes(pcm: PcmAudio) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(pcm.sample_rate)
+        wav.writeframes(pcm.data)
+    return buffer.getvalue()
+
+
+def encode_silk(pcm: PcmAudio, sample_rate=48000) -> bytes:
+    """PCM编码为微信语音使用的SILK字节"""
+    if pysilk is None:
+        raise RuntimeError("pysilk is not installed")
+    rate = closest_silk_rate(sample_rate)
+    pcm = resample(pcm, rate)
+    return pysilk.encode(pcm.data, data_rate=rate, sample_rate=rate)
+
+
+def iter_pcm_frames(source, sample_rate=16000, frame_ms=100):
+    """把音频文件或PcmAudio转换为sample_rate，返回按frame_ms切分的PCM字节迭代器，供流式语音识别逐帧发送
+
+    解码在调用时完成（解码失败立即抛出，便于调用方回退），之后逐帧产出，不生成wav文件。
+    """
+    pcm = source if isinstance(source, PcmAudio) else decode_file(source, sample_rate)
+    pcm = resample(pcm, sample_rate)
+    frame_bytes = sample_rate * frame_ms // 1000 * 2
+    view = memoryview(pcm.data)
+    return (bytes(view[i:i + frame_bytes]) for i in range(0, len(view), frame_bytes))
+
+
+def _benchmark(corpus_dir, rounds=3):
+    """对目录下的语音文件统计每秒转换次数：SILK/其他格式 -> WAV字节 和 -> SILK字节"""
+    files = [os.path.join(corpus_dir, name) for name in sorted(os.listdir(corpus_dir))]
+    files = [path for path in files if os.path.isfile(path)]
+    for name, convert in (
+        ("to_wav", lambda path: to_wav_bytes(decode_file(path))),
+        ("to_silk", lambda path: encode_silk(decode_file(path))),
+    ):
+        count = 0
+        start = time.time()
+        for _ in range(rounds):
+            for path in files:
+                try:
+                    convert(path)
+                    count += 1
+                except Exception as e:
+                    logger.warning(f"[音频编解码] {name} {path} 失败: {e}")
+        elapsed = time.time() - start
+        print(f"{name}: {count} conversions in {elapsed:.2f}s, {count / elapsed if elapsed else 0:.1f}/s")
+
+
+if __name__ == "__main__":
+    import sys
+
+    _benchmark(sys.argv[1] if len(sys.argv) > 1 else ".")
@@ -6,6 +6,7 @@ import tempfile
 import importlib.util
 
 from common.log import logger
+from voice import audio_codec
 
 # 检查是否安装了pysilk
 pysilk_available = importlib.util.find_spec("pysilk") is not None
@@ -105,10 +106,9 @@ def any_to_mp3(any_path, mp3_path, target_duration=None):
                 # 导出为MP3，使用较高比特率
                 audio.export(mp3_path, format="mp3", bitrate="192k")
                 
-                # 检查生成的MP3时长是否接近目标时长
+                # 导出前后时长一致，无需重新读取MP3
                 if target_duration and target_duration > 0:
-                    mp3_audio = AudioSegment.from_file(mp3_path)
-                    actual_duration = len(mp3_audio) / 1000.0
+                    actual_duration = len(audio) / 1000.0
                     logger.info(f"[音频转换] SILK->MP3转换完成: 目标时长={target_duration:.2f}秒, 实际时长={actual_duration:.2f}秒")
                 else:
                     logger.info(f"[音频转换] SILK->MP3转换完成: {any_path} -> {mp3_path} (pysilk)")
@@ -153,8 +153,7 @@ def any_to_mp3(any_path, mp3_path, target_duration=None):
                     
                     # 检查生成的MP3时长
                     if target_duration and target_duration > 0:
-                        mp3_audio = AudioSegment.from_file(mp3_path)
-                        actual_duration = len(mp3_audio) / 1000.0
+                        actual_duration = len(audio) / 1000.0
                         logger.info(f"[音频转换] SILK->MP3转换完成: 目标时长={target_duration:.2f}秒, 实际时长={actual_duration:.2f}秒 (pilk)")
                     else:
                         logger.info(f"[音频转换] SILK->MP3转换完成: {any_path} -> {mp3_path} (pilk)")
@@ -195,8 +194,7 @@ def any_to_mp3(any_path, mp3_path, target_duration=None):
         
         # 检查生成的MP3时长
         if target_duration and target_duration > 0:
-            mp3_audio = AudioSegment.from_file(mp3_path)
-            actual_duration = len(mp3_audio) / 1000.0
+            actual_duration = len(audio) / 1000.0
             logger.info(f"[音频转换] 转换完成: 目标时长={target_duration:.2f}秒, 实际时长={actual_duration:.2f}秒")
         else:
             logger.info(f"[音频转换] 转换完成: {any_path} -> {mp3_path}")
@@ -208,17 +206,38 @@ def any_to_mp3(any_path, mp3_path, target_duration=None):
 
 def any_to_wav(any_path, wav_path):
     """
-    把任意格式转成wav文件
+    把任意格式转成wav文件（pcm_s16le单声道），SILK在内存中解码，不经过ffmpeg
     """
     if any_path.endswith(".wav"):
-        shutil.copy2(any_path, wav_path)
+        if os.path.abspath(any_path) != os.path.abspath(wav_path):
+            shutil.copy2(any_path, wav_path)
         return
-    if any_path.endswith(".sil") or any_path.endswith(".silk") or any_path.endswith(".slk"):
-        return sil_to_wav(any_path, wav_path)
-    audio = AudioSegment.from_file(any_path)
-    audio.set_frame_rate(8000)    # 百度语音转写支持8000采样率, pcm_s16le, 单通道语音识别
-    audio.set_channels(1)
-    audio.export(wav_path, format="wav", codec='pcm_s16le')
+    pcm = audio_codec.decode_file(any_path)
+    with open(wav_path, "wb") as f:
+        f.write(audio_codec.to_wav_bytes(pcm))
+
+
+def silk_to_wav(silk_data: bytes, wav_path, target_duration=None, gain_db=6, sample_rate=24000):
+    """
+    SILK字节直接转成wav文件，用于接收到的语音消息：一次解码，裁剪和增益都在内存中完成
+
+    Args:
+        silk_data: SILK语音数据
+        wav_path: 输出的wav文件路径
+        target_duration: 目标时长（秒），解码结果更长时裁剪到该时长
+        gain_db: 音量增益
+    Returns:
+        音频时长（毫秒）
+    """
+    pcm = audio_codec.decode_silk(silk_data, sample_rate)
+    if target_duration and target_duration > 0 and pcm.duration_ms / 1000.0 - target_duration > 0.5:
+        logger.info(f"[音频转换] 裁剪音频到目标时长: 当前={pcm.duration_ms / 1000.0:.2f}秒, 目标={target_duration:.2f}秒")
+        pcm = pcm.slice(0, int(target_duration * 1000))
+    if gain_db:
+        pcm = audio_codec.apply_gain(pcm, gain_db)
+    with open(wav_path, "wb") as f:
+        f.write(audio_codec.to_wav_bytes(pcm))
+    return pcm.duration_ms
 
 
 def any_to_sil(any_path, sil_path):
@@ -229,33 +248,17 @@ def any_to_sil(any_path, sil_path):
         shutil.copy2(any_path, sil_path)
         return 10000
 
-    audio = AudioSegment.from_file(any_path)
-
-    # 优化音质设置：强制使用48000Hz采样率以获得最佳音质
-    # SILK支持的最高采样率，提供最佳音质
+    # 解码为单声道16位PCM（wav在进程内解码），SILK支持的最高采样率48000Hz音质最好
+    pcm = audio_codec.decode_file(any_path)
     target_rate = 48000
+    logger.info(f"[SILK转换] 原始采样率: {pcm.sample_rate}Hz -> 目标采样率: {target_rate}Hz")
 
-    logger.info(f"[SILK转换] 原始采样率: {audio.frame_rate}Hz -> 目标采样率: {target_rate}Hz")
-
-    # 转换为高质量PCM格式
-    # 1. 设置为单声道（微信语音要求）
-    audio = audio.set_channels(1)
-    # 2. 设置为16位采样深度
-    audio = audio.set_sample_width(2)
-    # 3. 设置为48000Hz高采样率
-    audio = audio.set_frame_rate(target_rate)
-
-    # 获取PCM数据
-    wav_data = audio.raw_data
-
-    # 使用pysilk编码为SILK格式
-    silk_data = pysilk.encode(wav_data, data_rate=target_rate, sample_rate=target_rate)
-
+    silk_data = audio_codec.encode_silk(pcm, target_rate)
     with open(sil_path, "wb") as f:
         f.write(silk_data)
 
     logger.info(f"[SILK转换] 转换完成: {any_path} -> {sil_path}, 采样率: {target_rate}Hz")
-    return audio.duration_seconds * 1000
+    return pcm.duration_ms
 
 def mp3_to_silk(mp3_path: str, silk_path: str) -> int:
     """Convert MP3 file to SILK format - 高音质版本
@@ -265,11 +268,18 @@ def mp3_to_silk(mp3_path: str, silk_path: str) -> int:
     Returns:
         Duration of the SILK file in milliseconds
     """
-    # 加载MP3文件
-    audio = AudioSegment.from_file(mp3_path)
-
     # 优化音质设置：使用48000Hz采样率
     target_rate = 48000
+    if pysilk_available:
+        # 在内存中完成编码，不写中间PCM文件
+        pcm = audio_codec.decode_file(mp3_path)
+        with open(silk_path, "wb") as f:
+            f.write(audio_codec.encode_silk(pcm, target_rate))
+        logger.info(f"[SILK转换] MP3转换完成: {mp3_path} -> {silk_path}, 采样率: {target_rate}Hz")
+        return pcm.duration_ms
+
+    # 加载MP3文件
+    audio = AudioSegment.from_file(mp3_path)
     logger.info(f"[SILK转换] MP3原始采样率: {audio.frame_rate}Hz -> 目标采样率: {target_rate}Hz")
 
     # 转换为高质量格式
@@ -69,6 +69,37 @@ class AzureVoice(Voice):
             reply = Reply(ReplyType.ERROR, "抱歉，语音识别失败")
         return reply
 
+    supports_streaming_asr = True
+
+    def voiceStreamToText(self, frames, sample_rate=16000):
+        # 通过PushAudioInputStream边写入PCM帧边识别，不生成wav文件
+        stream = speechsdk.audio.PushAudioInputStream(
+            stream_format=speechsdk.audio.AudioStreamFormat(samples_per_second=sample_rate, bits_per_sample=16, channels=1)
+        )
+        audio_config = speechsdk.audio.AudioConfig(stream=stream)
+        speech_recognizer = speechsdk.SpeechRecognizer(speech_config=self.speech_config, audio_config=audio_config)
+        result_future = speech_recognizer.recognize_once_async()
+        try:
+            for frame in frames:
+                stream.write(frame)
+        finally:
+            stream.close()
+        result = result_future.get()
+        if result.reason == speechsdk.ResultReason.RecognizedSpeech:
+            logger.info("[Azure] voiceStreamToText text={}".format(result.text))
+            reply = Reply(ReplyType.TEXT, result.text)
+        else:
+            cancel_details = result.cancellation_details
+            logger.error("[Azure] voiceStreamToText error, result={}, errordetails={}".format(result, cancel_details))
+            reply = Reply(ReplyType.ERROR, "抱歉，语音识别失败")
+        return reply
+
+    def cache_params(self):
+        config = getattr(self, "config", None) or {}
+        params = {k: v for k, v in config.items() if k.startswith("speech_synthesis") or k == "auto_detect"}
+        params["region"] = getattr(self, "api_region", None)
+        return params
+
     def textToVoice(self, text):
         if self.config.get("auto_detect"):
             lang = classify(text)[0]
@@ -74,6 +74,9 @@ class BaiduVoice(Voice):
             reply = Reply(ReplyType.ERROR, "百度语音识别出错了；{0}".format(res["err_msg"]))
         return reply
 
+    def cache_params(self):
+        return {k: getattr(self, k, None) for k in ("lang", "ctp", "spd", "pit", "vol", "per")}
+
     def textToVoice(self, text):
         result = self.client.synthesis(
             text,
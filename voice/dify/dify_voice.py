@@ -42,6 +42,10 @@ class DifyVoice(Voice):
             reply = Reply(ReplyType.ERROR, "我暂时还无法听清您的语音，请稍后再试吧~")
         return reply
 
+    def cache_params(self):
+        # 音色在dify应用中配置，按应用区分
+        return {"api_base": conf().get("dify_api_base"), "app": conf().get("dify_api_key")}
+
     def textToVoice(self, text):
         logger.debug("[DIFY VOICE] text={}".format(text))
         try:
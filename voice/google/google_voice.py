@@ -33,6 +33,9 @@ class GoogleVoice(Voice):
         finally:
             return reply
 
+    def cache_params(self):
+        return {"lang": "zh"}
+
     def textToVoice(self, text):
         try:
             # Avoid the same filename under multithreading
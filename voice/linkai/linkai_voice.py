@@ -52,6 +52,9 @@ class LinkAIVoice(Voice):
             return None
         return reply
 
+    def cache_params(self):
+        return {k: conf().get(k) for k in ("text_to_voice", "text_to_voice_model", "tts_voice_id", "linkai_app_code")}
+
     def textToVoice(self, text):
         try:
             url = conf().get("linkai_api_base", "https://api.link-ai.tech") + "/v1/audio/speech"
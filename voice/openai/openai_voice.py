@@ -45,6 +45,9 @@ class OpenaiVoice(Voice):
             return reply
 
 
+    def cache_params(self):
+        return {"model": conf().get("text_to_voice_model") or const.TTS_1, "voice": conf().get("tts_voice_id") or "alloy"}
+
     def textToVoice(self, text):
         try:
             api_base = conf().get("open_ai_api_base") or "https://api.openai.com/v1"
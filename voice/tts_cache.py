@@ -0,0 +1,137 @@
+"""
+语音合成结果缓存
+
+按(引擎, 音色, 规范化文本)缓存合成后的音频文件，总大小超过上限时淘汰最久未使用的记录。
+命中时返回缓存文件的独立副本（优先硬链接），调用方发送后可以直接删除。
+"""
+import hashlib
+import os
+import re
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+
+from common.log import logger
+
+
+class TtsCache:
+    def __init__(self, cache_dir, max_bytes=128 * 1024 * 1024, max_text_len=200):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_text_len = max_text_len
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (path, size)，按最近使用排序
+        self._size = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        files = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if os.path.isfile(path) and not name.endswith(".part"):
+                stat = os.stat(path)
+                files.append((stat.st_mtime, os.path.splitext(name)[0], path, stat.st_size))
+        for _, key, path, size in sorted(files):
+            self._entries[key] = (path, size)
+            self._size += size
+
+    @staticmethod
+    def normalize(text) -> str:
+        return re.sub(r"\s+", " ", text or "").strip()
+
+    def key(self, engine, voice, text):
+        """生成缓存key，文本过长（通常不会重复）时返回None表示不缓存"""
+        text = self.normalize(text)
+        if not text or len(text) > self.max_text_len:
+            return None
+        return hashlib.sha1(f"{engine}\0{voice}\0{text}".encode("utf-8")).hexdigest()
+
+    def get(self, key, dest_dir):
+        """命中时在dest_dir中生成一份副本并返回其路径，未命中返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        path = entry[0]
+        dest = os.path.join(dest_dir, f"tts_{uuid.uuid4().hex[:8]}{os.path.splitext(path)[1]}")
+        try:
+            _link_or_copy(path, dest)
+            os.utime(path)
+        except OSError as e:
+            logger.warning(f"[tts_cache] 读取缓存失败 {path}: {e}")
+            self._remove(key)
+            return None
+        return dest
+
+    def put(self, key, src_path):
+        """把合成结果加入缓存，src_path仍归调用方所有"""
+        ext = os.path.splitext(src_path)[1]
+        path = os.path.join(self.cache_dir, key + ext)
+        part_path = f"{path}.{uuid.uuid4().hex[:8]}.part"
+        try:
+            _link_or_copy(src_path, part_path)
+            os.replace(part_path, path)
+        except OSError as e:
+            logger.warning(f"[tts_cache] 写入缓存失败 {src_path}: {e}")
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            return
+        size = os.path.getsize(path)
+        evicted = []
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+                if old[0] != path:
+                    evicted.append(old[0])
+            self._entries[key] = (path, size)
+            self._size += size
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                _, (old_path, old_size) = self._entries.popitem(last=False)
+                self._size -= old_size
+                evicted.append(old_path)
+        for old_path in evicted:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+
+    def _remove(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry:
+                self._size -= entry[1]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _link_or_copy(src, dest):
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_tts_cache():
+    """按配置返回全局缓存，未开启时返回None"""
+    global _cache
+    from config import conf, get_appdata_dir
+
+    if not conf().get("tts_cache_enabled", True):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = TtsCache(
+                os.path.join(get_appdata_dir(), "tts_cache"),
+                max_bytes=conf().get("tts_cache_max_mb", 128) * 1024 * 1024,
+                max_text_len=conf().get("tts_cache_max_text_len", 200),
+            )
+        return _cache
@@ -1,17 +1,46 @@
 """
 Voice service abstract class
 """
+import os
+import uuid
 
 
 class Voice(object):
+    # Engines that override voiceStreamToText with a real streaming API set this to True
+    supports_streaming_asr = False
+
     def voiceToText(self, voice_file):
         """
         Send voice to voice service and get text
         """
         raise NotImplementedError
 
+    def voiceStreamToText(self, frames, sample_rate=16000):
+        """
+        Recognize an iterable of 16-bit mono PCM frames.
+        File-based engines fall back to writing a temporary wav file and calling voiceToText.
+        """
+        from common.tmp_dir import TmpDir
+        from voice import audio_codec
+
+        pcm = audio_codec.PcmAudio(b"".join(frames), sample_rate)
+        wav_path = TmpDir().path() + "asr-" + uuid.uuid4().hex[:8] + ".wav"
+        with open(wav_path, "wb") as f:
+            f.write(audio_codec.to_wav_bytes(pcm))
+        try:
+            return self.voiceToText(wav_path)
+        finally:
+            os.remove(wav_path)
+
     def textToVoice(self, text):
         """
         Send text to voice service and get voice
         """
         raise NotImplementedError
+
+    def cache_params(self):
+        """
+        Effective settings that change the synthesized audio (voice name, speed, pitch...), used in the tts cache key.
+        Return None to disable caching, which is the default for engines that do not declare their settings.
+        """
+        return None
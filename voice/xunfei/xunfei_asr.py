@@ -27,26 +27,24 @@ import ssl
 from wsgiref.handlers import format_date_time
 from datetime import datetime
 from time import mktime
-import _thread as thread
+import threading
 import os
 import wave
 
+from common.log import logger
+
 
 STATUS_FIRST_FRAME = 0  # 第一帧的标识
 STATUS_CONTINUE_FRAME = 1  # 中间帧标识
 STATUS_LAST_FRAME = 2  # 最后一帧的标识
 
-#############
-#whole_dict 是用来存储返回值的，由于带语音修正，所以用dict来存储，有更新的化pop之前的值，最后再合并
-global whole_dict
-#这个文档是官方文档改的，这个参数是用来做函数调用时用的
-global wsParam
-##############
+FRAME_BYTES = 16000  # 每一帧的音频大小(8000个16位采样)
+FRAME_INTERVAL = 0.04  # 发送音频间隔(单位:s)
 
 
 class Ws_Param(object):
     # 初始化
-    def __init__(self, APPID, APIKey, APISecret,BusinessArgs, AudioFile):
+    def __init__(self, APPID, APIKey, APISecret,BusinessArgs, AudioFile=None):
         self.APPID = APPID
         self.APIKey = APIKey
         self.APISecret = APISecret
@@ -91,119 +89,107 @@ class Ws_Param(object):
         return url
 
 
-# 收到websocket消息的处理
-def on_message(ws, message):
-    global whole_dict
-    try:
-        code = json.loads(message)["code"]
-        sid = json.loads(message)["sid"]
-        if code != 0:
-            errMsg = json.loads(message)["message"]
-            print("sid:%s call error:%s code is:%s" % (sid, errMsg, code))
-        else:
-            temp1 = json.loads(message)["data"]["result"]
-            data = json.loads(message)["data"]["result"]["ws"]
-            sn = temp1["sn"]
-            if "rg" in temp1.keys():
-                rep = temp1["rg"]
-                rep_start = rep[0]
-                rep_end = rep[1]
-                for sn in range(rep_start,rep_end+1):
-                    #print("before pop",whole_dict)
-                    #print("sn",sn)
-                    whole_dict.pop(sn,None)
-                    #print("after pop",whole_dict)
-                results = ""
-                for i in data:
-                    for w in i["cw"]:
-                        results += w["w"]
-                whole_dict[sn]=results
-                #print("after add",whole_dict)
-            else:
-                results = ""
-                for i in data:
-                    for w in i["cw"]:
-                        results += w["w"]
-                whole_dict[sn]=results
-            #print("sid:%s call success!,data is:%s" % (sid, json.dumps(data, ensure_ascii=False)))
-    except Exception as e:
-        print("receive msg,but parse exception:", e)
-
-
-
-# 收到websocket错误的处理
-def on_error(ws, error):
-    print("### error:", error)
-
-
-# 收到websocket关闭的处理
-def on_close(ws,a,b):
-    print("### closed ###")
-
-
-# 收到websocket连接建立的处理
-def on_open(ws):
-    global wsParam
-    def run(*args):
-        frameSize = 8000  # 每一帧的音频大小
-        intervel = 0.04  # 发送音频间隔(单位:s)
-        status = STATUS_FIRST_FRAME  # 音频的状态信息，标识音频是第一帧，还是中间帧、最后一帧
-
-        with wave.open(wsParam.AudioFile, "rb") as fp:
-            while True:
-                buf = fp.readframes(frameSize)
-                # 文件结束
-                if not buf:
-                    status = STATUS_LAST_FRAME
-                # 第一帧处理
-                # 发送第一帧音频，带business 参数
-                # appid 必须带上，只需第一帧发送
-                if status == STATUS_FIRST_FRAME:
-                    d = {"common": wsParam.CommonArgs,
-                         "business": wsParam.BusinessArgs,
-                         "data": {"status": 0, "format": "audio/L16;rate=16000","audio": str(base64.b64encode(buf), 'utf-8'), "encoding": "raw"}} 
-                    d = json.dumps(d)
-                    ws.send(d)
-                    status = STATUS_CONTINUE_FRAME
-                # 中间帧处理
-                elif status == STATUS_CONTINUE_FRAME:
-                    d = {"data": {"status": 1, "format": "audio/L16;rate=16000",
-                                  "audio": str(base64.b64encode(buf), 'utf-8'),
-                                  "encoding": "raw"}}
-                    ws.send(json.dumps(d))
-                # 最后一帧处理
-                elif status == STATUS_LAST_FRAME:
-                    d = {"data": {"status": 2, "format": "audio/L16;rate=16000",
-                                  "audio": str(base64.b64encode(buf), 'utf-8'),
-                                  "encoding": "raw"}}
+def _parse_result(message, whole_dict):
+    """解析一条识别结果，更新whole_dict；返回(是否为最后一条结果, 错误信息)
+
+    whole_dict 是用来存储返回值的，由于带语音修正(dwa=wpgs)，所以用dict来存储，有更新的话pop之前的值，最后再合并
+    """
+    message = json.loads(message)
+    if message["code"] != 0:
+        return True, "sid:%s call error:%s code is:%s" % (message.get("sid"), message.get("message"), message["code"])
+    result = message["data"]["result"]
+    if "rg" in result:
+        rep_start, rep_end = result["rg"]
+        for sn in range(rep_start, rep_end + 1):
+            whole_dict.pop(sn, None)
+    whole_dict[result["sn"]] = "".join(w["w"] for i in result["ws"] for w in i["cw"])
+    return message["data"].get("status") == STATUS_LAST_FRAME, None
+
+
+def _rechunk(frames, size):
+    """把任意大小的PCM帧重新切分为固定大小的音频帧"""
+    buffer = b""
+    for frame in frames:
+        buffer += frame
+        while len(buffer) >= size:
+            yield buffer[:size]
+            buffer = buffer[size:]
+    if buffer:
+        yield buffer
+
+
+def _wav_frames(audio_file):
+    with wave.open(audio_file, "rb") as fp:
+        while True:
+            buf = fp.readframes(FRAME_BYTES // 2)
+            if not buf:
+                break
+            yield buf
+
+
+def xunfei_asr_stream(APPID, APISecret, APIKey, BusinessArgsASR, frames, sample_rate=16000, timeout=10):
+    """流式识别16位单声道PCM帧，边读取frames边发送，收到最后一条结果后立即返回"""
+    wsParam = Ws_Param(APPID=APPID, APISecret=APISecret, APIKey=APIKey, BusinessArgs=BusinessArgsASR)
+    audio_format = "audio/L16;rate=%d" % sample_rate
+    whole_dict = {}
+    finished = threading.Event()
+    errors = []
+
+    def on_message(ws, message):
+        try:
+            last, error = _parse_result(message, whole_dict)
+        except Exception as e:
+            last, error = False, "receive msg,but parse exception: %s" % e
+        if error:
+            errors.append(error)
+        if last:
+            finished.set()
+
+    def on_error(ws, error):
+        errors.append(str(error))
+        finished.set()
+
+    def on_close(ws, *args):
+        finished.set()
+
+    def on_open(ws):
+        def run():
+            status = STATUS_FIRST_FRAME  # 音频的状态信息，标识音频是第一帧，还是中间帧
+            try:
+                for buf in _rechunk(frames, FRAME_BYTES):
+                    d = {"data": {"status": status, "format": audio_format,
+                                  "audio": str(base64.b64encode(buf), 'utf-8'), "encoding": "raw"}}
+                    # 第一帧需要带上appid和business参数
+                    if status == STATUS_FIRST_FRAME:
+                        d["common"] = wsParam.CommonArgs
+                        d["business"] = wsParam.BusinessArgs
+                        status = STATUS_CONTINUE_FRAME
                     ws.send(json.dumps(d))
-                    time.sleep(1)
-                    break
-                # 模拟音频采样间隔
-                time.sleep(intervel)
-        ws.close()
+                    time.sleep(FRAME_INTERVAL)
+                # 最后一帧不带音频，第一帧就是最后一帧时也需要带上business参数
+                d = {"data": {"status": STATUS_LAST_FRAME, "format": audio_format, "audio": "", "encoding": "raw"}}
+                if status == STATUS_FIRST_FRAME:
+                    d["common"] = wsParam.CommonArgs
+                    d["business"] = wsParam.BusinessArgs
+                ws.send(json.dumps(d))
+                # 等待服务端返回最后一条结果后再关闭，不再固定等待
+                finished.wait(timeout)
+            except Exception as e:
+                errors.append("send audio error: %s" % e)
+            ws.close()
 
-    thread.start_new_thread(run, ())
+        threading.Thread(target=run, daemon=True).start()
 
-#提供给xunfei_voice调用的函数
-def xunfei_asr(APPID,APISecret,APIKey,BusinessArgsASR,AudioFile):
-    global whole_dict
-    global wsParam
-    whole_dict = {}
-    wsParam1 = Ws_Param(APPID=APPID, APISecret=APISecret,
-                       APIKey=APIKey,BusinessArgs=BusinessArgsASR,
-                       AudioFile=AudioFile)
-    #wsParam是global变量，给上面on_open函数调用使用的
-    wsParam = wsParam1
     websocket.enableTrace(False)
-    wsUrl = wsParam.create_url()
-    ws = websocket.WebSocketApp(wsUrl, on_message=on_message, on_error=on_error, on_close=on_close)
+    ws = websocket.WebSocketApp(wsParam.create_url(), on_message=on_message, on_error=on_error, on_close=on_close)
     ws.on_open = on_open
     ws.run_forever(sslopt={"cert_reqs": ssl.CERT_NONE})
+    if errors:
+        logger.warning("[Xunfei] asr error: {}".format("; ".join(errors)))
     #把字典的值合并起来做最后识别的输出
-    whole_words = ""
-    for i in sorted(whole_dict.keys()):
-        whole_words += whole_dict[i]
-    return whole_words
+    return "".join(whole_dict[i] for i in sorted(whole_dict.keys()))
+
 
-     
+#提供给xunfei_voice调用的函数
+def xunfei_asr(APPID,APISecret,APIKey,BusinessArgsASR,AudioFile):
+    return xunfei_asr_stream(APPID, APISecret, APIKey, BusinessArgsASR, _wav_frames(AudioFile))
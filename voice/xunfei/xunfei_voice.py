@@ -26,7 +26,7 @@ from common.log import logger
 from common.tmp_dir import TmpDir
 from config import conf
 from voice.voice import Voice
-from .xunfei_asr import xunfei_asr
+from .xunfei_asr import xunfei_asr, xunfei_asr_stream
 from .xunfei_tts import xunfei_tts
 from voice.audio_convert import any_to_mp3
 import shutil
@@ -73,6 +73,22 @@ class XunfeiVoice(Voice):
             reply = Reply(ReplyType.ERROR, "讯飞语音识别出错了；{0}")
         return reply
 
+    supports_streaming_asr = True
+
+    def voiceStreamToText(self, frames, sample_rate=16000):
+        # 边解码边通过websocket发送PCM帧，不生成wav文件
+        try:
+            text = xunfei_asr_stream(self.APPID, self.APISecret, self.APIKey, self.BusinessArgsASR, frames, sample_rate)
+            logger.info("讯飞语音识别到了: {}".format(text))
+            reply = Reply(ReplyType.TEXT, text)
+        except Exception as e:
+            logger.warn("[Xunfei] voiceStreamToText failed: %s" % e)
+            reply = Reply(ReplyType.ERROR, "讯飞语音识别出错了；{0}")
+        return reply
+
+    def cache_params(self):
+        return {"business_args": getattr(self, "BusinessArgsTTS", None)}
+
     def textToVoice(self, text):
         try:
             # Avoid the same filename under multithreading